@@ -0,0 +1,75 @@
+"""Performance benchmarks for the book API.
+
+Each module is a script run from the repository root, e.g.
+``python -m benchmarks.upstream_pool``. ``python -m benchmarks`` runs the
+whole API suite, see benchmarks.suite.
+"""
+
+import datetime
+import os
+import random
+
+
+def setup_django(database):
+    """Configure Django against the SQLite file ``database`` and migrate it."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookinformation.settings')
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    settings.DATABASES['default']['NAME'] = database
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['testserver']
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+
+def populate_books(total, co_authors=False, seed=42):
+    """Top the books table up to ``total`` rows, each with one of 1000 authors.
+
+    With ``co_authors`` about one book in five gets a second author and one in
+    twenty a third, drawn from the same 1000. The same ``seed`` and ``total``
+    always give the same rows.
+    """
+    from django.db import connection, transaction
+
+    from book import author_stats, denorm, facets
+    from book.isbn import canonical_isbn
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM book_book')
+        existing = cursor.fetchone()[0]
+    if existing >= total:
+        return
+    rng = random.Random(seed)
+    start = datetime.date(1950, 1, 1)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany('INSERT OR IGNORE INTO book_author (name) VALUES (%s)',
+                           [('Author {}'.format(i),) for i in range(1000)])
+        batch = 10000
+        for offset in range(existing, total, batch):
+            rows = [('Book {}'.format(i), '978-{:010d}'.format(i), canonical_isbn('978-{:010d}'.format(i)),
+                     'Country {}'.format(i % 50), 300, 'Publisher {}'.format(i % 200),
+                     start + datetime.timedelta(days=rng.randrange(25000)), now)
+                    for i in range(offset, min(offset + batch, total))]
+            cursor.executemany('INSERT INTO book_book (name, isbn, isbn13, country, number_of_pages, publisher, '
+                               "release_date, updated_at, author_names) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, '')",
+                               rows)
+        cursor.execute("INSERT INTO book_book_authors (book_id, author_id) "
+                       "SELECT b.id, a.id FROM book_book b JOIN book_author a ON a.name = 'Author ' || (b.id % 1000) "
+                       "WHERE b.id > %s", [existing])
+        if co_authors:
+            links = []
+            cursor.execute('SELECT name, id FROM book_author')
+            author_ids = dict(cursor.fetchall())
+            cursor.execute('SELECT id FROM book_book WHERE id > %s ORDER BY id', [existing])
+            for book_id, in cursor.fetchall():
+                extra = rng.choices((0, 1, 2), weights=(75, 20, 5))[0]
+                links.extend((book_id, author_ids['Author {}'.format((book_id + step * 337) % 1000)])
+                             for step in range(1, extra + 1))
+            cursor.executemany('INSERT INTO book_book_authors (book_id, author_id) VALUES (%s, %s)', links)
+        cursor.execute('SELECT id FROM book_book WHERE id > %s ORDER BY id', [existing])
+        denorm.refresh_author_names([book_id for book_id, in cursor.fetchall()], batch_size=5000)
+        author_stats.reconcile()
+        facets.rebuild()
@@ -0,0 +1,151 @@
+"""Book API latency while the external books path is saturated, with and without admission control.
+
+    python -m benchmarks.admission --workers 8 --clients 32 --delay 1 --seconds 10
+
+Serves the API in a child process from a WSGI server with ``--workers`` threads,
+like a gthread gunicorn worker, against a local stand-in upstream answering
+after ``--delay`` seconds. ``--crud-clients`` clients retrieve books one request
+at a time, first alone and then while ``--clients`` clients ask for new external
+books names. With admission off every worker can end up waiting on the
+upstream; with it on at most ``--in-flight`` do, and the external requests
+beyond ``--queue`` waiting ones are answered 503 at once (see book.admission),
+after which their clients wait for Retry-After. Rate limiting is off, all
+clients share one address. Prints the p50/p95/p99 latency of the book requests
+in milliseconds and the external requests served and shed per second.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import populate_books, setup_django
+from benchmarks.external_books import free_port, wait_until_up
+from book.tests.upstream_server import UpstreamServer
+
+SERVE = """
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from benchmarks import setup_django
+setup_django(sys.argv[1])
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+settings.ALLOWED_HOSTS = ['127.0.0.1']
+settings.EXTERNAL_BOOKS_UPSTREAM = dict(settings.EXTERNAL_BOOKS_UPSTREAM, BASE_URL=sys.argv[2], POOL_SIZE=1000,
+                                        RETRIES=0, READ_TIMEOUT=60)
+settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, RATE=None, **json.loads(sys.argv[3]))
+
+
+class PoolServer(WSGIServer):
+    request_queue_size = 1024
+    executor = ThreadPoolExecutor(int(sys.argv[4]))
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.serve, request, client_address)
+
+    def serve(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+make_server('127.0.0.1', int(sys.argv[5]), get_wsgi_application(), PoolServer, QuietHandler).serve_forever()
+"""
+
+BOOKS = 1000
+
+
+async def crud(http, base_url, deadline, latencies):
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        response = await http.get('{}/api/v1/books/{}/'.format(base_url, random.randrange(BOOKS) + 1))
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def external(http, base_url, deadline, counter, outcomes):
+    while time.monotonic() < deadline:
+        response = await http.get(base_url + '/api/external-books', params={'name': 'Bench {}'.format(next(counter))})
+        outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+        if 'Retry-After' in response.headers:
+            await asyncio.sleep(min(int(response.headers['Retry-After']), deadline - time.monotonic()))
+
+
+async def load(base_url, crud_clients, clients, seconds):
+    latencies, outcomes = [], {}
+    deadline = time.monotonic() + seconds
+    counter = itertools.count()
+    limits = httpx.Limits(max_connections=crud_clients + clients)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as http:
+        await asyncio.gather(*[crud(http, base_url, deadline, latencies) for _ in range(crud_clients)],
+                             *[external(http, base_url, deadline, counter, outcomes) for _ in range(clients)])
+    return latencies, outcomes
+
+
+def percentiles(latencies):
+    quantiles = statistics.quantiles(latencies, n=100)
+    return [round(quantiles[p - 1] * 1000, 1) for p in (50, 95, 99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8, help="server threads")
+    parser.add_argument('--clients', type=int, default=32, help="external books clients")
+    parser.add_argument('--crud-clients', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--delay', type=float, default=1, help="upstream latency in seconds")
+    parser.add_argument('--in-flight', type=int, default=4, help="MAX_IN_FLIGHT with admission on")
+    parser.add_argument('--queue', type=int, default=2, help="MAX_QUEUE with admission on")
+    parser.add_argument('--max-wait', type=float, default=0.5, help="MAX_WAIT with admission on")
+    args = parser.parse_args()
+
+    modes = {'off': {'MAX_IN_FLIGHT': 100000, 'MAX_QUEUE': 0},
+             'on': {'MAX_IN_FLIGHT': args.in_flight, 'MAX_QUEUE': args.queue, 'MAX_WAIT': args.max_wait}}
+    with tempfile.TemporaryDirectory() as directory, UpstreamServer(books=[], delay=args.delay) as upstream:
+        database = os.path.join(directory, 'bench.sqlite3')
+        setup_django(database)
+        populate_books(BOOKS)
+        print('{} workers, {} external clients, upstream latency {:.0f} ms, {}s per run'.format(
+            args.workers, args.clients, args.delay * 1000, args.seconds))
+        print('{:>9} {:>9} {:>8} {:>8} {:>8} {:>10} {:>10}'.format(
+            'admission', 'external', 'p50', 'p95', 'p99', 'served/s', 'shed/s'))
+        for mode, config in modes.items():
+            port = free_port()
+            process = subprocess.Popen([sys.executable, '-c', SERVE, database, upstream.url, json.dumps(config),
+                                        str(args.workers), str(port)])
+            try:
+                base_url = 'http://127.0.0.1:{}'.format(port)
+                wait_until_up(base_url + '/api/v1/books/1/')
+                for clients in (0, args.clients):
+                    latencies, outcomes = asyncio.run(load(base_url, args.crud_clients, clients, args.seconds))
+                    print('{:>9} {:>9} {:>8} {:>8} {:>8} {:>10.1f} {:>10.1f}'.format(
+                        mode, clients, *percentiles(latencies), outcomes.get(200, 0) / args.seconds,
+                        outcomes.get(503, 0) / args.seconds))
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Author table sizes and join latency, with names as Author keys and with integers.
+
+    python -m benchmarks.author_keys --books 1000000 --authors 50000
+
+Migrates a new SQLite file in ``--database`` to 0012, the last migration keying
+authors by name, and fills it with raw SQL: ``--authors`` authors named like
+people, ``--books`` books of one to three of them and the authors' stats. It
+reports the size of the author tables and of their indexes and times the author
+queries of the API as they are written for that schema: a page of books of one
+author, the authors of a page of books, the stats of a batch of authors and a
+page of authors. It then migrates forward, timing the backfill and the swap, and
+reports the same again.
+"""
+
+import argparse
+import datetime
+import os
+import random
+import statistics
+import time
+
+TABLES = ('book_author', 'book_book_authors', 'book_authorstats')
+FIRST_NAMES = ('Margaret', 'George', 'Ursula', 'Terry', 'Octavia', 'Neil', 'Robin', 'Patrick', 'Brandon', 'Naomi',
+               'Steven', 'Mary', 'Joe', 'Lois', 'Roger', 'Anne', 'Isaac', 'Frank', 'Ann', 'Kazuo')
+LAST_NAMES = ('Atwood', 'Martin', 'Le Guin', 'Pratchett', 'Butler', 'Gaiman', 'Hobb', 'Rothfuss', 'Sanderson',
+              'Novik', 'Erikson', 'Shelley', 'Abercrombie', 'Bujold', 'Zelazny', 'McCaffrey', 'Asimov', 'Herbert',
+              'Leckie', 'Ishiguro')
+
+# The SQL the API runs for each schema, ``%s`` taking author keys and book ids.
+QUERIES = {
+    'books of an author': {
+        'name': 'SELECT b.id, b.name, b.release_date FROM book_book b '
+                'JOIN book_book_authors ba ON ba.book_id = b.id WHERE ba.author_id = %s '
+                'ORDER BY b.release_date, b.id LIMIT 100',
+        'integer': 'SELECT b.id, b.name, b.release_date FROM book_book b '
+                   'JOIN book_book_authors ba ON ba.book_id = b.id JOIN book_author a ON a.id = ba.author_id '
+                   'WHERE a.name = %s ORDER BY b.release_date, b.id LIMIT 100',
+    },
+    'authors of 100 books': {
+        'name': 'SELECT ba.book_id, ba.author_id FROM book_book_authors ba WHERE ba.book_id IN ({books}) '
+                'ORDER BY ba.author_id',
+        'integer': 'SELECT ba.book_id, a.name FROM book_book_authors ba JOIN book_author a ON a.id = ba.author_id '
+                   'WHERE ba.book_id IN ({books}) ORDER BY a.name',
+    },
+    'stats of 100 authors': {
+        key: 'SELECT ba.author_id, COUNT(ba.book_id), SUM(b.number_of_pages), MIN(b.release_date), '
+             'MAX(b.release_date) FROM book_book_authors ba JOIN book_book b ON b.id = ba.book_id '
+             'WHERE ba.author_id IN ({authors}) GROUP BY ba.author_id'
+        for key in ('name', 'integer')
+    },
+    'page of 100 authors': {
+        key: 'SELECT a.name, s.book_count, s.total_pages FROM book_author a '
+             'LEFT JOIN book_authorstats s ON s.author_id = a.{} WHERE a.name > %s ORDER BY a.name LIMIT 100'
+             .format('name' if key == 'name' else 'id')
+        for key in ('name', 'integer')
+    },
+}
+
+
+def populate(cursor, books, authors, seed):
+    rng = random.Random(seed)
+    names = ['{} {} {}'.format(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), i) for i in range(authors)]
+    cursor.executemany('INSERT INTO book_author (name) VALUES (%s)', [(name,) for name in names])
+    start = datetime.date(1950, 1, 1)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for offset in range(0, books, 10000):
+        rows = [('Book {}'.format(i), '978-{:010d}'.format(i), 'Country {}'.format(i % 50), rng.randrange(50, 900),
+                 'Publisher {}'.format(i % 200), start + datetime.timedelta(days=rng.randrange(25000)), now)
+                for i in range(offset, min(offset + 10000, books))]
+        cursor.executemany('INSERT INTO book_book (name, isbn, country, number_of_pages, publisher, release_date, '
+                           "updated_at, author_names) VALUES (%s, %s, %s, %s, %s, %s, %s, '')", rows)
+        links = []
+        for book_id in range(offset + 1, offset + len(rows) + 1):
+            count = rng.choices((1, 2, 3), weights=(75, 20, 5))[0]
+            links.extend((book_id, name) for name in rng.sample(names, count))
+        cursor.executemany('INSERT INTO book_book_authors (book_id, author_id) VALUES (%s, %s)', links)
+    cursor.execute('INSERT INTO book_authorstats (author_id, book_count, total_pages, first_release_date, '
+                   'last_release_date) SELECT ba.author_id, COUNT(*), SUM(b.number_of_pages), MIN(b.release_date), '
+                   'MAX(b.release_date) FROM book_book_authors ba JOIN book_book b ON b.id = ba.book_id '
+                   'GROUP BY ba.author_id')
+
+
+def sizes(cursor):
+    """``{table: (table bytes, index bytes)}`` of TABLES, from SQLite's dbstat."""
+    cursor.execute("SELECT m.tbl_name, m.type, SUM(d.pgsize) FROM dbstat d JOIN sqlite_master m ON m.name = d.name "
+                   "WHERE m.tbl_name IN ({}) GROUP BY m.tbl_name, m.type".format(', '.join(['%s'] * len(TABLES))),
+                   TABLES)
+    result = {table: [0, 0] for table in TABLES}
+    for table, kind, size in cursor.fetchall():
+        result[table][kind == 'index'] = size
+    return result
+
+
+def latencies(cursor, schema, repeat, seed):
+    """Median milliseconds of each of QUERIES for ``schema``, 'name' or 'integer'."""
+    rng = random.Random(seed)
+    cursor.execute('SELECT name FROM book_author')
+    names = [name for name, in cursor.fetchall()]
+    cursor.execute('SELECT {} FROM book_author'.format('name' if schema == 'name' else 'id'))
+    keys = [key for key, in cursor.fetchall()]
+    cursor.execute('SELECT MAX(id) FROM book_book')
+    last_book = cursor.fetchone()[0]
+    result = {}
+    for label, sql in QUERIES.items():
+        samples = []
+        for _ in range(repeat):
+            if '{books}' in sql[schema]:
+                params = rng.sample(range(1, last_book + 1), 100)
+                query = sql[schema].format(books=', '.join(['%s'] * 100))
+            elif '{authors}' in sql[schema]:
+                params = rng.sample(keys, 100)
+                query = sql[schema].format(authors=', '.join(['%s'] * 100))
+            else:
+                params, query = [rng.choice(names)], sql[schema]
+            begin = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            samples.append((time.perf_counter() - begin) * 1000)
+        result[label] = statistics.median(samples)
+    return result
+
+
+def report(title, table_sizes, timings):
+    print('\n{}'.format(title))
+    print('{:>20} {:>12} {:>12}'.format('table', 'table MB', 'indexes MB'))
+    for table, (data, indexes) in table_sizes.items():
+        print('{:>20} {:>12.1f} {:>12.1f}'.format(table, data / 2 ** 20, indexes / 2 ** 20))
+    print('{:>20} {:>12}'.format('query', 'median ms'))
+    for label, milliseconds in timings.items():
+        print('{:>20} {:>12.3f}'.format(label, milliseconds))
+
+
+def timed_migrate(target):
+    from django.core.management import call_command
+
+    begin = time.perf_counter()
+    call_command('migrate', 'book', target, verbosity=0)
+    return time.perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=200000)
+    parser.add_argument('--authors', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--database', default='bench_author_keys.sqlite3')
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        os.remove(args.database)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookinformation.settings')
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    settings.DATABASES['default']['NAME'] = args.database
+    django.setup()
+    call_command('migrate', 'book', '0012', verbosity=0)
+
+    from django.db import connection, transaction
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        populate(cursor, args.books, args.authors, seed=42)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        report('name keys, {} books, {} authors'.format(args.books, args.authors), sizes(cursor),
+               latencies(cursor, 'name', args.repeat, seed=1))
+
+    columns = timed_migrate('0013_author_key_columns')
+    backfill = timed_migrate('0014_author_key_backfill')
+    swap = timed_migrate('0015_author_surrogate_key')
+    print('\nmigration s: columns {:.2f}, backfill {:.2f}, swap {:.2f}'.format(columns, backfill, swap))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        report('integer keys', sizes(cursor), latencies(cursor, 'integer', args.repeat, seed=1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Import throughput of one POST per book against POST /api/v1/books/bulk/.
+
+    python -m benchmarks.bulk_import --books 2000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import setup_django
+
+
+def make_books(count, offset=0):
+    return [{'name': 'Book {}'.format(i), 'isbn': '978-{:010d}'.format(i), 'country': 'Country {}'.format(i % 50),
+             'number_of_pages': 300, 'publisher': 'Publisher {}'.format(i % 200), 'release_date': '2001-01-01',
+             'authors': ['Author {}'.format(i % 1000), 'Author {}'.format((i * 7) % 1000)]}
+            for i in range(offset, offset + count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        start = time.perf_counter()
+        for book in make_books(args.books):
+            assert client.post('/api/v1/books/', book, format='json').status_code == 201
+        single = args.books / (time.perf_counter() - start)
+
+        books = make_books(args.books, offset=args.books)
+        start = time.perf_counter()
+        response = client.post('/api/v1/books/bulk/?batch_size={}'.format(args.batch_size), books, format='json')
+        bulk = args.books / (time.perf_counter() - start)
+        assert response.status_code == 200
+        assert all(item['status'] == 'created' for item in response.data['data'])
+
+    print('single create {:10.0f} books/s'.format(single))
+    print('bulk create   {:10.0f} books/s ({:.0f}x)'.format(bulk, bulk / single))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Book creates per second with concurrent writer processes on SQLite.
+
+    python -m benchmarks.concurrent_writes --writers 1,2,4,8 --seconds 5
+
+Every writer is a forked process posting new books to POST /api/v1/books/ as
+fast as it can, the way the workers of a prefork server do. The ``tuned``
+profile uses the connection options from the settings (WAL, synchronous=NORMAL,
+IMMEDIATE transactions and a 20 second busy timeout), ``default`` SQLite's and
+Django's defaults, under which writers that upgrade a read transaction fail with
+"database is locked" instead of waiting.
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks import populate_books, setup_django
+
+PROFILES = {
+    'default': {'init_command': 'PRAGMA journal_mode=DELETE'},
+    'tuned': None,
+}
+
+
+def write(seconds, writer):
+    from django.db import connection
+    from django.test import Client
+
+    connection.close()
+    client = Client(raise_request_exception=False)
+    created = failed = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        response = client.post('/api/v1/books/', {
+            'name': 'Concurrent {}-{}'.format(writer, created + failed),
+            'isbn': '{:05d}{:09d}'.format(os.getpid() % 100000, created + failed),
+            'country': 'Country 1', 'authors': ['Author 1', 'Author 2'], 'number_of_pages': 100,
+            'publisher': 'Publisher 1', 'release_date': '2019-05-26',
+        }, content_type='application/json')
+        if response.status_code == 201:
+            created += 1
+        else:
+            failed += 1
+    return created, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--writers', default='1,2,4,8')
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from django.conf import settings
+        from django.db import connection
+
+        populate_books(args.books)
+        tuned = dict(settings.DATABASES['default']['OPTIONS'])
+        print('{:>8} {:>8} {:>10} {:>10} {:>12}'.format('profile', 'writers', 'created', 'failed', 'creates/sec'))
+        for profile, options in PROFILES.items():
+            settings.DATABASES['default']['OPTIONS'] = options or tuned
+            connection.settings_dict['OPTIONS'] = options or tuned
+            for writers in [int(count) for count in args.writers.split(',')]:
+                connection.close()
+                with multiprocessing.get_context('fork').Pool(writers) as pool:
+                    results = pool.starmap(write, [(args.seconds, writer) for writer in range(writers)])
+                created = sum(result[0] for result in results)
+                failed = sum(result[1] for result in results)
+                print('{:>8} {:>8} {:>10} {:>10} {:>12.1f}'.format(
+                    profile, writers, created, failed, created / args.seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Peak RSS of ``manage.py export_books`` as the catalogue grows.
+
+    python -m benchmarks.export --sizes 10000 100000 1000000
+
+Each export runs in a fresh process writing to /dev/null and its own peak RSS
+is read back from the kernel with wait4().
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import populate_books, setup_django
+
+EXPORT = """
+import os
+import sys
+from benchmarks import setup_django
+setup_django(sys.argv[1])
+from django.core.management import call_command
+call_command('export_books', '--type', sys.argv[2], '--output', os.devnull)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.sqlite3')
+        setup_django(database)
+        print('{:>10} {:>8} {:>10} {:>12}'.format('books', 'type', 'seconds', 'peak RSS MB'))
+        for size in sorted(args.sizes):
+            populate_books(size)
+            for export_type in ('ndjson', 'csv'):
+                start = time.perf_counter()
+                process = subprocess.Popen([sys.executable, '-c', EXPORT, database, export_type])
+                _, status, usage = os.wait4(process.pid, 0)
+                elapsed = time.perf_counter() - start
+                assert status == 0
+                # ru_maxrss is in kilobytes on Linux.
+                peak = usage.ru_maxrss / 1024
+                print('{:>10} {:>8} {:>10.1f} {:>12.1f}'.format(size, export_type, elapsed, peak))
+
+
+if __name__ == '__main__':
+    main()
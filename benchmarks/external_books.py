@@ -0,0 +1,120 @@
+"""Requests per second of one sync worker against one async worker.
+
+    python -m benchmarks.external_books --clients 50 --seconds 5 --delay 0.05
+
+Both serve the external books endpoint in a child process, the sync view through
+a single threaded WSGI server like a sync gunicorn worker and the async view
+through uvicorn, against a local stand-in upstream answering after ``--delay``
+seconds. Every request asks for a new name so none is served from the cache.
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import setup_django
+from book.tests.upstream_server import UpstreamServer
+
+SERVE = """
+import sys
+from benchmarks import setup_django
+setup_django(sys.argv[1])
+from django.conf import settings
+settings.ALLOWED_HOSTS = ['127.0.0.1']
+settings.EXTERNAL_BOOKS_UPSTREAM = dict(settings.EXTERNAL_BOOKS_UPSTREAM, BASE_URL=sys.argv[2])
+port = int(sys.argv[4])
+if sys.argv[3] == 'sync':
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+    from django.core.wsgi import get_wsgi_application
+
+    class Server(WSGIServer):
+        request_queue_size = 1024
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    make_server('127.0.0.1', port, get_wsgi_application(), Server, QuietHandler).serve_forever()
+else:
+    import uvicorn
+    from django.core.asgi import get_asgi_application
+    uvicorn.run(get_asgi_application(), host='127.0.0.1', port=port, log_level='warning')
+"""
+
+PATHS = {'sync': '/api/external-books', 'async': '/api/async/external-books'}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def load(url, clients, seconds, names):
+    counter = itertools.count()
+    done, errors = 0, 0
+    deadline = time.monotonic() + seconds
+
+    async def client(http):
+        nonlocal done, errors
+        while time.monotonic() < deadline:
+            params = [('name', 'Book {}'.format(next(counter))) for _ in range(names)]
+            response = await http.get(url, params=params)
+            if response.status_code == 200 and 'errors' not in response.json():
+                done += 1
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as http:
+        await asyncio.gather(*[client(http) for _ in range(clients)])
+    return done, errors
+
+
+def wait_until_up(url):
+    for _ in range(200):
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.05)
+    raise RuntimeError("{} did not come up.".format(url))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--delay', type=float, default=0.05, help="upstream latency in seconds")
+    parser.add_argument('--names', type=int, default=1, help="names per async request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, UpstreamServer(books=[], delay=args.delay) as upstream:
+        database = os.path.join(directory, 'bench.sqlite3')
+        setup_django(database)
+        print('{} clients for {}s, upstream latency {:.0f} ms'.format(args.clients, args.seconds, args.delay * 1000))
+        print('{:>6} {:>6} {:>10} {:>8}'.format('worker', 'names', 'req/s', 'errors'))
+        for worker in ('sync', 'async'):
+            port = free_port()
+            process = subprocess.Popen([sys.executable, '-c', SERVE, database, upstream.url, worker, str(port)])
+            try:
+                url = 'http://127.0.0.1:{}{}'.format(port, PATHS[worker])
+                wait_until_up(url + '?name=warmup')
+                names = args.names if worker == 'async' else 1
+                done, errors = asyncio.run(load(url, args.clients, args.seconds, names))
+            finally:
+                process.terminate()
+                process.wait()
+            print('{:>6} {:>6} {:>10.1f} {:>8}'.format(worker, names, done / args.seconds, errors))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Latency of GET /api/v1/books/facets/ as the catalogue grows, rollup against aggregate.
+
+    python -m benchmarks.facets --sizes 10000,100000,1000000
+
+Grows one SQLite fixture in ``--database`` through ``--sizes`` books and, at
+each size, times facet requests answered from the BookFacetCount rollup rows
+(no filter, or a single country, publisher or year) and the same filters
+counted by the combined aggregate query over the books. Also times requests
+only the aggregate can answer, two filters or an author.
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks import populate_books, setup_django
+
+CASES = [
+    ('none', {}),
+    ('country', {'country': 'Country 7'}),
+    ('publisher', {'publisher': 'Publisher 7'}),
+    ('year', {'release_date': '1990'}),
+]
+AGGREGATE_ONLY = [
+    ('country+year', {'country': 'Country 7', 'release_date': '1990'}),
+    ('author', {'author': 'Author 7'}),
+]
+
+
+def timed(view, request, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = view(request)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.data
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database', default='bench_facets.sqlite3')
+    args = parser.parse_args()
+
+    setup_django(args.database)
+    from unittest import mock
+
+    from rest_framework.test import APIRequestFactory
+
+    from book import facets
+    from book.views import BookViewSet
+
+    factory = APIRequestFactory()
+    view = BookViewSet.as_view({'get': 'facets'})
+
+    print('{:>9} {:>14} {:>12} {:>14}'.format('books', 'filter', 'rollup ms', 'aggregate ms'))
+    for size in [int(size) for size in args.sizes.split(',')]:
+        populate_books(size)
+        for name, params in CASES + AGGREGATE_ONLY:
+            request = factory.get('/api/v1/books/facets/', params)
+            rollup = timed(view, request, args.repeat) if (name, params) in CASES else None
+            with mock.patch.object(facets, 'rollup_filter', return_value=None):
+                aggregate = timed(view, request, max(args.repeat // 4, 1))
+            print('{:>9} {:>14} {:>12} {:>14.2f}'.format(
+                size, name, '-' if rollup is None else '{:.2f}'.format(rollup), aggregate))
+
+
+if __name__ == '__main__':
+    main()
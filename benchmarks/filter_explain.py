@@ -0,0 +1,60 @@
+"""EXPLAIN every BookFilter combination and check that an index serves it.
+
+    python -m benchmarks.filter_explain --books 1000000
+
+Exits with status 1 if any combination scans the whole books table. The query
+explained is the one the list endpoint runs: filters plus keyset pagination.
+"""
+
+import argparse
+import itertools
+import sys
+import time
+
+from benchmarks import populate_books, setup_django
+
+FILTER_VALUES = {
+    'name': 'Book 4242',
+    'country': 'Country 7',
+    'publisher': 'Publisher 42',
+    'release_date': 1996,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=1000000)
+    parser.add_argument('--database', default='bench_pagination.sqlite3')
+    args = parser.parse_args()
+
+    setup_django(args.database)
+    from django.db import connection
+
+    from book.filters import BookFilter
+    from book.models import Book
+    from book.pagination import KeysetPagination
+
+    populate_books(args.books)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    full_scans = 0
+    for size in range(1, len(FILTER_VALUES) + 1):
+        for fields in itertools.combinations(FILTER_VALUES, size):
+            params = {field: FILTER_VALUES[field] for field in fields}
+            queryset = BookFilter(params, queryset=Book.objects.all()).qs \
+                .order_by(*KeysetPagination.ordering)[:100]
+            plan = queryset.explain()
+            start = time.perf_counter()
+            list(queryset)
+            elapsed = (time.perf_counter() - start) * 1000
+            scans = [line for line in plan.splitlines() if 'SCAN book_book' in line and 'INDEX' not in line]
+            full_scans += bool(scans)
+            print('{:<40} {:>8.2f} ms  {}'.format('+'.join(fields), elapsed, 'FULL SCAN' if scans else 'index'))
+            for line in plan.splitlines():
+                print('    ' + line)
+    sys.exit(1 if full_scans else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Per request cost of book.metrics.MetricsMiddleware.
+
+    python -m benchmarks.metrics_overhead --requests 2000 --budget-us 100
+
+Serves GET /api/v1/books/<id>/ in process with and without the middleware,
+alternating rounds to even out noise, and exits with status 1 when the median
+added time per request exceeds --budget-us microseconds. The serializer and
+upstream timers stay on in both runs; each costs one histogram observation.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks import populate_books, setup_django
+
+MIDDLEWARE = 'book.metrics.MetricsMiddleware'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--budget-us', type=float, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from django.conf import settings
+        from django.test import Client
+
+        populate_books(args.books)
+        with_metrics = list(settings.MIDDLEWARE)
+        without_metrics = [name for name in with_metrics if name != MIDDLEWARE]
+
+        def per_request(middleware):
+            settings.MIDDLEWARE = middleware
+            client = Client()
+            client.get('/api/v1/books/1/')
+            start = time.perf_counter()
+            for i in range(args.requests):
+                client.get('/api/v1/books/{}/'.format(i % args.books + 1))
+            return (time.perf_counter() - start) / args.requests * 1e6
+
+        samples = {'without': [], 'with': []}
+        for _ in range(args.rounds):
+            samples['without'].append(per_request(without_metrics))
+            samples['with'].append(per_request(with_metrics))
+        baseline = statistics.median(samples['without'])
+        measured = statistics.median(samples['with'])
+        overhead = measured - baseline
+        print('{} requests x {} rounds'.format(args.requests, args.rounds))
+        print('{:>16} {:>10.1f} us/request'.format('without metrics', baseline))
+        print('{:>16} {:>10.1f} us/request'.format('with metrics', measured))
+        print('{:>16} {:>10.1f} us/request ({:.1%}), budget {} us'.format(
+            'overhead', overhead, overhead / baseline, args.budget_us))
+        if overhead > args.budget_us:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
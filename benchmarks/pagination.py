@@ -0,0 +1,68 @@
+"""Per-page latency of the books list at increasing depth, keyset against OFFSET.
+
+    python -m benchmarks.pagination --books 1000000
+
+The SQLite fixture is built once in ``--database`` and reused by later runs.
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks import populate_books, setup_django
+
+DEPTHS = (0, 1000, 10000, 100000, 500000, 900000)
+
+
+def timed(view, request, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = view(request)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.data
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=1000000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database', default='bench_pagination.sqlite3')
+    args = parser.parse_args()
+
+    setup_django(args.database)
+    from rest_framework.test import APIRequestFactory
+
+    from book.models import Book
+    from book.pagination import KeysetPagination
+    from book.views import BookViewSet
+
+    class OffsetPagination(KeysetPagination):
+        """Same ordering and envelope, positioned with LIMIT/OFFSET."""
+
+        def paginate_queryset(self, queryset, request, view=None):
+            offset = int(request.query_params.get('offset', 0))
+            return list(queryset.order_by(*self.ordering)[offset:offset + self.get_page_size(request)])
+
+    populate_books(args.books)
+    factory = APIRequestFactory()
+    keyset_view = BookViewSet.as_view({'get': 'list'})
+    offset_view = BookViewSet.as_view({'get': 'list'}, pagination_class=OffsetPagination)
+    ordered = Book.objects.order_by(*KeysetPagination.ordering).values_list(*KeysetPagination.ordering)
+
+    print('{:>8} {:>12} {:>12}'.format('depth', 'keyset ms', 'offset ms'))
+    for depth in (depth for depth in DEPTHS if depth < args.books):
+        params = {'page_size': args.page_size}
+        if depth:
+            position = [KeysetPagination.to_cursor_value(value) for value in ordered[depth - 1]]
+            params['cursor'] = KeysetPagination().encode_cursor(position)
+        keyset_ms = timed(keyset_view, factory.get('/api/v1/books/', params), args.repeat)
+        offset_request = factory.get('/api/v1/books/', {'page_size': args.page_size, 'offset': depth})
+        offset_ms = timed(offset_view, offset_request, args.repeat)
+        print('{:>8} {:>12.2f} {:>12.2f}'.format(depth, keyset_ms, offset_ms))
+
+
+if __name__ == '__main__':
+    main()
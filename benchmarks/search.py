@@ -0,0 +1,48 @@
+"""Search latency as the catalogue grows.
+
+    python -m benchmarks.search --sizes 10000 100000 1000000
+
+Selective queries stay flat. Words carried by a fixed share of the synthetic
+books ("book", "publisher", ...) match more rows as the catalogue grows and
+cost accordingly.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import populate_books, setup_django
+
+QUERIES = ('4242', 'book 4242', 'author 7', 'publisher 42')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from book import search
+
+        print('{:>10} '.format('books') + ' '.join('{:>20}'.format(query) for query in QUERIES))
+        for size in sorted(args.sizes):
+            populate_books(size)
+            search.rebuild()
+            medians = []
+            for query in QUERIES:
+                samples = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    search.search(query, args.limit)
+                    samples.append((time.perf_counter() - start) * 1000)
+                medians.append(statistics.median(samples))
+            print('{:>10} '.format(size) + ' '.join('{:>17.2f} ms'.format(median) for median in medians))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Rows per second serializing and rendering a books list.
+
+    python -m benchmarks.serializer --books 10000
+
+Compares BookSerializer + JSONRenderer on prefetched model instances with the
+values() fast path + FastJSONRenderer used by the list, retrieve and search
+endpoints. Both include their queries.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import populate_books, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from rest_framework.renderers import JSONRenderer
+
+        from book.models import Book
+        from book.renderers import FastJSONRenderer, orjson
+        from book.serializers import BOOK_FIELDS, BookSerializer, serialize_book_rows
+
+        populate_books(args.books)
+
+        def model_serializer():
+            return JSONRenderer().render(BookSerializer(Book.objects.with_relations(), many=True).data)
+
+        def fast_path():
+            return FastJSONRenderer().render(serialize_book_rows(list(Book.objects.values(*BOOK_FIELDS))))
+
+        assert model_serializer() == fast_path()
+        print('{} books, orjson {}'.format(args.books, 'installed' if orjson else 'not installed'))
+        print('{:>28} {:>10} {:>14}'.format('path', 'seconds', 'rows/sec'))
+        for name, run in (('BookSerializer+JSONRenderer', model_serializer), ('values()+FastJSONRenderer', fast_path)):
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                run()
+                samples.append(time.perf_counter() - start)
+            elapsed = statistics.median(samples)
+            print('{:>28} {:>10.3f} {:>14,.0f}'.format(name, elapsed, args.books / elapsed))
+
+
+if __name__ == '__main__':
+    main()
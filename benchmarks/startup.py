@@ -0,0 +1,124 @@
+"""Worker startup cost of each settings profile.
+
+    python -m benchmarks.startup --runs 5 --budget-ms 350 --budget-rss-mb 60
+
+For every settings module, starts fresh Python processes that load the WSGI
+application the way a server worker does and serve one GET /api/v1/books/ in
+process. It reports the median time from process start to that first response,
+the process's resident memory after it, and, from one more run under
+``python -X importtime``, the total import time and the slowest top level
+imports. Exits with status 1 when the last profile, api_settings by default,
+exceeds --budget-ms or --budget-rss-mb.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROFILES = ['bookinformation.settings', 'bookinformation.api_settings']
+
+WORKER = '''
+import io, json, sys
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/v1/books/', 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+    'wsgi.errors': sys.stderr,
+}
+statuses = []
+body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+with open('/proc/self/status') as status:
+    rss = next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+print(json.dumps({'status': statuses[0], 'rss_kb': rss, 'modules': len(sys.modules)}), flush=True)
+'''
+
+
+def run_worker(settings_module, database, importtime=False):
+    """Run WORKER, returning its report, the seconds to its first response and its stderr."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module, DB_NAME=database)
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', WORKER]
+    start = time.perf_counter()
+    process = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    report = json.loads(process.stdout.splitlines()[-1])
+    if not report['status'].startswith('200'):
+        raise RuntimeError('{} answered {}'.format(settings_module, report['status']))
+    return report, elapsed, process.stderr
+
+
+def parse_importtime(stderr):
+    """Total self time and the cumulative time of each top level import, in microseconds."""
+    total = 0
+    top = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        total += int(own)
+        if not name.startswith('  '):
+            top[name.strip()] = top.get(name.strip(), 0) + int(cumulative)
+    return total, sorted(top.items(), key=lambda item: -item[1])
+
+
+def migrate(settings_module, database):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module, DB_NAME=database)
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], env=env, check=True,
+                   capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', default=','.join(PROFILES))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help="Slowest top level imports to list per profile.")
+    parser.add_argument('--budget-ms', type=float, default=None)
+    parser.add_argument('--budget-rss-mb', type=float, default=None)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for settings_module in args.profiles.split(','):
+            database = os.path.join(directory, '{}.sqlite3'.format(settings_module))
+            migrate(settings_module, database)
+            runs = [run_worker(settings_module, database) for _ in range(args.runs)]
+            _, _, stderr = run_worker(settings_module, database, importtime=True)
+            import_us, top = parse_importtime(stderr)
+            results.append({
+                'profile': settings_module,
+                'first_response_ms': statistics.median(elapsed for _, elapsed, _ in runs) * 1000,
+                'rss_mb': statistics.median(report['rss_kb'] for report, _, _ in runs) / 1024,
+                'modules': runs[0][0]['modules'],
+                'import_ms': import_us / 1000,
+                'top': top[:args.top],
+            })
+
+    print('{:>30} {:>18} {:>10} {:>10} {:>8}'.format(
+        'profile', 'first response ms', 'import ms', 'RSS MB', 'modules'))
+    for result in results:
+        print('{profile:>30} {first_response_ms:>18.1f} {import_ms:>10.1f} {rss_mb:>10.1f} {modules:>8}'
+              .format(**result))
+    for result in results:
+        print('\nslowest top level imports, {}:'.format(result['profile']))
+        for name, cumulative in result['top']:
+            print('{:>10.1f} ms  {}'.format(cumulative / 1000, name))
+
+    last = results[-1]
+    if args.budget_ms is not None and last['first_response_ms'] > args.budget_ms:
+        print('\n{} first response {:.1f} ms is over the {} ms budget'.format(
+            last['profile'], last['first_response_ms'], args.budget_ms))
+        sys.exit(1)
+    if args.budget_rss_mb is not None and last['rss_mb'] > args.budget_rss_mb:
+        print('\n{} RSS {:.1f} MB is over the {} MB budget'.format(
+            last['profile'], last['rss_mb'], args.budget_rss_mb))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Latency, throughput and query counts of every book API endpoint.
+
+    python -m benchmarks run --books 100000 --output base.json
+    python -m benchmarks run --books 100000 --output head.json
+    python -m benchmarks compare base.json head.json
+
+``run`` seeds a catalogue of ``--books`` books (10k, 100k and 1M are the usual
+sizes) with co-authors, then sends ``--requests`` requests per scenario through
+the Django test client: the list with every combination of BookFilter filters,
+retrieve, a batch of 50 ids and ISBNs, create, update, destroy (of the books created), the change feed after
+those writes and external books against a local stand-in upstream. Each
+scenario reports throughput, p50/p95/p99
+latency in milliseconds and SQL queries per request as JSON. Requests are served
+in process one at a time, so the numbers cover the application and not a server.
+
+``compare`` prints both runs side by side and exits with status 1 when a
+scenario's p50 or p95 grew, or its throughput dropped, by more than
+``--tolerance``, or when it runs more queries.
+
+Seeding 1M books takes minutes; pass ``--database`` to keep the SQLite file and
+reuse it in later runs.
+"""
+
+import argparse
+import fnmatch
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks import populate_books, setup_django
+
+FILTERS = ('name', 'country', 'publisher', 'release_date', 'author')
+
+
+def filter_value(field, rng, books):
+    i = rng.randrange(books)
+    return {'name': 'Book {}'.format(i), 'country': 'Country {}'.format(i % 50),
+            'publisher': 'Publisher {}'.format(i % 200), 'release_date': rng.randrange(1950, 2018),
+            'author': 'Author {}'.format(i % 1000)}[field]
+
+
+def list_scenario(fields):
+    def request(client, state):
+        params = {field: filter_value(field, state['rng'], state['books']) for field in fields}
+        return client.get('/api/v1/books/', params)
+    return request
+
+
+def retrieve(client, state):
+    return client.get('/api/v1/books/{}/'.format(state['rng'].randrange(state['books']) + 1))
+
+
+def batch(client, state):
+    # 40 ids and 10 ISBNs, in the hyphenated form the seeded books store.
+    rng = state['rng']
+    return client.get('/api/v1/books/batch/', {
+        'id': [rng.randrange(state['books']) + 1 for _ in range(40)],
+        'isbn': ['978-{:010d}'.format(rng.randrange(state['books'])) for _ in range(10)]})
+
+
+def create(client, state):
+    i = next(state['counter'])
+    authors = ['Author {}'.format(state['rng'].randrange(1000)) for _ in range(state['rng'].choice((1, 1, 1, 2, 3)))]
+    response = client.post('/api/v1/books/', {
+        'name': 'Bench {}'.format(i), 'isbn': 'bench-{}'.format(i), 'country': 'Country 1', 'authors': authors,
+        'number_of_pages': 100, 'publisher': 'Publisher 1', 'release_date': '2019-05-26',
+    }, content_type='application/json')
+    if response.status_code == 201:
+        state['created'].append(response.json()['data'][0]['book']['id'])
+    return response
+
+
+def update(client, state):
+    book_id = state['created'][state['rng'].randrange(len(state['created']))]
+    return client.patch('/api/v1/books/{}/'.format(book_id), {'publisher': 'Publisher 2'},
+                        content_type='application/json')
+
+
+def destroy(client, state):
+    return client.delete('/api/v1/books/{}/'.format(state['created'].pop()))
+
+
+def changes(client, state):
+    # A consumer catching up on the last 100 writes.
+    if 'since' not in state:
+        from book import changes as book_changes
+
+        state['since'] = max(book_changes.latest_cursor() - 100, 0)
+    return client.get('/api/v1/books/changes/', {'since': state['since']})
+
+
+def external_books(client, state):
+    # A new name every time, so every request goes to the upstream.
+    return client.get('/api/external-books', {'name': 'Bench {}'.format(next(state['counter']))})
+
+
+def scenarios():
+    """Scenarios in run order, destroy deletes the books create added."""
+    named = []
+    for size in range(len(FILTERS) + 1):
+        for fields in itertools.combinations(FILTERS, size):
+            named.append(('list[{}]'.format('+'.join(fields)), list_scenario(fields)))
+    named += [('retrieve', retrieve), ('batch', batch), ('create', create), ('update', update), ('destroy', destroy),
+              ('changes', changes), ('external-books', external_books)]
+    return named
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1] * 1000, 3)
+
+
+def measure(client, request, state, requests, warmup):
+    """Run ``request`` ``requests`` times and summarize latencies and queries."""
+    from django.db import connection
+
+    from book.metrics import QueryTimer
+
+    for _ in range(warmup):
+        request(client, state)
+    latencies, queries, errors = [], [], 0
+    for _ in range(requests):
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            start = time.perf_counter()
+            response = request(client, state)
+            latencies.append(time.perf_counter() - start)
+        queries.append(timer.count)
+        errors += response.status_code >= 400
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput': round(requests / sum(latencies), 1),
+        'p50_ms': percentile(quantiles, 50),
+        'p95_ms': percentile(quantiles, 95),
+        'p99_ms': percentile(quantiles, 99),
+        'queries_mean': round(statistics.mean(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+def run(args):
+    import django
+    from django.conf import settings
+    from django.test import Client
+
+    from book import upstream
+    from book.models import Book
+    from book.tests.upstream_server import UpstreamServer
+
+    populate_books(args.books, co_authors=True, seed=args.seed)
+    settings.BOOKS_DENORMALIZED_AUTHORS = args.denormalized
+    settings.EXTERNAL_BOOKS_UPSTREAM = dict(settings.EXTERNAL_BOOKS_UPSTREAM)
+    # Every request comes from one client, which the rate limit would refuse.
+    settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, RATE=None)
+    report = {
+        'meta': {'books': args.books, 'seed': args.seed, 'requests': args.requests,
+                 'denormalized': args.denormalized,
+                 'python': platform.python_version(), 'django': django.get_version(),
+                 'database': settings.DATABASES['default']['ENGINE'],
+                 'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z')},
+        'scenarios': {},
+    }
+    client = Client()
+    created = []
+    with UpstreamServer(books=[]) as server:
+        settings.EXTERNAL_BOOKS_UPSTREAM['BASE_URL'] = server.url
+        upstream.reset_client()
+        for name, request in scenarios():
+            if args.scenario and name not in args.scenario and \
+                    not any(fnmatch.fnmatch(name, pattern) for pattern in args.scenario):
+                continue
+            writes_created = name in ('update', 'destroy')
+            if writes_created and len(created) < args.requests:
+                print('{:<50} skipped, needs the create scenario'.format(name), file=sys.stderr)
+                continue
+            # Seeded per scenario so running a subset sends the same requests.
+            state = {'rng': random.Random('{}:{}'.format(args.seed, name)), 'books': args.books,
+                     'counter': itertools.count(), 'created': created}
+            warmup = 0 if writes_created else args.warmup
+            result = report['scenarios'][name] = measure(client, request, state, args.requests, warmup)
+            print('{:<50} {throughput:>9.1f} req/s p50 {p50_ms:>8.3f} p95 {p95_ms:>8.3f} p99 {p99_ms:>8.3f} ms '
+                  '{queries_mean:>6} queries'.format(name, **result), file=sys.stderr)
+    # Keep the catalogue as seeded for the next run on the same database.
+    Book.objects.filter(pk__in=created).delete()
+    return report
+
+
+def compare(base, head, tolerance):
+    """Rows of (scenario, metric, base, head, regressed) for scenarios in both runs."""
+    rows = []
+    for name, before in base['scenarios'].items():
+        after = head['scenarios'].get(name)
+        if after is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            rows.append((name, metric, before[metric], after[metric],
+                         after[metric] > before[metric] * (1 + tolerance)))
+        rows.append((name, 'throughput', before['throughput'], after['throughput'],
+                     after['throughput'] < before['throughput'] * (1 - tolerance)))
+        rows.append((name, 'queries_max', before['queries_max'], after['queries_max'],
+                     after['queries_max'] > before['queries_max']))
+    return rows
+
+
+def run_command(args):
+    if args.database:
+        setup_django(os.path.abspath(args.database))
+        report = run(args)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            setup_django(os.path.join(directory, 'bench.sqlite3'))
+            report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+def compare_command(args):
+    with open(args.base) as base_file, open(args.head) as head_file:
+        rows = compare(json.load(base_file), json.load(head_file), args.tolerance)
+    regressions = 0
+    print('{:<50} {:<12} {:>12} {:>12} {:>8}'.format('scenario', 'metric', 'base', 'head', 'change'))
+    for name, metric, before, after, regressed in rows:
+        change = (after - before) / before if before else 0
+        regressions += regressed
+        print('{:<50} {:<12} {:>12} {:>12} {:>+8.1%}{}'.format(
+            name, metric, before, after, change, '  REGRESSION' if regressed else ''))
+    print('{} regression(s), tolerance {:.0%}'.format(regressions, args.tolerance))
+    if regressions:
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="Seed a catalogue and benchmark every scenario.")
+    run_parser.add_argument('--books', type=int, default=10000)
+    run_parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario.")
+    run_parser.add_argument('--warmup', type=int, default=20)
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--scenario', action='append',
+                            help="Only run this scenario, or those matching a glob such as 'list*'. Repeatable.")
+    run_parser.add_argument('--denormalized', action='store_true',
+                            help="Read authors from Book.author_names (BOOKS_DENORMALIZED_AUTHORS).")
+    run_parser.add_argument('--database', help="SQLite file to seed or reuse, a temporary one by default.")
+    run_parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+    run_parser.set_defaults(handler=run_command)
+    compare_parser = commands.add_parser('compare', help="Flag regressions between two reports.")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--tolerance', type=float, default=0.1,
+                                help="Allowed relative change before flagging, 0.1 by default.")
+    compare_parser.set_defaults(handler=compare_command)
+    args = parser.parse_args(argv)
+    args.handler(args)
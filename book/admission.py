@@ -0,0 +1,318 @@
+"""Admission control for the external books proxy.
+
+An API of Ice and Fire can take seconds to answer when it is slow. Unbounded,
+every worker thread ends up waiting on it and book API requests queue behind
+them. ExternalBook therefore, as configured by ``EXTERNAL_BOOKS_ADMISSION``:
+
+- rate limits each client address with a token bucket of ``BURST`` requests
+  refilled at ``RATE`` per second, answering 429 once it is empty;
+- makes at most ``MAX_IN_FLIGHT`` upstream calls at once per process, and with
+  ``SHARED_CACHE_ALIAS`` at most ``SHARED_MAX_IN_FLIGHT`` over all processes
+  using that cache. Up to ``MAX_QUEUE`` more requests wait up to ``MAX_WAIT``
+  seconds for a slot. The others, and those not expected to get one in time
+  at the recent call duration, are answered 503 at once.
+
+AsyncExternalBook applies the same rate limit, and makes at most
+``MAX_IN_FLIGHT`` upstream calls at once per event loop, each waiting up to
+``MAX_WAIT`` seconds for a slot on the loop rather than blocking it.
+
+Both answers carry Retry-After. Requests served from the mirror or the cache
+take no slot, and the cache serves a stale answer instead of a 503 when it has
+one. Requests waiting for another's fetch of the same book are held to
+``MAX_QUEUE`` and ``MAX_WAIT`` as well, see ExternalBookCache.
+"""
+
+import asyncio
+import itertools
+import math
+import os
+import random
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+
+from book.metrics import external_admission_total
+
+
+class AdmissionRejected(requests.exceptions.ConnectionError):
+    """Raised without contacting the upstream when no call slot is free in time."""
+
+    def __init__(self, retry_after, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(wait):
+    """``wait`` as a Retry-After value, whole seconds and at least one."""
+    return max(1, math.ceil(wait))
+
+
+class TokenBucket:
+    """``burst`` tokens, refilled at ``rate`` per second."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def take(self):
+        """Take a token, returning 0, or the seconds until one is available."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """A TokenBucket per client for the ``max_clients`` clients seen last.
+
+    A client forgotten to make room for others starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """Take a token of ``client``, returning 0, or the seconds until one is available."""
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, self.clock)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            return bucket.take()
+
+
+class SharedSlots:
+    """``size`` call slots shared by the processes using ``cache``, each a key taken with ``add``.
+
+    The slot of a process that died without releasing it frees itself after
+    ``lease`` seconds, which must exceed the longest upstream call. A slot held
+    past its lease may meanwhile be taken by another process, so releasing
+    checks that it still holds the caller's token. Caches offer no atomic
+    compare and delete: a slot taken between that check and the delete is
+    freed early, letting one call more than ``size`` run until it is released.
+    """
+
+    key_prefix = 'external-books-slot:'
+
+    def __init__(self, cache, size, lease):
+        self.cache = cache
+        self.size = size
+        self.lease = lease
+
+    def acquire(self):
+        """Take a free slot, returning its key and token for release, or None when all are taken."""
+        token = uuid.uuid4().hex
+        # From a random start, so that processes do not all contend for the first slots.
+        start = random.randrange(self.size)
+        for index in itertools.chain(range(start, self.size), range(start)):
+            key = self.key_prefix + str(index)
+            if self.cache.add(key, token, self.lease):
+                return key, token
+        return None
+
+    def release(self, slot):
+        key, token = slot
+        if self.cache.get(key) == token:
+            self.cache.delete(key)
+
+
+class ConcurrencyLimiter:
+    """At most ``max_in_flight`` callers inside ``slot()`` at once, with ``max_queue`` more waiting.
+
+    A caller waits up to ``max_wait`` seconds for a slot, and is rejected at once
+    when the queue is full or the expected wait, from the average time a slot is
+    held, is longer. With ``shared`` a SharedSlots slot is needed too, checked
+    for every ``poll_interval`` seconds.
+    """
+
+    # Weight of the latest call in the average slot time.
+    SMOOTHING = 0.2
+
+    def __init__(self, max_in_flight, max_queue, max_wait, shared=None, poll_interval=0.05, clock=time.monotonic):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.in_flight = 0
+        self.waiting = 0
+        self.average = 0
+        self._condition = threading.Condition()
+
+    def expected_wait(self):
+        """Seconds a new caller would wait for a slot, assuming callers keep them for the average time."""
+        return (self.waiting + 1) / self.max_in_flight * self.average
+
+    def _reject(self, wait):
+        external_admission_total.inc(result='shed')
+        raise AdmissionRejected(retry_after_seconds(wait), "Too many upstream calls in flight.")
+
+    def _acquire(self, deadline):
+        with self._condition:
+            if self.in_flight < self.max_in_flight:
+                self.in_flight += 1
+                return
+            wait = self.expected_wait()
+            if self.waiting >= self.max_queue or wait > self.max_wait:
+                self._reject(wait)
+            self.waiting += 1
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self._reject(self.expected_wait())
+                    self._condition.wait(remaining)
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+
+    def _release(self, held=None):
+        with self._condition:
+            self.in_flight -= 1
+            if held is not None:
+                self.average += self.SMOOTHING * (held - self.average)
+            self._condition.notify()
+
+    def _acquire_shared(self, deadline):
+        while True:
+            slot = self.shared.acquire()
+            if slot is not None:
+                return slot
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                self._reject(self.average)
+            time.sleep(min(self.poll_interval, remaining))
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for one upstream call, raising AdmissionRejected when none is free in time."""
+        deadline = self.clock() + self.max_wait
+        self._acquire(deadline)
+        try:
+            shared_slot = self._acquire_shared(deadline) if self.shared is not None else None
+        except AdmissionRejected:
+            self._release()
+            raise
+        external_admission_total.inc(result='admitted')
+        start = self.clock()
+        try:
+            yield
+        finally:
+            if shared_slot is not None:
+                self.shared.release(shared_slot)
+            self._release(self.clock() - start)
+
+
+_limiters = None
+_limiters_key = None
+_limiters_lock = threading.Lock()
+
+
+def _build(config):
+    shared = None
+    if config['SHARED_CACHE_ALIAS']:
+        shared = SharedSlots(caches[config['SHARED_CACHE_ALIAS']], config['SHARED_MAX_IN_FLIGHT'],
+                             config['SHARED_LEASE'])
+    concurrency = ConcurrencyLimiter(config['MAX_IN_FLIGHT'], config['MAX_QUEUE'], config['MAX_WAIT'], shared)
+    rate = RateLimiter(config['RATE'], config['BURST'], config['MAX_CLIENTS']) if config['RATE'] else None
+    return concurrency, rate
+
+
+def get_limiters():
+    """This process's ConcurrencyLimiter and RateLimiter, or None without ``RATE``.
+
+    They are built again after a fork or a change of ``EXTERNAL_BOOKS_ADMISSION``.
+    """
+    global _limiters, _limiters_key
+    config = settings.EXTERNAL_BOOKS_ADMISSION
+    key = (os.getpid(), sorted(config.items()))
+    with _limiters_lock:
+        if _limiters is None or _limiters_key != key:
+            _limiters = _build(config)
+            _limiters_key = key
+        return _limiters
+
+
+# Per event loop, as asyncio primitives belong to the loop they are used on.
+_async_slots = weakref.WeakKeyDictionary()
+
+
+def reset():
+    global _limiters
+    with _limiters_lock:
+        _limiters = None
+    _async_slots.clear()
+
+
+def upstream_slot():
+    """ConcurrencyLimiter.slot of this process."""
+    return get_limiters()[0].slot()
+
+
+@asynccontextmanager
+async def async_upstream_slot():
+    """Hold one of the ``MAX_IN_FLIGHT`` upstream call slots of the running loop.
+
+    Waits up to ``MAX_WAIT`` seconds for one, then raises AdmissionRejected.
+    """
+    config = settings.EXTERNAL_BOOKS_ADMISSION
+    loop = asyncio.get_running_loop()
+    size, semaphore = _async_slots.get(loop, (None, None))
+    if size != config['MAX_IN_FLIGHT']:
+        size, semaphore = _async_slots[loop] = config['MAX_IN_FLIGHT'], asyncio.Semaphore(config['MAX_IN_FLIGHT'])
+    try:
+        await asyncio.wait_for(semaphore.acquire(), config['MAX_WAIT'])
+    except asyncio.TimeoutError:
+        external_admission_total.inc(result='shed')
+        raise AdmissionRejected(retry_after_seconds(config['MAX_WAIT']), "Too many upstream calls in flight.")
+    external_admission_total.inc(result='admitted')
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def client_address(request):
+    """The client address of ``request``, as seen by the outermost of the TRUSTED_PROXY_HOPS proxies.
+
+    A client can send CLIENT_IP_HEADER itself, so only the entries appended by
+    the trusted proxies, the last ones, are used.
+    """
+    config = settings.EXTERNAL_BOOKS_ADMISSION
+    header = config['CLIENT_IP_HEADER']
+    addresses = [address.strip() for address in request.META.get(header, '').split(',')] if header else []
+    if not addresses or not addresses[0]:
+        return request.META.get('REMOTE_ADDR', '')
+    return addresses[-min(config['TRUSTED_PROXY_HOPS'], len(addresses))]
+
+
+def rate_limit(request):
+    """Take a token of the client of ``request``, returning None, or the Retry-After seconds when it has none."""
+    rate = get_limiters()[1]
+    wait = rate.take(client_address(request)) if rate is not None else 0
+    if not wait:
+        return None
+    external_admission_total.inc(result='rate_limited')
+    return retry_after_seconds(wait)
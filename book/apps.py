@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BookConfig(AppConfig):
     name = 'book'
+
+    def ready(self):
+        from book import signals  # noqa: F401
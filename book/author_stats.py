@@ -0,0 +1,112 @@
+"""Per author book aggregates kept in AuthorStats.
+
+BookViewSet writes apply the change of one book to its authors' rows with
+relative UPDATEs. Only removing a book whose release date is an author's first
+or last one recomputes that author, from their own books. Bulk writes recompute
+the authors they touched. ``reconcile`` recomputes every author, to repair
+rows that drifted through writes made elsewhere, e.g. raw SQL or the ORM.
+"""
+
+from collections import namedtuple
+
+from django.db.models import Count, DateField, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from book.models import Author, AuthorStats, Book
+
+STATS_FIELDS = ('book_count', 'total_pages', 'first_release_date', 'last_release_date')
+
+# What of a book the stats of its authors depend on.
+BookFacts = namedtuple('BookFacts', 'authors pages release_date')
+
+
+def facts(book, authors=None):
+    """The BookFacts of saved ``book``, reading its authors unless ``authors`` gives their pks."""
+    if authors is None:
+        authors = Book.authors.through.objects.filter(book_id=book.pk).values_list('author_id', flat=True)
+    return BookFacts(frozenset(authors), book.number_of_pages, book.release_date)
+
+
+def record(before, after):
+    """Update the stats for a book that changed from BookFacts ``before`` to ``after``.
+
+    Either is None for a created or deleted book. To be called in the writing
+    transaction, after the write.
+    """
+    before_authors = before.authors if before else frozenset()
+    after_authors = after.authors if after else frozenset()
+    if before and after and (before.pages, before.release_date) == (after.pages, after.release_date):
+        before_authors, after_authors = before_authors - after_authors, after_authors - before_authors
+    if before_authors:
+        # Recomputed authors already count the book as it is now.
+        after_authors = after_authors - _remove(before_authors, before)
+    if after_authors:
+        _add(after_authors, after)
+
+
+def _add(author_ids, book):
+    date = Value(book.release_date, output_field=DateField())
+    AuthorStats.objects.bulk_create([AuthorStats(author_id=author_id) for author_id in author_ids],
+                                    ignore_conflicts=True)
+    # Least and Greatest are NULL on SQLite when either side is.
+    AuthorStats.objects.filter(author_id__in=author_ids).update(
+        book_count=F('book_count') + 1, total_pages=F('total_pages') + book.pages,
+        first_release_date=Coalesce(Least('first_release_date', date), date),
+        last_release_date=Coalesce(Greatest('last_release_date', date), date))
+
+
+def _remove(author_ids, book):
+    """Take ``book`` out of the stats of ``author_ids``, returning the authors it recomputed."""
+    AuthorStats.objects.filter(author_id__in=author_ids).update(
+        book_count=F('book_count') - 1, total_pages=F('total_pages') - book.pages)
+    bounds = Q(first_release_date=book.release_date) | Q(last_release_date=book.release_date)
+    recomputed = set(AuthorStats.objects.filter(bounds, author_id__in=author_ids).values_list('author_id', flat=True))
+    refresh(recomputed)
+    return recomputed
+
+
+def compute(author_ids):
+    """AuthorStats of ``author_ids`` computed from their books, in one query."""
+    rows = Book.authors.through.objects.filter(author_id__in=author_ids).values('author_id').annotate(
+        book_count=Count('book_id'), total_pages=Sum('book__number_of_pages'),
+        first_release_date=Min('book__release_date'), last_release_date=Max('book__release_date'))
+    stats = {row['author_id']: AuthorStats(**row) for row in rows}
+    return [stats.get(author_id) or AuthorStats(author_id=author_id) for author_id in author_ids]
+
+
+def refresh(author_ids, batch_size=500):
+    """Recompute the stats of ``author_ids``, two queries per batch."""
+    author_ids = list(author_ids)
+    for start in range(0, len(author_ids), batch_size):
+        AuthorStats.objects.bulk_create(compute(author_ids[start:start + batch_size]), update_conflicts=True,
+                                        unique_fields=['author'], update_fields=STATS_FIELDS)
+
+
+def _values(stats):
+    return tuple(getattr(stats, field) for field in STATS_FIELDS)
+
+
+def reconcile(batch_size=1000, fix=True):
+    """Compare every author's stats with their books, returning the drifted author pks.
+
+    With ``fix`` the drifted rows are rewritten.
+    """
+    drifted = []
+    last = None
+    while True:
+        authors = Author.objects.order_by('pk')
+        if last is not None:
+            authors = authors.filter(pk__gt=last)
+        batch = list(authors.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return drifted
+        last = batch[-1]
+        stored = {row[0]: row[1:] for row in AuthorStats.objects.filter(author_id__in=batch)
+                  .values_list('author_id', *STATS_FIELDS)}
+        # A missing row stands for an author without books.
+        wrong = [stats for stats in compute(batch)
+                 if stored.get(stats.author_id, (0, 0, None, None)) != _values(stats)]
+        drifted.extend(stats.author_id for stats in wrong)
+        if fix and wrong:
+            AuthorStats.objects.bulk_create(wrong, update_conflicts=True, unique_fields=['author'],
+                                            update_fields=STATS_FIELDS)
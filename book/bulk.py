@@ -0,0 +1,132 @@
+"""Batched creation and upsert of books."""
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from book import author_stats, changes, denorm, facets, search
+from book.isbn import canonical_isbn
+from book.models import Author, Book, TableVersion
+from book.serializers import BookBulkItemSerializer
+
+CREATED = 'created'
+UPDATED = 'updated'
+ERROR = 'error'
+
+
+def chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def resolve_authors(names, batch_size=500):
+    """Return a ``{name: pk}`` map for ``names``, creating the authors that are missing.
+
+    Costs one ``IN`` query per ``batch_size`` names, and an ``INSERT`` and a second
+    ``IN`` query for the batches with missing authors: rows skipped as conflicts,
+    created meanwhile by another writer, get no pk from the ``INSERT``.
+    """
+    pks = {}
+    for batch in chunks(set(names), batch_size):
+        pks.update(Author.objects.filter(name__in=batch).values_list('name', 'pk'))
+        missing = [name for name in batch if name not in pks]
+        if missing:
+            Author.objects.bulk_create([Author(name=name) for name in missing], ignore_conflicts=True)
+            pks.update(Author.objects.filter(name__in=missing).values_list('name', 'pk'))
+    return pks
+
+
+def _validate(items, results):
+    validator = BookBulkItemSerializer()
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, validator.run_validation(item)))
+        except ValidationError as exc:
+            results[index] = {'index': index, 'status': ERROR, 'errors': exc.detail}
+    return valid
+
+
+def _books_by_isbn(isbns, batch_size):
+    """The books of the canonical ISBNs ``isbns`` by canonical ISBN, the oldest of several with the same one."""
+    by_isbn = {}
+    for batch in chunks(isbns, batch_size):
+        for book in Book.objects.filter(isbn13__in=batch).order_by('-pk'):
+            by_isbn[book.isbn13] = book
+    return by_isbn
+
+
+def _write_book_authors(book_authors, replaced_pks, author_pks, batch_size):
+    """Write the authors of the books, returning the pks of the authors that replaced books had."""
+    through = Book.authors.through
+    previous = set()
+    for batch in chunks(replaced_pks, batch_size):
+        previous.update(through.objects.filter(book_id__in=batch).values_list('author_id', flat=True))
+        through.objects.filter(book_id__in=batch).delete()
+    through.objects.bulk_create([through(book_id=book.pk, author_id=author_pks[name])
+                                 for book, names in book_authors for name in names],
+                                batch_size=batch_size)
+    return previous
+
+
+def bulk_upsert_books(items, batch_size=500, upsert_on_isbn=False):
+    """Validate and write ``items`` in one transaction, returning one result per item.
+
+    Books, authors and ``Book.authors`` rows are written with ``bulk_create`` in
+    batches of ``batch_size``, then indexed for search, the stats of their
+    authors are recomputed and their facet counts updated. With ``upsert_on_isbn``
+    an item whose ISBN, in any form (see book.isbn), is already stored or repeated
+    earlier in ``items`` updates that book and replaces its authors, the oldest
+    book when several have it. Invalid items are reported and skipped.
+    """
+    results = [None] * len(items)
+    valid = _validate(items, results)
+    book_fields = [field.name for field in Book._meta.concrete_fields if not field.primary_key]
+
+    now = timezone.now()
+    with transaction.atomic():
+        author_pks = resolve_authors((name for _, data in valid for name in data['authors']), batch_size)
+        by_isbn = _books_by_isbn({canonical_isbn(data['isbn']) for _, data in valid}, batch_size) \
+            if upsert_on_isbn else {}
+
+        to_create, to_update, book_authors, item_books, before = [], {}, {}, [], {}
+        for index, data in valid:
+            authors = data.pop('authors')
+            book = by_isbn.get(canonical_isbn(data['isbn']))
+            if book is None:
+                book = Book(**data)
+                to_create.append(book)
+                item_books.append((index, book, CREATED))
+            else:
+                if book.pk is not None and book.pk not in before:
+                    before[book.pk] = facets.values(book)
+                for field, value in data.items():
+                    setattr(book, field, value)
+                # bulk_update does not apply auto_now.
+                book.updated_at = now
+                if book.pk is not None:
+                    to_update[book.pk] = book
+                item_books.append((index, book, UPDATED))
+            # bulk_create and bulk_update do not call save.
+            book.isbn13 = canonical_isbn(book.isbn)
+            if upsert_on_isbn:
+                by_isbn[book.isbn13] = book
+            book_authors[id(book)] = (book, list(dict.fromkeys(authors)))
+
+        Book.objects.bulk_create(to_create, batch_size=batch_size)
+        Book.objects.bulk_update(list(to_update.values()), book_fields, batch_size=batch_size)
+        previous_authors = _write_book_authors(book_authors.values(), to_update, author_pks, batch_size)
+        # bulk_create and bulk_update send no signals.
+        book_ids = [book.pk for book, _ in book_authors.values()]
+        search.index_books(book_ids, batch_size)
+        denorm.refresh_author_names(book_ids, batch_size)
+        author_stats.refresh(previous_authors.union(author_pks.values()), batch_size)
+        facets.record([(before.get(book.pk), facets.values(book)) for book, _ in book_authors.values()])
+        if book_authors:
+            TableVersion.objects.bump(Book)
+            changes.record(book_ids)
+
+    for index, book, status in item_books:
+        results[index] = {'index': index, 'status': status, 'id': book.pk}
+    return results
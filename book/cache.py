@@ -0,0 +1,176 @@
+"""Response cache for the external books endpoint."""
+
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from requests.exceptions import HTTPError, ConnectionError, Timeout
+
+from book.admission import AdmissionRejected, retry_after_seconds
+from book.metrics import external_admission_total, external_cache_total
+
+
+def normalize_name(name):
+    """Strip and collapse whitespace so equivalent queries share one cache entry."""
+    return ' '.join(name.split())
+
+
+class ExternalBookCache:
+    """Cache of already transformed external books payloads keyed on the book name.
+
+    Entries live in the ``EXTERNAL_BOOKS_CACHE_ALIAS`` cache for ``ttl + stale_ttl``
+    seconds. Within ``ttl`` they are served as fresh, after that only when the
+    upstream fails. Concurrent misses for the same key in one process share a single
+    upstream fetch, among threads with ``get_or_fetch`` and among the tasks of an
+    event loop with ``aget_or_fetch``. Threads waiting on another's fetch give up
+    after the admission ``MAX_WAIT``, as requests queued for a call slot do.
+    """
+
+    key_prefix = 'external-books:'
+
+    def __init__(self):
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._flights = {}
+
+    @property
+    def backend(self):
+        return caches[settings.EXTERNAL_BOOKS_CACHE_ALIAS]
+
+    @property
+    def ttl(self):
+        return settings.EXTERNAL_BOOKS_CACHE_TTL
+
+    @property
+    def stale_ttl(self):
+        return settings.EXTERNAL_BOOKS_CACHE_STALE_TTL
+
+    def make_key(self, name):
+        digest = hashlib.sha1(normalize_name(name).encode('utf-8')).hexdigest()
+        return self.key_prefix + digest
+
+    @contextmanager
+    def _single_flight(self, key):
+        """Hold the fetch lock of ``key``.
+
+        Raises AdmissionRejected at once when ``MAX_QUEUE`` threads already wait
+        for it, or when it is not got within ``MAX_WAIT`` seconds.
+        """
+        config = settings.EXTERNAL_BOOKS_ADMISSION
+        retry_after = retry_after_seconds(config['MAX_WAIT'])
+        with self._locks_guard:
+            lock, waiters = self._locks.get(key, (None, 0))
+            # The holder of the lock counts among the waiters.
+            if waiters > config['MAX_QUEUE']:
+                external_admission_total.inc(result='shed')
+                raise AdmissionRejected(retry_after, "Too many requests waiting for the fetch in flight.")
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, waiters + 1)
+        try:
+            if not lock.acquire(timeout=config['MAX_WAIT']):
+                external_admission_total.inc(result='shed')
+                raise AdmissionRejected(retry_after, "Timed out waiting for the fetch in flight.")
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            with self._locks_guard:
+                lock, waiters = self._locks[key]
+                if waiters == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, waiters - 1)
+
+    def _fresh(self, entry):
+        return entry is not None and entry['expires_at'] > time.time()
+
+    def get_or_fetch(self, name, fetch):
+        """Return the cached payload for ``name``, calling ``fetch()`` on a miss.
+
+        When ``fetch`` raises HTTPError, ConnectionError or Timeout, or the wait for
+        another thread's fetch times out, and a stale entry is still held, the stale
+        payload is returned instead of the error.
+        """
+        key = self.make_key(name)
+        entry = self.backend.get(key)
+        if self._fresh(entry):
+            external_cache_total.inc(result='hit')
+            return entry['data']
+
+        try:
+            with self._single_flight(key):
+                entry = self.backend.get(key)
+                if self._fresh(entry):
+                    external_cache_total.inc(result='hit')
+                    return entry['data']
+                external_cache_total.inc(result='miss')
+                try:
+                    data = fetch()
+                except (HTTPError, ConnectionError, Timeout):
+                    if entry is None:
+                        raise
+                    external_cache_total.inc(result='stale')
+                    return entry['data']
+                self.backend.set(key, self._entry(data), self.ttl + self.stale_ttl)
+                return data
+        except AdmissionRejected:
+            # Timed out behind another thread's fetch.
+            if entry is None:
+                raise
+            external_cache_total.inc(result='stale')
+            return entry['data']
+
+    def _entry(self, data):
+        return {'data': data, 'expires_at': time.time() + self.ttl}
+
+    async def aget_or_fetch(self, name, fetch):
+        """Async ``get_or_fetch``, awaiting the coroutine function ``fetch`` on a miss.
+
+        Cancelling a caller does not cancel the shared fetch, which still fills the
+        cache for the next request.
+        """
+        key = self.make_key(name)
+        entry = await self.backend.aget(key)
+        if self._fresh(entry):
+            external_cache_total.inc(result='hit')
+            return entry['data']
+
+        flight = self._flights.get((asyncio.get_running_loop(), key))
+        if flight is None:
+            external_cache_total.inc(result='miss')
+            flight = asyncio.ensure_future(self._afetch(key, entry, fetch))
+            self._flights[flight.get_loop(), key] = flight
+            flight.add_done_callback(lambda done: self._land(done, key))
+        else:
+            # Served by another request's fetch, as waiters of the sync path are.
+            external_cache_total.inc(result='hit')
+        return await asyncio.shield(flight)
+
+    async def _afetch(self, key, entry, fetch):
+        try:
+            data = await fetch()
+        except (HTTPError, ConnectionError, Timeout):
+            if entry is None:
+                raise
+            external_cache_total.inc(result='stale')
+            return entry['data']
+        await self.backend.aset(key, self._entry(data), self.ttl + self.stale_ttl)
+        return data
+
+    def _land(self, flight, key):
+        del self._flights[flight.get_loop(), key]
+        if not flight.cancelled():
+            # Mark the error retrieved when every caller gave up waiting.
+            flight.exception()
+
+    def invalidate(self, name):
+        self.backend.delete(self.make_key(name))
+
+
+external_book_cache = ExternalBookCache()
@@ -0,0 +1,105 @@
+"""Change feed of the books.
+
+BookChange gets a row for every book that BookViewSet writes, author changes
+included, for every book of a bulk write and for the books of a renamed or
+deleted author, in the writing transaction. Rows are appended after the
+TableVersion bump, whose row lock orders concurrent writers, so their ids grow
+in commit order and serve as the feed's cursor. Other book writes, e.g. raw SQL
+or the ORM, are not logged.
+
+``read`` returns the changes after a cursor with each book as it is now, or as
+a tombstone once it is deleted. Consumers applying them in order, from a cursor
+taken before they listed the books, hold the same books. ``compact`` drops
+changes superseded by a later one for the same book, which a consumer never
+needs, and tombstones older than a retention period, after which consumers
+behind them must list the books again.
+"""
+
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
+
+from book.models import Book, BookChange, BookChangeHorizon
+from book.serializers import book_read_fields, serialize_book_rows
+
+# ``changes`` in cursor order, ``cursor`` to read the next ones from and whether
+# more are waiting.
+Page = namedtuple('Page', 'changes cursor more')
+
+
+def record(book_ids, action=BookChange.UPSERT):
+    """Log a change of ``book_ids``, to be called in the writing transaction after TableVersion.bump."""
+    now = timezone.now()
+    BookChange.objects.bulk_create([BookChange(book_id=book_id, action=action, changed_at=now)
+                                    for book_id in book_ids])
+
+
+def horizon():
+    """The cursor consumers must be past, or list the books again, as tombstones up to it were removed."""
+    return BookChangeHorizon.objects.values_list('cursor', flat=True).first() or 0
+
+
+def latest_cursor():
+    return BookChange.objects.aggregate(cursor=Max('pk'))['cursor'] or 0
+
+
+def read(since, size):
+    """The Page of up to ``size`` changes after cursor ``since``, reading the changed books once.
+
+    Of several changes of a book in the page only the last is returned.
+    """
+    rows = list(BookChange.objects.filter(pk__gt=since).order_by('pk').values_list('pk', 'book_id')[:size + 1])
+    more = len(rows) > size
+    rows = rows[:size]
+    last = {book_id: cursor for cursor, book_id in rows}
+    books = {row['id']: row for row in serialize_book_rows(list(
+        Book.objects.filter(pk__in=last).values(*book_read_fields())))} if last else {}
+    changes = [{'cursor': cursor, 'id': book_id,
+                'action': BookChange.UPSERT if book_id in books else BookChange.DELETE,
+                'book': books.get(book_id)}
+               for cursor, book_id in rows if last[book_id] == cursor]
+    return Page(changes, rows[-1][0] if rows else since, more)
+
+
+def wait(since, timeout):
+    """Wait up to ``timeout`` seconds for a change after ``since``, returning whether one came.
+
+    Checks every BOOKS_CHANGES_POLL_INTERVAL seconds with one query.
+    """
+    deadline = time.monotonic() + timeout
+    while not BookChange.objects.filter(pk__gt=since).exists():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(settings.BOOKS_CHANGES_POLL_INTERVAL, remaining))
+    return True
+
+
+def compact(tombstone_age, batch_size=10000):
+    """Drop superseded changes and tombstones older than ``tombstone_age``, returning how many of each.
+
+    Superseded changes are deleted one transaction per ``batch_size`` cursors.
+    """
+    superseded = 0
+    bounds = BookChange.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is not None:
+        later = BookChange.objects.filter(book_id=OuterRef('book_id'), pk__gt=OuterRef('pk'))
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            with transaction.atomic():
+                superseded += BookChange.objects.filter(pk__gte=start, pk__lt=start + batch_size) \
+                    .filter(Exists(later)).delete()[0]
+    expired = BookChange.objects.filter(action=BookChange.DELETE, changed_at__lt=timezone.now() - tombstone_age)
+    with transaction.atomic():
+        newest = expired.aggregate(cursor=Max('pk'))['cursor']
+        if newest is None:
+            return superseded, 0
+        tombstones = expired.filter(pk__lte=newest).delete()[0]
+        state, _ = BookChangeHorizon.objects.select_for_update().get_or_create(pk=1)
+        if newest > state.cursor:
+            state.cursor = newest
+            state.save(update_fields=['cursor'])
+    return superseded, tombstones
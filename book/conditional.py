@@ -0,0 +1,40 @@
+"""Conditional GET and the shared list response cache of BookViewSet."""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def normalize_params(query_params):
+    """The query parameters sorted, blank values dropped, so equivalent queries compare equal."""
+    return tuple(sorted((key, value.strip()) for key, values in query_params.lists()
+                        for value in values if value.strip()))
+
+
+def make_etag(*parts):
+    """A strong ETag for a representation identified by ``parts``."""
+    return '"{}"'.format(hashlib.sha1(repr(parts).encode('utf-8')).hexdigest())
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def not_modified(request, etag, last_modified):
+    """The 304 (or 412) response the request preconditions call for, if any."""
+    # HTTP dates have a one second resolution.
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified and int(last_modified.timestamp()))
+    return response and set_validators(response, etag, last_modified)
+
+
+def list_cache():
+    """The cache holding list responses, None unless BOOKS_LIST_CACHE_ALIAS is set."""
+    alias = settings.BOOKS_LIST_CACHE_ALIAS
+    return caches[alias] if alias else None
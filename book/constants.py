@@ -3,7 +3,14 @@
 STATUS_CODES = {
     200: "success",
     404: "not found",
+    410: "gone",
     201: "success",
-    500: "internal server error"
+    202: "accepted",
+    400: "bad request",
+    429: "too many requests",
+    500: "internal server error",
+    502: "bad gateway",
+    503: "service unavailable",
+    504: "gateway timeout",
 }
 FIELDS_TO_EXCLUDE = ['url', 'mediaType', 'characters', 'povCharacters']
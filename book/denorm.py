@@ -0,0 +1,83 @@
+"""Author names stored on the book row.
+
+``Book.author_names`` holds the names of a book's authors in author order, each
+followed by SEPARATOR and the whole preceded by it, or is empty for a book
+without authors. Reading it spares the join through ``Book.authors`` when
+``BOOKS_DENORMALIZED_AUTHORS`` is set. The column is kept up to date whatever the
+setting: signals refresh it when ``Book.authors`` or an author changes, and bulk
+writes refresh the books they touch.
+
+Author names must not contain SEPARATOR, the ASCII unit separator.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from book.models import Book
+
+SEPARATOR = '\x1f'
+
+
+def enabled():
+    return settings.BOOKS_DENORMALIZED_AUTHORS
+
+
+def join_names(names):
+    return SEPARATOR + SEPARATOR.join(names) + SEPARATOR if names else ''
+
+
+def split_names(value):
+    return value[1:-1].split(SEPARATOR) if value else []
+
+
+def _names_by_book(book_ids):
+    names = defaultdict(list)
+    book_authors = Book.authors.through.objects.filter(book_id__in=book_ids) \
+        .order_by('author__name').values_list('book_id', 'author__name')
+    for book_id, author_name in book_authors:
+        names[book_id].append(author_name)
+    return names
+
+
+def refresh_author_names(book_ids, batch_size=500):
+    """Rewrite ``author_names`` of ``book_ids`` from ``Book.authors``, two queries per batch."""
+    book_ids = list(book_ids)
+    sql = 'UPDATE {} SET {} = %s WHERE {} = %s'.format(
+        Book._meta.db_table, Book._meta.get_field('author_names').column, Book._meta.pk.column)
+    with connection.cursor() as cursor:
+        for start in range(0, len(book_ids), batch_size):
+            batch = book_ids[start:start + batch_size]
+            names = _names_by_book(batch)
+            cursor.executemany(sql, [(join_names(names.get(book_id)), book_id) for book_id in batch])
+
+
+def _batches(batch_size):
+    """Book ids in ascending batches of ``batch_size``, reading one batch at a time."""
+    last = 0
+    while True:
+        batch = list(Book.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def rebuild(batch_size=5000):
+    """Refresh ``author_names`` of every book, returning the number of books."""
+    count = 0
+    for batch in _batches(batch_size):
+        refresh_author_names(batch, batch_size)
+        count += len(batch)
+    return count
+
+
+def find_inconsistent(batch_size=5000):
+    """Yield the ids of books whose ``author_names`` disagree with ``Book.authors``."""
+    for batch in _batches(batch_size):
+        names = _names_by_book(batch)
+        stored = Book.objects.filter(pk__in=batch).values_list('pk', 'author_names')
+        for book_id, author_names in stored:
+            if author_names != join_names(names.get(book_id)):
+                yield book_id
@@ -0,0 +1,51 @@
+"""Streaming export of the books catalogue."""
+
+import csv
+import json
+from itertools import islice
+
+from book.serializers import BOOK_FIELDS as FIELDS, book_read_fields, serialize_book_rows
+
+# Separates author names inside the single CSV authors column.
+CSV_AUTHORS_SEPARATOR = ';'
+
+
+def iter_books(queryset, chunk_size=2000):
+    """Yield the books of ``queryset`` as dicts with their author names.
+
+    Rows are read through a chunked cursor and authors are fetched with one query
+    per chunk, or read from the rows, so memory stays bounded by ``chunk_size``
+    whatever the table size.
+    """
+    rows = queryset.order_by('pk').values(*book_read_fields()).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from serialize_book_rows(chunk)
+
+
+def render_ndjson(books):
+    for book in books:
+        yield json.dumps(book) + '\n'
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(books):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS + ('authors',))
+    for book in books:
+        authors = CSV_AUTHORS_SEPARATOR.join(book.pop('authors'))
+        yield writer.writerow([book[field] for field in FIELDS] + [authors])
+
+
+FORMATS = {
+    'ndjson': (render_ndjson, 'application/x-ndjson'),
+    'csv': (render_csv, 'text/csv'),
+}
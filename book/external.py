@@ -0,0 +1,12 @@
+"""Payload transformation shared by the external books views, the mirror and imports."""
+
+from book.constants import FIELDS_TO_EXCLUDE
+
+
+def customized_json_response(list_of_data):
+    """Drop the fields the API does not expose from upstream books and add ``release_date``, in place."""
+    for json_response in list_of_data:
+        for field in FIELDS_TO_EXCLUDE:
+            json_response.pop(field)
+        release = json_response.pop('released').split('T')[0]
+        json_response['release_date'] = release
@@ -0,0 +1,186 @@
+"""Book counts per country, publisher and release year.
+
+BookFacetCount holds, for each value of every facet, the number of books with
+that value, overall and under a filter on one value of another facet.
+BookViewSet writes and bulk writes apply the change of each book to those rows
+in one upsert. ``from_rollup`` reads them for requests without filters or with a
+single country, publisher or release year filter. ``aggregate`` counts any other
+filtered queryset in one UNION ALL query. ``rebuild`` recomputes the rows, to
+repair those that drifted through writes made elsewhere, e.g. raw SQL or the ORM.
+"""
+
+from collections import defaultdict
+
+from django.db import connection, connections, transaction
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Cast, ExtractYear
+
+from book.models import Book, BookFacetCount
+
+FACETS = ('country', 'publisher', 'year')
+
+# BookFilter parameters the rollup rows answer, with the facet they filter.
+FILTERS = {'country': 'country', 'publisher': 'publisher', 'release_date': 'year'}
+
+# The number of books, under no filter.
+TOTAL = ('', '', '', '')
+
+
+def values(book):
+    """The facet values of ``book``, as stored in BookFacetCount."""
+    return {'country': book.country, 'publisher': book.publisher, 'year': str(book.release_date.year)}
+
+
+def _keys(book_values):
+    yield TOTAL
+    for facet in FACETS:
+        yield '', '', facet, book_values[facet]
+        for other in FACETS:
+            if other != facet:
+                yield other, book_values[other], facet, book_values[facet]
+
+
+def deltas(changes):
+    """The changes to BookFacetCount rows for ``(before, after)`` pairs of values(), None for no book."""
+    delta = defaultdict(int)
+    for before, after in changes:
+        if before == after:
+            continue
+        for key in _keys(before) if before else ():
+            delta[key] -= 1
+        for key in _keys(after) if after else ():
+            delta[key] += 1
+    return {key: count for key, count in delta.items() if count}
+
+
+def record(changes):
+    """Apply ``changes``, ``(before, after)`` pairs of values(), in one query.
+
+    To be called in the writing transaction. Rows are written in key order, so
+    that concurrent writers lock shared rows in the same order.
+    """
+    delta = deltas(changes)
+    if not delta:
+        return
+    quote = connection.ops.quote_name
+    table, count = quote(BookFacetCount._meta.db_table), quote('count')
+    sql = ('INSERT INTO {table} (filter_name, filter_value, facet, value, {count}) VALUES (%s, %s, %s, %s, %s) '
+           'ON CONFLICT (filter_name, filter_value, facet, value) '
+           'DO UPDATE SET {count} = {table}.{count} + excluded.{count}').format(table=table, count=count)
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [key + (delta[key],) for key in sorted(delta)])
+
+
+def rollup_filter(filters):
+    """The ``(filter_name, filter_value)`` of the rows answering ``filters``, or None.
+
+    ``filters`` maps the BookFilter parameters in use to their values.
+    """
+    if not filters:
+        return '', ''
+    if len(filters) > 1:
+        return None
+    (name, value), = filters.items()
+    facet = FILTERS.get(name)
+    if facet == 'year':
+        try:
+            value = str(int(value))
+        except ValueError:
+            return None
+    return (facet, value) if facet else None
+
+
+def _result(total, counts, size):
+    data = {'count': total}
+    for facet in FACETS:
+        top = sorted(counts[facet], key=lambda item: (-item[1], item[0]))[:size]
+        data[facet] = [{'value': int(value) if facet == 'year' else value, 'count': count} for value, count in top]
+    return data
+
+
+def _union_all(querysets):
+    """The rows of ``querysets`` in one UNION ALL query, which unlike QuerySet.union() may be sliced on SQLite."""
+    using = querysets[0].db
+    parts, params = [], []
+    for queryset in querysets:
+        sql, part_params = queryset.query.get_compiler(using=using).as_sql()
+        parts.append('SELECT * FROM ({}) AS part{}'.format(sql, len(parts)))
+        params.extend(part_params)
+    with connections[using].cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(parts), params)
+        return cursor.fetchall()
+
+
+def from_rollup(filter_name, filter_value, size):
+    """The facets of the books under one filter, or none, from BookFacetCount in one query."""
+    rows = BookFacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count')
+    # The books of the filtered value, or all of them: their number, and the only value of the filtered facet.
+    own = rows.filter(filter_name='', filter_value='', facet=filter_name, value=filter_value)
+    top = [rows.filter(filter_name=filter_name, filter_value=filter_value, facet=facet).order_by('-count', 'value')
+           [:size] for facet in FACETS if facet != filter_name]
+    total, counts = 0, defaultdict(list)
+    for facet, value, count in _union_all([own] + top):
+        if (facet, value) == (filter_name, filter_value):
+            total = count
+        if facet:
+            counts[facet].append((value, count))
+    return _result(total, counts, size)
+
+
+def _facet_expressions():
+    return {'country': F('country'), 'publisher': F('publisher'),
+            'year': Cast(ExtractYear('release_date'), output_field=CharField())}
+
+
+def aggregate(books, size):
+    """The facets of the ``books`` queryset, counted in one UNION ALL query."""
+    books = books.order_by()
+    parts = [books.annotate(facet=Value(''), value=Value('')).values('facet', 'value').annotate(count=Count('pk'))]
+    for facet, expression in _facet_expressions().items():
+        parts.append(books.annotate(facet=Value(facet), value=expression).values('facet', 'value')
+                     .annotate(count=Count('pk')))
+    total, counts = 0, defaultdict(list)
+    for row in parts[0].union(*parts[1:], all=True):
+        if row['facet']:
+            counts[row['facet']].append((row['value'], row['count']))
+        else:
+            total = row['count']
+    return _result(total, counts, size)
+
+
+def compute():
+    """Every BookFacetCount key with its count, aggregated from the books."""
+    books = Book.objects.annotate(**{'facet_' + facet: expression
+                                     for facet, expression in _facet_expressions().items()}).order_by()
+    counts = {}
+    total = books.count()
+    if total:
+        counts[TOTAL] = total
+    for facet in FACETS:
+        for value, count in books.values_list('facet_' + facet).annotate(count=Count('pk')):
+            counts['', '', facet, value] = count
+        for other in FACETS:
+            if other != facet:
+                rows = books.values_list('facet_' + other, 'facet_' + facet).annotate(count=Count('pk'))
+                for other_value, value, count in rows:
+                    counts[other, other_value, facet, value] = count
+    return counts
+
+
+def find_inconsistent():
+    """The keys of BookFacetCount rows whose count disagrees with the books, missing rows counting 0."""
+    expected = compute()
+    stored = {row[:4]: row[4] for row in BookFacetCount.objects.exclude(count=0).values_list(
+        'filter_name', 'filter_value', 'facet', 'value', 'count')}
+    return sorted(key for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key))
+
+
+def rebuild(batch_size=1000):
+    """Replace every BookFacetCount row with the counts of the books, returning the number of rows."""
+    with transaction.atomic():
+        counts = compute()
+        BookFacetCount.objects.all().delete()
+        BookFacetCount.objects.bulk_create([BookFacetCount(filter_name=key[0], filter_value=key[1], facet=key[2],
+                                                           value=key[3], count=count)
+                                            for key, count in counts.items()], batch_size=batch_size)
+    return len(counts)
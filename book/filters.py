@@ -0,0 +1,48 @@
+"""Filters for book endpoints."""
+
+import datetime
+
+import django_filters
+from django_filters.constants import EMPTY_VALUES
+
+from book.isbn import canonical_isbn
+from book.models import Book
+
+
+class YearFilter(django_filters.NumberFilter):
+    """Match a year of a date field with a half-open date range.
+
+    ``date >= Jan 1 AND date < Jan 1 of the next year`` is served by an index on
+    the field, where ``EXTRACT(year FROM date)`` forces a scan on every backend.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        try:
+            start = datetime.date(int(value), 1, 1)
+            end = datetime.date(int(value) + 1, 1, 1)
+        except (OverflowError, ValueError):
+            return qs.none()
+        return qs.filter(**{self.field_name + '__gte': start, self.field_name + '__lt': end})
+
+
+class ISBNFilter(django_filters.CharFilter):
+    """Match an ISBN written in any form through the indexed ``Book.isbn13``, see book.isbn."""
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return qs.filter(isbn13=canonical_isbn(value))
+
+
+class BookFilter(django_filters.FilterSet):
+    release_date = YearFilter(field_name="release_date")
+    # Exact name through the unique Author.name index and the indexed Book.authors table. Matching inside the
+    # denormalized Book.author_names would scan the books instead.
+    author = django_filters.CharFilter(field_name='authors__name')
+    isbn = ISBNFilter()
+
+    class Meta:
+        model = Book
+        fields = ['name', 'country', 'publisher', 'release_date']
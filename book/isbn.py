@@ -0,0 +1,31 @@
+"""Canonical form of the free-form ``Book.isbn``.
+
+``Book.isbn13`` holds the ISBN-13 of a book's ISBN, written with or without
+hyphens and spaces, so that books can be looked up by either form through one
+index. ISBN-10s get the 978 prefix and their ISBN-13 check digit. ISBN-13s and
+values that are neither, e.g. made up test ISBNs, are kept without separators
+and in upper case. Check digits are not verified, an ISBN with a wrong one is
+still stored and found.
+
+Book.save fills the column, and bulk writes do for the books they write.
+"""
+
+import re
+
+SEPARATORS = re.compile(r'[\s-]+')
+ISBN10 = re.compile(r'\d{9}[\dX]')
+
+
+def check_digit13(digits):
+    """The ISBN-13 check digit of the first 12 ``digits``."""
+    total = sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(digits[:12]))
+    return str(-total % 10)
+
+
+def canonical_isbn(value):
+    """The value ``Book.isbn13`` stores and lookups match for the ISBN ``value``."""
+    compact = SEPARATORS.sub('', value).upper()
+    if ISBN10.fullmatch(compact):
+        digits = '978' + compact[:9]
+        return digits + check_digit13(digits)
+    return compact
@@ -0,0 +1,173 @@
+"""DB backed queue of import jobs and the worker running them."""
+
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import Counter
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import DateTimeField, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from book import mirror
+from book.bulk import CREATED, ERROR, UPDATED, bulk_upsert_books
+from book.external import customized_json_response
+from book.models import ImportJob
+from book.upstream import get_client
+
+logger = logging.getLogger(__name__)
+
+# Claimable jobs looked at per claim, in case other workers win the first ones.
+CLAIM_CANDIDATES = 10
+
+
+class LeaseLost(Exception):
+    """Another worker claimed the job after this worker's lease ran out."""
+
+
+def submit_books(items, upsert_on_isbn=False):
+    return ImportJob.objects.create(kind=ImportJob.BOOKS, source=json.dumps(items), total=len(items),
+                                    upsert_on_isbn=upsert_on_isbn)
+
+
+def submit_external(query):
+    # Refreshing upstream books updates the ones imported before.
+    return ImportJob.objects.create(kind=ImportJob.EXTERNAL, query=query, upsert_on_isbn=True)
+
+
+def lease_end():
+    return timezone.now() + timedelta(seconds=settings.BOOK_JOBS['LEASE_SECONDS'])
+
+
+def claimable(now):
+    return Q(status=ImportJob.QUEUED) | Q(status=ImportJob.RUNNING, lease_expires_at__lt=now)
+
+
+def claim(owner):
+    """Lease the oldest queued or abandoned job to ``owner``, or return None.
+
+    The UPDATE only matches while the job is still claimable, so of several
+    workers racing for a job exactly one gets it, on SQLite as on databases with
+    row locks. Abandoned jobs out of attempts are failed instead.
+    """
+    now = timezone.now()
+    ImportJob.objects.filter(status=ImportJob.RUNNING, lease_expires_at__lt=now,
+                             attempts__gte=settings.BOOK_JOBS['MAX_ATTEMPTS']) \
+        .update(status=ImportJob.FAILED, error="Worker lease expired.", lease_owner='', lease_expires_at=None,
+                finished_at=now)
+    candidates = ImportJob.objects.filter(claimable(now)).order_by('id').values_list('id', flat=True)
+    for job_id in candidates[:CLAIM_CANDIDATES]:
+        claimed = ImportJob.objects.filter(claimable(now), pk=job_id).update(
+            status=ImportJob.RUNNING, lease_owner=owner, lease_expires_at=lease_end(),
+            attempts=F('attempts') + 1, started_at=Coalesce('started_at', Value(now, output_field=DateTimeField())))
+        if claimed:
+            return ImportJob.objects.get(pk=job_id)
+    return None
+
+
+def checkpoint(job, owner, **fields):
+    """Save ``fields`` and renew the lease, raising LeaseLost if ``owner`` no longer holds it."""
+    fields.setdefault('lease_expires_at', lease_end())
+    if not ImportJob.objects.filter(pk=job.pk, status=ImportJob.RUNNING, lease_owner=owner).update(**fields):
+        raise LeaseLost("Import job {} is no longer leased to {}.".format(job.pk, owner))
+
+
+def iter_external_books(name):
+    """Yield the upstream books named ``name`` as bulk items, page after page."""
+    client = get_client()
+    page = 1
+    while True:
+        response = client.get(mirror.BOOKS_PATH, params={'name': name, 'page': page, 'pageSize': mirror.PAGE_SIZE})
+        response.raise_for_status()
+        books = response.json()
+        customized_json_response(books)
+        for book in books:
+            yield {'name': book['name'], 'isbn': book['isbn'], 'authors': book['authors'],
+                   'number_of_pages': book['numberOfPages'], 'publisher': book['publisher'],
+                   'country': book['country'], 'release_date': book['release_date']}
+        if len(books) < mirror.PAGE_SIZE:
+            return
+        page += 1
+
+
+def iter_items(job):
+    if job.kind == ImportJob.BOOKS:
+        return iter(json.loads(job.source))
+    return iter_external_books(job.query)
+
+
+def run_job(job, owner):
+    """Import the items of ``job`` after the ones already processed, one chunk per transaction.
+
+    Each chunk commits together with the job's progress, so a job picked up again
+    after a crash neither skips nor repeats items.
+    """
+    config = settings.BOOK_JOBS
+    errors = json.loads(job.errors)
+    processed = job.processed
+    items = islice(iter_items(job), processed, None)
+    while True:
+        chunk = list(islice(items, config['CHUNK_SIZE']))
+        if not chunk:
+            break
+        with transaction.atomic():
+            results = bulk_upsert_books(chunk, batch_size=settings.BOOKS_BULK_BATCH_SIZE,
+                                        upsert_on_isbn=job.upsert_on_isbn)
+            counts = Counter(result['status'] for result in results)
+            errors.extend({'index': processed + result['index'], 'errors': result['errors']}
+                          for result in results if result['status'] == ERROR)
+            del errors[config['MAX_ERRORS']:]
+            processed += len(chunk)
+            checkpoint(job, owner, processed=processed, created=F('created') + counts[CREATED],
+                       updated=F('updated') + counts[UPDATED], failed=F('failed') + counts[ERROR],
+                       errors=json.dumps(errors))
+    checkpoint(job, owner, status=ImportJob.SUCCEEDED, total=processed, finished_at=timezone.now(),
+               lease_owner='', lease_expires_at=None)
+
+
+def release(job, owner, error):
+    """Requeue ``job`` after a failed attempt, or fail it once out of attempts."""
+    exhausted = job.attempts >= settings.BOOK_JOBS['MAX_ATTEMPTS']
+    ImportJob.objects.filter(pk=job.pk, lease_owner=owner).update(
+        status=ImportJob.FAILED if exhausted else ImportJob.QUEUED, error=str(error), lease_owner='',
+        lease_expires_at=None, finished_at=timezone.now() if exhausted else None)
+
+
+class Worker:
+    """Claim and run import jobs until stopped, or until none is left with ``once``."""
+
+    def __init__(self, once=False):
+        self.once = once
+        self.owner = '{}:{}:{}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self._stopping = threading.Event()
+
+    def stop(self, *args):
+        """Finish the current job, then return from ``run``. Usable as a signal handler."""
+        self._stopping.set()
+
+    def run(self):
+        done = 0
+        while not self._stopping.is_set():
+            close_old_connections()
+            job = claim(self.owner)
+            if job is None:
+                if self.once:
+                    break
+                self._stopping.wait(settings.BOOK_JOBS['POLL_INTERVAL'])
+                continue
+            try:
+                run_job(job, self.owner)
+            except LeaseLost as e:
+                logger.warning(str(e))
+            except Exception as e:
+                logger.exception("Import job %s failed.", job.pk)
+                release(job, self.owner, e)
+            done += 1
+        return done
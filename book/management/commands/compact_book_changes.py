@@ -0,0 +1,23 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from book import changes
+
+
+class Command(BaseCommand):
+    help = "Drop superseded changes and old tombstones from the book change feed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tombstone-days', type=float, default=None,
+                            help="Keep the tombstones of books deleted this recently, "
+                                 "BOOKS_CHANGES_TOMBSTONE_DAYS by default.")
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        days = options['tombstone_days']
+        age = datetime.timedelta(days=settings.BOOKS_CHANGES_TOMBSTONE_DAYS if days is None else days)
+        superseded, tombstones = changes.compact(age, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("Dropped {} superseded changes and {} tombstones.".format(
+            superseded, tombstones)))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from book import export
+from book.filters import BookFilter
+from book.models import Book
+
+
+class Command(BaseCommand):
+    help = "Stream books with their authors as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=sorted(export.FORMATS), default='ndjson')
+        parser.add_argument('--output', help="File to write to, standard output by default.")
+        parser.add_argument('--chunk-size', type=int, default=settings.BOOKS_EXPORT_CHUNK_SIZE)
+        for field in BookFilter.base_filters:
+            parser.add_argument('--' + field.replace('_', '-'), dest=field, help="Filter on {}.".format(field))
+
+    def handle(self, *args, **options):
+        params = {field: options[field] for field in BookFilter.base_filters if options[field] is not None}
+        book_filter = BookFilter(params, queryset=Book.objects.all())
+        if not book_filter.is_valid():
+            raise CommandError(book_filter.errors.as_text())
+
+        render, _ = export.FORMATS[options['type']]
+        chunks = render(export.iter_books(book_filter.qs, options['chunk_size']))
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from book import denorm
+
+
+class Command(BaseCommand):
+    help = "Rebuild the author names stored on books from Book.authors, or check them with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Report books whose stored author names are out of date, changing nothing.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['check']:
+            book_ids = list(denorm.find_inconsistent(options['batch_size']))
+            if book_ids:
+                raise CommandError("{} books have out of date author names, e.g. ids {}.".format(
+                    len(book_ids), ', '.join(map(str, book_ids[:10]))))
+            self.stdout.write(self.style.SUCCESS("Author names are consistent."))
+            return
+        count = denorm.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("Rebuilt author names of {} books.".format(count)))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from book import facets
+
+
+class Command(BaseCommand):
+    help = "Rebuild the book counts per country, publisher and release year, or check them with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Report facet counts that disagree with the books, changing nothing.")
+
+    def handle(self, *args, **options):
+        if options['check']:
+            keys = facets.find_inconsistent()
+            if keys:
+                raise CommandError("{} facet counts are out of date, e.g. {}.".format(
+                    len(keys), ', '.join('/'.join(filter(None, key)) or 'total' for key in keys[:10])))
+            self.stdout.write(self.style.SUCCESS("Facet counts are consistent."))
+            return
+        count = facets.rebuild()
+        self.stdout.write(self.style.SUCCESS("Rebuilt {} facet counts.".format(count)))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from book import author_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the book counts, pages and release dates of authors that drifted from their books."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Report drifted authors, changing nothing.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drifted = author_stats.reconcile(options['batch_size'], fix=not options['check'])
+        if options['check'] and drifted:
+            raise CommandError("{} authors have drifted stats, e.g. {}.".format(
+                len(drifted), ', '.join(map(str, drifted[:10]))))
+        self.stdout.write(self.style.SUCCESS("Reconciled {} authors.".format(len(drifted))))
@@ -0,0 +1,45 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from book.jobs import Worker
+
+
+def work(once):
+    worker = Worker(once=once)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    return worker.run()
+
+
+class Command(BaseCommand):
+    help = "Run queued book import jobs, in several processes with --processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Number of worker processes.")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is left instead of polling.")
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            done = work(options['once'])
+            self.stdout.write(self.style.SUCCESS("Ran {} import jobs.".format(done)))
+            return
+
+        # Forked workers must open their own database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=work, args=(options['once'],)) for _ in range(options['processes'])]
+        for process in processes:
+            process.start()
+
+        def stop(*args):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS("{} workers stopped.".format(len(processes))))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from book.mirror import sync_catalogue
+
+
+class Command(BaseCommand):
+    help = "Mirror the An API of Ice and Fire books catalogue into the local database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Number of pages fetched in parallel.")
+        parser.add_argument('--full', action='store_true', help="Refetch pages even if they did not change.")
+
+    def handle(self, *args, **options):
+        stats = sync_catalogue(concurrency=options['concurrency'], full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            "Synced {pages_synced} pages ({books} books), {pages_unchanged} pages unchanged.".format(**stats)))
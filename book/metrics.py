@@ -0,0 +1,275 @@
+"""Request metrics exposed in the Prometheus text format.
+
+Values are kept per process behind a lock. With ``METRICS_DIR`` set, every
+process also writes a snapshot of its values to ``<METRICS_DIR>/<pid>.json``
+at most every ``METRICS_FLUSH_INTERVAL`` seconds, and ``/metrics`` serves the
+sum of all snapshots, so multi-process servers report totals whichever worker
+is scraped. Snapshots of exited workers are kept, for counters not to go back.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+from book.query_budget import execute_wrapper_all
+
+logger = logging.getLogger(__name__)
+
+# Seconds, tuned for API latencies.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.registry.lock:
+            samples = self.registry.samples(self)
+            samples[key] = samples.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        # Per bucket counts, not cumulative, then the sum and the count.
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            samples = self.registry.samples(self)
+            sample = samples.get(key)
+            if sample is None:
+                sample = samples[key] = [0] * (len(self.buckets) + 3)
+            sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._pid = os.getpid()
+        self._values = {}
+        self._flushed_at = 0
+        # Threads of a process share its snapshot file.
+        self._flush_lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def samples(self, metric):
+        """The samples of ``metric``, to be called holding the lock."""
+        if self._pid != os.getpid():
+            # Forked: the parent's values are its own.
+            self._pid = os.getpid()
+            self._values = {}
+        return self._values.setdefault(metric.name, {})
+
+    def snapshot(self):
+        with self.lock:
+            if self._pid != os.getpid():
+                return {}
+            return {name: [[list(key), value] for key, value in samples.items()]
+                    for name, samples in self._values.items()}
+
+    def reset(self):
+        with self.lock:
+            self._values = {}
+
+    def flush(self, force=False):
+        """Write this process's snapshot to METRICS_DIR, at most every METRICS_FLUSH_INTERVAL.
+
+        A failed write is logged, the request being recorded is still answered.
+        """
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        with self._flush_lock:
+            now = time.monotonic()
+            if not force and now - self._flushed_at < settings.METRICS_FLUSH_INTERVAL:
+                return
+            self._flushed_at = now
+            path = os.path.join(directory, '{}.json'.format(os.getpid()))
+            try:
+                with open(path + '.tmp', 'w') as snapshot_file:
+                    json.dump(self.snapshot(), snapshot_file)
+                os.replace(path + '.tmp', path)
+            except OSError:
+                logger.warning("Could not write the metrics snapshot %s.", path, exc_info=True)
+
+    def collect(self):
+        """Samples of every process sharing METRICS_DIR, or of this one, summed by series."""
+        if not settings.METRICS_DIR:
+            return {name: {tuple(key): value for key, value in samples} for name, samples in self.snapshot().items()}
+        self.flush(force=True)
+        merged = {}
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError):
+                continue
+            for name, samples in snapshot.items():
+                series = merged.setdefault(name, {})
+                for key, value in samples:
+                    key = tuple(key)
+                    if isinstance(value, list):
+                        total = series.setdefault(key, [0] * len(value))
+                        series[key] = [a + b for a, b in zip(total, value)]
+                    else:
+                        series[key] = series.get(key, 0) + value
+        return merged
+
+    def render(self):
+        collected = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append('# HELP {} {}'.format(name, metric.documentation))
+            lines.append('# TYPE {} {}'.format(name, metric.type))
+            for key, value in sorted(collected.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.type == 'counter':
+                    lines.append(format_sample(name, labels, value))
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ('+Inf',), value):
+                    cumulative += count
+                    lines.append(format_sample(name + '_bucket', labels + [('le', str(bound))], cumulative))
+                lines.append(format_sample(name + '_sum', labels, value[-2]))
+                lines.append(format_sample(name + '_count', labels, value[-1]))
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_sample(name, labels, value):
+    if labels:
+        name += '{' + ','.join('{}="{}"'.format(label, escape(label_value)) for label, label_value in labels) + '}'
+    return '{} {}'.format(name, repr(float(value)) if isinstance(value, float) else value)
+
+
+registry = Registry()
+
+requests_total = registry.counter(
+    'book_http_requests_total', "HTTP requests served.", ('route', 'method', 'status'))
+request_duration = registry.histogram(
+    'book_http_request_duration_seconds', "Time spent serving HTTP requests.", ('route', 'method'))
+db_queries_total = registry.counter(
+    'book_db_queries_total', "SQL queries run while serving HTTP requests.", ('route', 'method'))
+db_query_seconds_total = registry.counter(
+    'book_db_query_seconds_total', "Time spent in SQL queries while serving HTTP requests.", ('route', 'method'))
+serialize_duration = registry.histogram(
+    'book_serialize_duration_seconds', "Time spent building and rendering response data.", ('stage',))
+upstream_duration = registry.histogram(
+    'book_upstream_request_duration_seconds', "An API of Ice and Fire request time.", ('outcome',))
+external_cache_total = registry.counter(
+    'book_external_cache_total', "External books cache lookups by result.", ('result',))
+external_admission_total = registry.counter(
+    'book_external_admission_total', "External books upstream calls admitted and requests refused, by result.",
+    ('result',))
+
+
+class QueryTimer:
+    """``connection.execute_wrapper`` hook counting and timing executed statements."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Record the latency, status and SQL queries of every request by route and method.
+
+    Place it first in MIDDLEWARE to time the whole stack. Queries of async views
+    run on other threads and are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        timer = QueryTimer()
+        with execute_wrapper_all(timer):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, None)
+        return response
+
+    @staticmethod
+    def record(request, response, seconds, timer):
+        route = request.resolver_match.url_name if request.resolver_match else 'unmatched'
+        method = request.method
+        requests_total.inc(route=route, method=method, status=response.status_code)
+        request_duration.observe(seconds, route=route, method=method)
+        if timer is not None:
+            db_queries_total.inc(timer.count, route=route, method=method)
+            db_query_seconds_total.inc(timer.seconds, route=route, method=method)
+        registry.flush()
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0002_auto_20190310_1136'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExternalBookMirror',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(unique=True, verbose_name='Upstream URL of book.')),
+                ('name', models.CharField(db_index=True, max_length=256, verbose_name='Book name')),
+                ('payload', models.TextField(verbose_name='Transformed upstream book as JSON.')),
+                ('synced_at', models.DateTimeField(auto_now=True, verbose_name='Last sync time.')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExternalSyncPage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.PositiveIntegerField(unique=True, verbose_name='Upstream listing page number.')),
+                ('etag', models.CharField(blank=True, max_length=256, verbose_name='ETag of last synced response.')),
+                ('last_modified', models.CharField(blank=True, max_length=64, verbose_name='Last-Modified of last synced response.')),
+                ('synced_at', models.DateTimeField(auto_now=True, verbose_name='Last sync time.')),
+            ],
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+TABLE = 'book_book_search'
+# Authors are keyed by name at this point, so the through table holds the names.
+AUTHOR_NAMES = ("(SELECT {aggregate} FROM book_book_authors ba JOIN book_author a ON a.name = ba.author_id "
+                "WHERE ba.book_id = b.id)")
+
+# Same tables and rows as book.search's backends at the time of this migration.
+CREATE = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+        "name, publisher, country, authors, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    ],
+    'postgresql': [
+        'CREATE TABLE IF NOT EXISTS {table} ('
+        'book_id integer PRIMARY KEY REFERENCES book_book (id) ON DELETE CASCADE, '
+        'document tsvector NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS {table}_document_idx ON {table} USING GIN (document)',
+    ],
+}
+INDEX = {
+    'sqlite': ('INSERT INTO {table} (rowid, name, publisher, country, authors) '
+               'SELECT b.id, b.name, b.publisher, b.country, {authors} FROM book_book b WHERE b.id IN ({ids})'),
+    'postgresql': ("INSERT INTO {table} (book_id, document) SELECT b.id, "
+                   "setweight(to_tsvector('simple', b.name), 'A') || "
+                   "setweight(to_tsvector('simple', coalesce({authors}, '')), 'B') || "
+                   "setweight(to_tsvector('simple', b.publisher || ' ' || b.country), 'C') "
+                   "FROM book_book b WHERE b.id IN ({ids})"),
+}
+AGGREGATE = {
+    'sqlite': "group_concat(a.name, ' ')",
+    'postgresql': "string_agg(a.name, ' ')",
+}
+
+
+def create_search_index(apps, schema_editor):
+    """Create the search index and fill it BATCH_SIZE books at a time."""
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in CREATE[vendor]:
+            cursor.execute(sql.format(table=TABLE))
+        cursor.execute('SELECT id FROM book_book')
+        book_ids = [row[0] for row in cursor.fetchall()]
+        for start in range(0, len(book_ids), BATCH_SIZE):
+            batch = book_ids[start:start + BATCH_SIZE]
+            sql = INDEX[vendor].format(table=TABLE, authors=AUTHOR_NAMES.format(aggregate=AGGREGATE[vendor]),
+                                       ids=', '.join(['%s'] * len(batch)))
+            cursor.execute(sql, batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS {}'.format(TABLE))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0005_book_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
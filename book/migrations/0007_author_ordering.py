@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0006_book_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='author',
+            options={'ordering': ('name',)},
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def create_book_version(apps, schema_editor):
+    apps.get_model('book', 'TableVersion').objects.create(table='book_book')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0007_author_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now,
+                                       verbose_name='Last modification time.'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=64, unique=True, verbose_name='Database table name.')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Write counter.')),
+                ('updated_at', models.DateTimeField(null=True, verbose_name='Last write time.')),
+            ],
+        ),
+        migrations.RunPython(create_book_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0008_book_updated_at_tableversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('books', 'Uploaded books'), ('external', 'External books query')], max_length=16, verbose_name='What is imported.')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=16, verbose_name='Job status.')),
+                ('source', models.TextField(blank=True, verbose_name='Uploaded books as a JSON array.')),
+                ('query', models.CharField(blank=True, max_length=256, verbose_name='External books name.')),
+                ('upsert_on_isbn', models.BooleanField(default=False, verbose_name='Update books with the same ISBN.')),
+                ('total', models.PositiveIntegerField(null=True, verbose_name='Number of items, once known.')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Items committed so far.')),
+                ('created', models.PositiveIntegerField(default=0, verbose_name='Books created.')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='Books updated.')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Invalid items.')),
+                ('errors', models.TextField(default='[]', verbose_name='First item errors as JSON.')),
+                ('error', models.TextField(blank=True, verbose_name='Why the last attempt failed.')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Times the job was claimed.')),
+                ('lease_owner', models.CharField(blank=True, max_length=128, verbose_name='Worker holding the job.')),
+                ('lease_expires_at', models.DateTimeField(null=True, verbose_name="End of the worker's lease.")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Submission time.')),
+                ('started_at', models.DateTimeField(null=True, verbose_name='First claim time.')),
+                ('finished_at', models.DateTimeField(null=True, verbose_name='Completion time.')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='importjob_status_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:39
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+SEPARATOR = '\x1f'
+
+
+def fill_author_names(apps, schema_editor):
+    """Same values as book.denorm.rebuild, from the historical models."""
+    Book = apps.get_model('book', 'Book')
+    names = defaultdict(list)
+    for book_id, author_name in Book.authors.through.objects.order_by('author_id').values_list('book_id', 'author_id'):
+        names[book_id].append(author_name)
+    books = [Book(pk=book_id, author_names=SEPARATOR + SEPARATOR.join(book_names) + SEPARATOR)
+             for book_id, book_names in names.items()]
+    Book.objects.bulk_update(books, ['author_names'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0009_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='author_names',
+            field=models.TextField(default='', editable=False, verbose_name="Book's authors names, denormalized."),
+        ),
+        migrations.RunPython(fill_author_names, migrations.RunPython.noop),
+    ]
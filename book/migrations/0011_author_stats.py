@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def fill_author_stats(apps, schema_editor):
+    """Same rows as book.author_stats.reconcile, from the historical models."""
+    AuthorStats = apps.get_model('book', 'AuthorStats')
+    through = apps.get_model('book', 'Book').authors.through
+    rows = through.objects.values('author_id').annotate(
+        book_count=Count('book_id'), total_pages=Sum('book__number_of_pages'),
+        first_release_date=Min('book__release_date'), last_release_date=Max('book__release_date'))
+    AuthorStats.objects.bulk_create([AuthorStats(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0010_book_author_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                related_name='stats', serialize=False, to='book.author')),
+                ('book_count', models.IntegerField(default=0, verbose_name='Number of books.')),
+                ('total_pages', models.BigIntegerField(default=0, verbose_name='Pages of all books.')),
+                ('first_release_date', models.DateField(null=True, verbose_name='Release date of the first book.')),
+                ('last_release_date', models.DateField(null=True, verbose_name='Release date of the latest book.')),
+            ],
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:53
+
+from collections import Counter
+
+from django.db import migrations, models
+
+FACETS = ('country', 'publisher', 'year')
+
+
+def fill_book_facet_counts(apps, schema_editor):
+    """Same rows as book.facets.rebuild, from the historical models."""
+    BookFacetCount = apps.get_model('book', 'BookFacetCount')
+    counts = Counter()
+    for country, publisher, release_date in apps.get_model('book', 'Book').objects.values_list(
+            'country', 'publisher', 'release_date').iterator(chunk_size=2000):
+        values = {'country': country, 'publisher': publisher, 'year': str(release_date.year)}
+        counts['', '', '', ''] += 1
+        for facet in FACETS:
+            counts['', '', facet, values[facet]] += 1
+            for other in FACETS:
+                if other != facet:
+                    counts[other, values[other], facet, values[facet]] += 1
+    BookFacetCount.objects.bulk_create([BookFacetCount(filter_name=key[0], filter_value=key[1], facet=key[2],
+                                                       value=key[3], count=count)
+                                        for key, count in counts.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0011_author_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFacetCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter_name', models.CharField(blank=True, max_length=16,
+                                                 verbose_name='Filtered facet, empty for none.')),
+                ('filter_value', models.CharField(blank=True, max_length=256,
+                                                  verbose_name='Value of the filtered facet.')),
+                ('facet', models.CharField(blank=True, max_length=16, verbose_name='Counted facet.')),
+                ('value', models.CharField(blank=True, max_length=256, verbose_name='Value of the counted facet.')),
+                ('count', models.IntegerField(default=0, verbose_name='Number of books.')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['filter_name', 'filter_value', 'facet', '-count', 'value'],
+                                         name='bookfacetcount_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('filter_name', 'filter_value', 'facet', 'value'),
+                                                        name='bookfacetcount_key_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_book_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# First step of giving Author an integer primary key, see 0015_author_surrogate_key.
+
+from django.db import NotSupportedError, migrations
+
+# Nullable integer columns for the new keys, filled on insert from here on and
+# for existing rows by 0014_author_key_backfill. Adding them rewrites no table.
+STATEMENTS = {
+    'sqlite': {
+        'forwards': [
+            'ALTER TABLE book_author ADD COLUMN id integer NULL',
+            'ALTER TABLE book_book_authors ADD COLUMN author_key integer NULL',
+            'ALTER TABLE book_authorstats ADD COLUMN author_key integer NULL',
+            'CREATE TRIGGER book_author_id AFTER INSERT ON book_author BEGIN '
+            'UPDATE book_author SET id = NEW.rowid WHERE rowid = NEW.rowid; END',
+            'CREATE TRIGGER book_book_authors_author_key AFTER INSERT ON book_book_authors BEGIN '
+            'UPDATE book_book_authors SET author_key = (SELECT a.id FROM book_author a WHERE a.name = NEW.author_id) '
+            'WHERE id = NEW.id; END',
+            'CREATE TRIGGER book_authorstats_author_key AFTER INSERT ON book_authorstats BEGIN '
+            'UPDATE book_authorstats SET author_key = (SELECT a.id FROM book_author a WHERE a.name = NEW.author_id) '
+            'WHERE author_id = NEW.author_id; END',
+        ],
+        'backwards': [
+            'DROP TRIGGER book_authorstats_author_key',
+            'DROP TRIGGER book_book_authors_author_key',
+            'DROP TRIGGER book_author_id',
+            'ALTER TABLE book_authorstats DROP COLUMN author_key',
+            'ALTER TABLE book_book_authors DROP COLUMN author_key',
+            'ALTER TABLE book_author DROP COLUMN id',
+        ],
+    },
+    'postgresql': {
+        'forwards': [
+            'ALTER TABLE book_author ADD COLUMN id integer NULL',
+            'CREATE SEQUENCE book_author_id_backfill OWNED BY book_author.id',
+            # A volatile default applies to new rows only, existing ones are left NULL.
+            "ALTER TABLE book_author ALTER COLUMN id SET DEFAULT nextval('book_author_id_backfill')",
+            'ALTER TABLE book_book_authors ADD COLUMN author_key integer NULL',
+            'ALTER TABLE book_authorstats ADD COLUMN author_key integer NULL',
+            'CREATE FUNCTION book_author_key() RETURNS trigger AS $$ BEGIN '
+            'NEW.author_key := (SELECT a.id FROM book_author a WHERE a.name = NEW.author_id); RETURN NEW; '
+            'END $$ LANGUAGE plpgsql',
+            'CREATE TRIGGER book_book_authors_author_key BEFORE INSERT ON book_book_authors '
+            'FOR EACH ROW EXECUTE FUNCTION book_author_key()',
+            'CREATE TRIGGER book_authorstats_author_key BEFORE INSERT ON book_authorstats '
+            'FOR EACH ROW EXECUTE FUNCTION book_author_key()',
+        ],
+        'backwards': [
+            'DROP TRIGGER book_authorstats_author_key ON book_authorstats',
+            'DROP TRIGGER book_book_authors_author_key ON book_book_authors',
+            'DROP FUNCTION book_author_key()',
+            'ALTER TABLE book_authorstats DROP COLUMN author_key',
+            'ALTER TABLE book_book_authors DROP COLUMN author_key',
+            'ALTER TABLE book_author DROP COLUMN id',
+        ],
+    },
+}
+
+
+def run(direction):
+    def run_statements(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        if vendor not in STATEMENTS:
+            raise NotSupportedError("Moving Author to an integer key is not implemented for {}.".format(vendor))
+        for statement in STATEMENTS[vendor][direction]:
+            schema_editor.execute(statement, params=None)
+    return run_statements
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0012_book_facet_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(run('forwards'), run('backwards')),
+    ]
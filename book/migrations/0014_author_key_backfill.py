@@ -0,0 +1,92 @@
+# Second step of giving Author an integer primary key, see 0015_author_surrogate_key.
+#
+# Fills the columns added by 0013_author_key_columns for the rows written before
+# it, BATCH_SIZE rows per transaction in key order, so that it can run while the
+# previous release serves traffic. It can be stopped and run again. On PostgreSQL
+# it then builds the indexes and NOT NULL checks of the new keys without blocking
+# writes, leaving 0015 only catalog changes.
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+# (table, batch key, the column to fill, the UPDATE filling it for the rows of a batch).
+BACKFILLS = [
+    ('book_author', 'name', 'id', 'UPDATE book_author SET id = {new_id} WHERE name IN ({keys}) AND id IS NULL'),
+    ('book_book_authors', 'id', 'author_key',
+     'UPDATE book_book_authors SET author_key = '
+     '(SELECT a.id FROM book_author a WHERE a.name = book_book_authors.author_id) WHERE id IN ({keys})'),
+    ('book_authorstats', 'author_id', 'author_key',
+     'UPDATE book_authorstats SET author_key = '
+     '(SELECT a.id FROM book_author a WHERE a.name = book_authorstats.author_id) WHERE author_id IN ({keys})'),
+]
+NEW_AUTHOR_ID = {'sqlite': 'rowid', 'postgresql': "nextval('book_author_id_backfill')"}
+
+# Built concurrently here, turned into the constraints of the new keys by 0015.
+POSTGRESQL_CHECKS = [
+    ('book_author', 'id', 'book_author_id_not_null'),
+    ('book_book_authors', 'author_key', 'book_book_authors_author_key_not_null'),
+    ('book_authorstats', 'author_key', 'book_authorstats_author_key_not_null'),
+]
+POSTGRESQL_INDEXES = [
+    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS book_author_id_key ON book_author (id)',
+    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS book_author_name_key ON book_author (name)',
+    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS book_book_authors_book_id_author_key_key '
+    'ON book_book_authors (book_id, author_key)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS book_book_authors_author_key_idx ON book_book_authors (author_key)',
+    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS book_authorstats_author_key_key ON book_authorstats (author_key)',
+]
+
+
+def batches(connection, table, key, column):
+    """Yield the keys of the rows of ``table`` with ``column`` NULL, BATCH_SIZE at a time in ``key`` order."""
+    last = None
+    while True:
+        with connection.cursor() as cursor:
+            if last is None:
+                cursor.execute('SELECT {key} FROM {table} WHERE {column} IS NULL ORDER BY {key} LIMIT %s'.format(
+                    key=key, table=table, column=column), [BATCH_SIZE])
+            else:
+                cursor.execute('SELECT {key} FROM {table} WHERE {key} > %s AND {column} IS NULL ORDER BY {key} '
+                               'LIMIT %s'.format(key=key, table=table, column=column), [last, BATCH_SIZE])
+            keys = [key for key, in cursor.fetchall()]
+        if not keys:
+            return
+        yield keys
+        last = keys[-1]
+
+
+def fill_author_keys(apps, schema_editor):
+    connection = schema_editor.connection
+    # Authors first: the other two tables copy their ids.
+    for table, key, column, update in BACKFILLS:
+        for keys in batches(connection, table, key, column):
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(update.format(new_id=NEW_AUTHOR_ID[connection.vendor],
+                                             keys=', '.join(['%s'] * len(keys))), keys)
+    if connection.vendor == 'postgresql':
+        prepare_postgresql(connection)
+
+
+def prepare_postgresql(connection):
+    with connection.cursor() as cursor:
+        for table, column, name in POSTGRESQL_CHECKS:
+            if name not in connection.introspection.get_constraints(cursor, table):
+                # NOT VALID takes a brief lock, VALIDATE scans without blocking writes.
+                cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} CHECK ({} IS NOT NULL) NOT VALID'.format(
+                    table, name, column))
+            cursor.execute('ALTER TABLE {} VALIDATE CONSTRAINT {}'.format(table, name))
+        for statement in POSTGRESQL_INDEXES:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('book', '0013_author_key_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_author_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,131 @@
+# Gives Author an integer primary key, keeping its name unique.
+#
+# The name key was stored, up to 256 characters, in every Book.authors and
+# AuthorStats row and their indexes. 0013_author_key_columns and
+# 0014_author_key_backfill have added and filled the integer keys beside it while
+# the previous release kept running. This migration swaps them in and has to be
+# deployed together with the code that expects them, see the README.
+#
+# SQLite rebuilds the three tables in one transaction. PostgreSQL only changes the
+# catalog, under a lock held for the length of a few ALTER TABLE statements, then
+# validates the new foreign keys without blocking writes.
+
+from django.db import NotSupportedError, migrations, models, transaction
+
+LOCK_TIMEOUT = '5s'
+
+POSTGRESQL_SWAP = [
+    'DROP TRIGGER book_authorstats_author_key ON book_authorstats',
+    'DROP TRIGGER book_book_authors_author_key ON book_book_authors',
+    'DROP FUNCTION book_author_key()',
+    # Dropping the name columns drops the keys, indexes and foreign keys using them.
+    'ALTER TABLE book_book_authors DROP COLUMN author_id',
+    'ALTER TABLE book_book_authors RENAME COLUMN author_key TO author_id',
+    'ALTER TABLE book_book_authors ALTER COLUMN author_id SET NOT NULL',
+    'ALTER TABLE book_book_authors DROP CONSTRAINT book_book_authors_author_key_not_null',
+    'ALTER TABLE book_book_authors ADD CONSTRAINT book_book_authors_book_id_author_id_uniq '
+    'UNIQUE USING INDEX book_book_authors_book_id_author_key_key',
+    'ALTER INDEX book_book_authors_author_key_idx RENAME TO book_book_authors_author_id_idx',
+    'ALTER TABLE book_authorstats DROP COLUMN author_id',
+    'ALTER TABLE book_authorstats RENAME COLUMN author_key TO author_id',
+    'ALTER TABLE book_authorstats ALTER COLUMN author_id SET NOT NULL',
+    'ALTER TABLE book_authorstats DROP CONSTRAINT book_authorstats_author_key_not_null',
+    'ALTER TABLE book_authorstats ADD CONSTRAINT book_authorstats_pkey PRIMARY KEY USING INDEX '
+    'book_authorstats_author_key_key',
+    'ALTER TABLE book_author DROP CONSTRAINT book_author_pkey',
+    'ALTER TABLE book_author ALTER COLUMN id SET NOT NULL',
+    'ALTER TABLE book_author DROP CONSTRAINT book_author_id_not_null',
+    'ALTER TABLE book_author ADD CONSTRAINT book_author_pkey PRIMARY KEY USING INDEX book_author_id_key',
+    'ALTER TABLE book_author ADD CONSTRAINT book_author_name_key UNIQUE USING INDEX book_author_name_key',
+    # An identity column, as Django creates for AutoField, replaces the backfill sequence.
+    'ALTER TABLE book_author ALTER COLUMN id DROP DEFAULT',
+    'DROP SEQUENCE book_author_id_backfill',
+    'ALTER TABLE book_author ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY',
+    "SELECT setval(pg_get_serial_sequence('book_author', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM book_author",
+    'ALTER TABLE book_book_authors ADD CONSTRAINT book_book_authors_author_id_fk_book_author_id FOREIGN KEY '
+    '(author_id) REFERENCES book_author (id) DEFERRABLE INITIALLY DEFERRED NOT VALID',
+    'ALTER TABLE book_authorstats ADD CONSTRAINT book_authorstats_author_id_fk_book_author_id FOREIGN KEY '
+    '(author_id) REFERENCES book_author (id) DEFERRABLE INITIALLY DEFERRED NOT VALID',
+]
+POSTGRESQL_VALIDATE = [
+    'ALTER TABLE book_book_authors VALIDATE CONSTRAINT book_book_authors_author_id_fk_book_author_id',
+    'ALTER TABLE book_authorstats VALIDATE CONSTRAINT book_authorstats_author_id_fk_book_author_id',
+]
+
+SQLITE_COPY = [
+    'INSERT INTO book_author (id, name) SELECT id, name FROM book_author_old',
+    'INSERT INTO book_book_authors (id, book_id, author_id) SELECT id, book_id, author_key FROM book_book_authors_old',
+    'INSERT INTO book_authorstats (author_id, book_count, total_pages, first_release_date, last_release_date) '
+    'SELECT author_key, book_count, total_pages, first_release_date, last_release_date FROM book_authorstats_old',
+]
+
+
+def swap_author_keys(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        swap_sqlite(apps, connection)
+    elif connection.vendor == 'postgresql':
+        swap_postgresql(connection)
+    else:
+        raise NotSupportedError("Moving Author to an integer key is not implemented for {}.".format(
+            connection.vendor))
+
+
+def swap_sqlite(apps, connection):
+    """Recreate the tables from the models as they are now and copy the rows over, in one transaction."""
+    Author = apps.get_model('book', 'Author')
+    models_to_create = [Author, apps.get_model('book', 'Book').authors.through, apps.get_model('book', 'AuthorStats')]
+    with connection.schema_editor(atomic=True) as editor:
+        for model in models_to_create:
+            editor.execute('ALTER TABLE {0} RENAME TO {0}_old'.format(model._meta.db_table))
+        # The new tables get indexes of the same names. Triggers go with their tables.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN "
+                           "({})".format(', '.join(['%s'] * len(models_to_create))),
+                           ['{}_old'.format(model._meta.db_table) for model in models_to_create])
+            indexes = [name for name, in cursor.fetchall()]
+        for name in indexes:
+            editor.execute('DROP INDEX {}'.format(editor.quote_name(name)))
+        for model in models_to_create:
+            editor.create_model(model)
+        for statement in SQLITE_COPY:
+            editor.execute(statement)
+        for model in reversed(models_to_create):
+            editor.execute('DROP TABLE {}_old'.format(model._meta.db_table))
+
+
+def swap_postgresql(connection):
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # Give up rather than queue every query on these tables behind a long transaction.
+        cursor.execute("SET LOCAL lock_timeout = '{}'".format(LOCK_TIMEOUT))
+        cursor.execute('LOCK TABLE book_author, book_book_authors, book_authorstats IN ACCESS EXCLUSIVE MODE')
+        for statement in POSTGRESQL_SWAP:
+            cursor.execute(statement)
+    with connection.cursor() as cursor:
+        for statement in POSTGRESQL_VALIDATE:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('book', '0014_author_key_backfill'),
+    ]
+
+    operations = [
+        # The models first, swap_author_keys creates the SQLite tables from them.
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AddField(
+                model_name='author',
+                name='id',
+                field=models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+            ),
+            migrations.AlterField(
+                model_name='author',
+                name='name',
+                field=models.CharField(max_length=256, unique=True, verbose_name='Author name.'),
+            ),
+        ]),
+        migrations.RunPython(swap_author_keys),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0015_author_surrogate_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookChangeHorizon',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cursor', models.BigIntegerField(default=0, verbose_name='Newest removed tombstone.')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_id', models.IntegerField(verbose_name='Changed book, which may no longer exist.')),
+                ('action', models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted')],
+                                            max_length=8, verbose_name='What happened to the book.')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now,
+                                                    verbose_name='Time of the write.')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book_id', 'id'], name='bookchange_book_id_idx')],
+            },
+        ),
+    ]
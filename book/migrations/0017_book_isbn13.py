@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:02
+
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+SEPARATORS = re.compile(r'[\s-]+')
+ISBN10 = re.compile(r'\d{9}[\dX]')
+
+
+def canonical_isbn(value):
+    """Same values as book.isbn.canonical_isbn at the time of this migration."""
+    compact = SEPARATORS.sub('', value).upper()
+    if ISBN10.fullmatch(compact):
+        digits = '978' + compact[:9]
+        return digits + str(-sum(int(digit) * (3 if position % 2 else 1)
+                                 for position, digit in enumerate(digits)) % 10)
+    return compact
+
+
+def fill_isbn13(apps, schema_editor):
+    """Fill ``isbn13`` BATCH_SIZE books at a time in pk order."""
+    Book = apps.get_model('book', 'Book')
+    last = 0
+    while True:
+        books = list(Book.objects.filter(pk__gt=last).order_by('pk').only('pk', 'isbn')[:BATCH_SIZE])
+        if not books:
+            return
+        for book in books:
+            book.isbn13 = canonical_isbn(book.isbn)
+        Book.objects.bulk_update(books, ['isbn13'])
+        last = books[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0016_book_change'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='isbn13',
+            field=models.CharField(default='', editable=False, max_length=14, verbose_name="Book's ISBN-13."),
+        ),
+        migrations.RunPython(fill_isbn13, migrations.RunPython.noop),
+        # Built after the backfill rather than updated row by row during it.
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['isbn13'], name='book_isbn13_idx'),
+        ),
+    ]
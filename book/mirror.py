@@ -0,0 +1,100 @@
+"""Local mirror of the An API of Ice and Fire books catalogue."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import parse_qs, urlparse
+
+from django.db import transaction
+
+from book.external import customized_json_response
+from book.models import ExternalBookMirror, ExternalSyncPage
+from book.upstream import get_client
+
+BOOKS_PATH = '/api/books'
+# Largest page size the upstream accepts.
+PAGE_SIZE = 50
+
+
+def lookup(name):
+    """Return mirrored books named ``name`` in the external books format, or ``[]``."""
+    payloads = ExternalBookMirror.objects.filter(name=name).order_by('id').values_list('payload', flat=True)
+    return [json.loads(payload) for payload in payloads]
+
+
+def _last_page(response):
+    last = response.links.get('last')
+    if last is None:
+        return None
+    return int(parse_qs(urlparse(last['url']).query)['page'][0])
+
+
+def fetch_page(client, page, known):
+    """Fetch one listing page, conditional on the validators stored in ``known``."""
+    headers = {}
+    if known is not None and known.etag:
+        headers['If-None-Match'] = known.etag
+    if known is not None and known.last_modified:
+        headers['If-Modified-Since'] = known.last_modified
+    response = client.get(BOOKS_PATH, params={'page': page, 'pageSize': PAGE_SIZE}, headers=headers)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+
+def store_page(page, response):
+    """Transform and upsert the books of one listing page.
+
+    Returns the number of books written, or ``None`` when the page was unchanged.
+    """
+    if response.status_code == 304:
+        return None
+    books = response.json()
+    urls = [book['url'] for book in books]
+    customized_json_response(books)
+
+    with transaction.atomic():
+        existing = {mirror.url: mirror for mirror in ExternalBookMirror.objects.filter(url__in=urls)}
+        to_create, to_update = [], []
+        for url, book in zip(urls, books):
+            mirror = existing.get(url) or ExternalBookMirror(url=url)
+            mirror.name = book['name']
+            mirror.payload = json.dumps(book)
+            (to_update if mirror.pk else to_create).append(mirror)
+        ExternalBookMirror.objects.bulk_create(to_create)
+        ExternalBookMirror.objects.bulk_update(to_update, ['name', 'payload'])
+        ExternalSyncPage.objects.update_or_create(page=page, defaults={
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+        })
+    return len(books)
+
+
+def sync_catalogue(concurrency=4, full=False):
+    """Page through the upstream listing and upsert every changed page.
+
+    Pages are fetched concurrently and written on the calling thread as they
+    arrive. Unless ``full`` is set, pages answered with 304 Not Modified are
+    skipped. Returns a dict of synced/unchanged page and book counts.
+    """
+    client = get_client()
+    known = {} if full else {sync_page.page: sync_page for sync_page in ExternalSyncPage.objects.all()}
+    stats = {'pages_synced': 0, 'pages_unchanged': 0, 'books': 0}
+
+    def record(page, response):
+        written = store_page(page, response)
+        if written is None:
+            stats['pages_unchanged'] += 1
+        else:
+            stats['pages_synced'] += 1
+            stats['books'] += written
+
+    first = fetch_page(client, 1, known.get(1))
+    last_page = _last_page(first) or max(known, default=1)
+    record(1, first)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(fetch_page, client, page, known.get(page)): page
+                   for page in range(2, last_page + 1)}
+        for future in as_completed(futures):
+            record(futures[future], future.result())
+    return stats
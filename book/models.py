@@ -1,21 +1,248 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+from book.isbn import canonical_isbn
 
 
 class Author(models.Model):
-    name = models.CharField(primary_key=True, max_length=256, verbose_name="Author name.")
+    name = models.CharField(max_length=256, unique=True, verbose_name="Author name.")
+
+    class Meta:
+        # Books list their authors in a stable order, whichever way they are serialized.
+        ordering = ('name',)
 
     def __str__(self):
         return self.name
 
 
+class BookQuerySet(models.QuerySet):
+    def with_relations(self):
+        """Load every forward relation of Book up front instead of once per row."""
+        fields = [field for field in self.model._meta.get_fields() if not field.auto_created]
+        return self.select_related(*[field.name for field in fields if field.many_to_one]) \
+            .prefetch_related(*[field.name for field in fields if field.many_to_many])
+
+
 class Book(models.Model):
     name = models.CharField(max_length=256, verbose_name="Book name")
     isbn = models.CharField(max_length=14, verbose_name="Book's ISBN")
+    # canonical_isbn(isbn), set on save and by bulk writes.
+    isbn13 = models.CharField(max_length=14, default='', editable=False, verbose_name="Book's ISBN-13.")
     country = models.CharField(max_length=256, verbose_name="Country")
     authors = models.ManyToManyField(Author, verbose_name="Book's authors names.")
     number_of_pages = models.IntegerField(verbose_name="Number of pages in book.")
     publisher = models.CharField(max_length=256, verbose_name="Publisher of book.")
     release_date = models.DateField(verbose_name="Release date of book.")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Last modification time.")
+    # Copy of the authors' names maintained by book.denorm.
+    author_names = models.TextField(default='', editable=False, verbose_name="Book's authors names, denormalized.")
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see book.pagination.KeysetPagination. Also serves
+            # the release year filter on its own.
+            models.Index(fields=['release_date', 'id'], name='book_release_date_id_idx'),
+            # BookFilter paths. Country and publisher are mostly combined with the
+            # release year and always read in pagination order.
+            models.Index(fields=['name'], name='book_name_idx'),
+            models.Index(fields=['isbn'], name='book_isbn_idx'),
+            # Multi-get by ISBN, see BookViewSet.batch.
+            models.Index(fields=['isbn13'], name='book_isbn13_idx'),
+            models.Index(fields=['country', 'release_date', 'id'], name='book_country_release_idx'),
+            models.Index(fields=['publisher', 'release_date', 'id'], name='book_publisher_release_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.isbn13 = canonical_isbn(self.isbn)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'isbn' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'isbn13'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
+
+
+class AuthorStats(models.Model):
+    """Per author aggregates of their books, maintained by book.author_stats."""
+
+    author = models.OneToOneField(Author, primary_key=True, on_delete=models.CASCADE, related_name='stats')
+    # Signed so that a drifted row can go below zero until it is reconciled.
+    book_count = models.IntegerField(default=0, verbose_name="Number of books.")
+    total_pages = models.BigIntegerField(default=0, verbose_name="Pages of all books.")
+    first_release_date = models.DateField(null=True, verbose_name="Release date of the first book.")
+    last_release_date = models.DateField(null=True, verbose_name="Release date of the latest book.")
+
+    def __str__(self):
+        return str(self.author_id)
+
+
+class BookFacetCount(models.Model):
+    """Number of books with a facet value, overall or under one filter, maintained by book.facets.
+
+    Rows with an empty ``filter_name`` count every book, and the one with an
+    empty ``facet`` too holds the number of books.
+    """
+
+    filter_name = models.CharField(max_length=16, blank=True, verbose_name="Filtered facet, empty for none.")
+    filter_value = models.CharField(max_length=256, blank=True, verbose_name="Value of the filtered facet.")
+    facet = models.CharField(max_length=16, blank=True, verbose_name="Counted facet.")
+    value = models.CharField(max_length=256, blank=True, verbose_name="Value of the counted facet.")
+    # Signed so that a drifted row can go below zero until it is rebuilt.
+    count = models.IntegerField(default=0, verbose_name="Number of books.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['filter_name', 'filter_value', 'facet', 'value'],
+                                    name='bookfacetcount_key_uniq'),
+        ]
+        indexes = [
+            # The most frequent values of a facet, read in order.
+            models.Index(fields=['filter_name', 'filter_value', 'facet', '-count', 'value'],
+                         name='bookfacetcount_top_idx'),
+        ]
+
+    def __str__(self):
+        return '{}={} {}={}: {}'.format(self.filter_name, self.filter_value, self.facet, self.value, self.count)
+
+
+class BookChange(models.Model):
+    """One write to a book in the change feed, see book.changes.
+
+    The id is the feed's cursor. ``book_id`` is not a foreign key, the rows of
+    deleted books remain as tombstones.
+    """
+
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTIONS = (
+        (UPSERT, "Created or updated"),
+        (DELETE, "Deleted"),
+    )
+
+    book_id = models.IntegerField(verbose_name="Changed book, which may no longer exist.")
+    action = models.CharField(max_length=8, choices=ACTIONS, verbose_name="What happened to the book.")
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Time of the write.")
+
+    class Meta:
+        indexes = [
+            # Compaction looks for later changes of the same book.
+            models.Index(fields=['book_id', 'id'], name='bookchange_book_id_idx'),
+        ]
+
+    def __str__(self):
+        return '#{} {} book {}'.format(self.pk, self.action, self.book_id)
+
+
+class BookChangeHorizon(models.Model):
+    """The single row holding the cursor up to which compaction removed tombstones from the change feed."""
+
+    cursor = models.BigIntegerField(default=0, verbose_name="Newest removed tombstone.")
+
+    def __str__(self):
+        return str(self.cursor)
+
+
+class ExternalBookMirror(models.Model):
+    url = models.URLField(unique=True, verbose_name="Upstream URL of book.")
+    name = models.CharField(max_length=256, db_index=True, verbose_name="Book name")
+    payload = models.TextField(verbose_name="Transformed upstream book as JSON.")
+    synced_at = models.DateTimeField(auto_now=True, verbose_name="Last sync time.")
+
+    def __str__(self):
+        return self.name
+
+
+class ExternalSyncPage(models.Model):
+    page = models.PositiveIntegerField(unique=True, verbose_name="Upstream listing page number.")
+    etag = models.CharField(max_length=256, blank=True, verbose_name="ETag of last synced response.")
+    last_modified = models.CharField(max_length=64, blank=True, verbose_name="Last-Modified of last synced response.")
+    synced_at = models.DateTimeField(auto_now=True, verbose_name="Last sync time.")
+
+    def __str__(self):
+        return str(self.page)
+
+
+class TableVersionManager(models.Manager):
+    def get_for_model(self, model):
+        """The version of ``model``'s table, unsaved at version 0 if it was never bumped."""
+        table = model._meta.db_table
+        return self.filter(table=table).first() or self.model(table=table)
+
+    def bump(self, model):
+        """Increment the version of ``model``'s table, to be called in the writing transaction."""
+        table = model._meta.db_table
+        if not self.filter(table=table).update(version=F('version') + 1, updated_at=timezone.now()):
+            self.get_or_create(table=table)
+            self.filter(table=table).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+class TableVersion(models.Model):
+    """A counter bumped on every write to a table, identifying cached list responses."""
+
+    table = models.CharField(max_length=64, unique=True, verbose_name="Database table name.")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Write counter.")
+    updated_at = models.DateTimeField(null=True, verbose_name="Last write time.")
+
+    objects = TableVersionManager()
+
+    def __str__(self):
+        return '{} v{}'.format(self.table, self.version)
+
+
+class ImportJob(models.Model):
+    """A books import run by ``manage.py run_book_worker`` outside the request cycle.
+
+    Workers lease a job by setting ``lease_owner`` and ``lease_expires_at`` with a
+    conditional UPDATE and renew the lease with every chunk they commit. A job
+    whose lease ran out is claimed again and resumes after ``processed`` items.
+    """
+
+    BOOKS = 'books'
+    EXTERNAL = 'external'
+    KINDS = (
+        (BOOKS, "Uploaded books"),
+        (EXTERNAL, "External books query"),
+    )
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    )
+
+    kind = models.CharField(max_length=16, choices=KINDS, verbose_name="What is imported.")
+    status = models.CharField(max_length=16, choices=STATUSES, default=QUEUED, verbose_name="Job status.")
+    source = models.TextField(blank=True, verbose_name="Uploaded books as a JSON array.")
+    query = models.CharField(max_length=256, blank=True, verbose_name="External books name.")
+    upsert_on_isbn = models.BooleanField(default=False, verbose_name="Update books with the same ISBN.")
+    total = models.PositiveIntegerField(null=True, verbose_name="Number of items, once known.")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Items committed so far.")
+    created = models.PositiveIntegerField(default=0, verbose_name="Books created.")
+    updated = models.PositiveIntegerField(default=0, verbose_name="Books updated.")
+    failed = models.PositiveIntegerField(default=0, verbose_name="Invalid items.")
+    errors = models.TextField(default='[]', verbose_name="First item errors as JSON.")
+    error = models.TextField(blank=True, verbose_name="Why the last attempt failed.")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Times the job was claimed.")
+    lease_owner = models.CharField(max_length=128, blank=True, verbose_name="Worker holding the job.")
+    lease_expires_at = models.DateTimeField(null=True, verbose_name="End of the worker's lease.")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Submission time.")
+    started_at = models.DateTimeField(null=True, verbose_name="First claim time.")
+    finished_at = models.DateTimeField(null=True, verbose_name="Completion time.")
+
+    class Meta:
+        indexes = [
+            # Workers look for the oldest queued or expired job.
+            models.Index(fields=['status', 'id'], name='importjob_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return '{} import #{} ({})'.format(self.kind, self.pk, self.status)
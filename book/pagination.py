@@ -0,0 +1,128 @@
+"""Keyset (cursor) pagination."""
+
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Range of the integer primary keys on every supported backend.
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_id(value):
+    """A primary key read from a cursor, raising ValueError for anything that cannot be one."""
+    if isinstance(value, bool) or not isinstance(value, int) or not -MAX_ID <= value <= MAX_ID:
+        raise ValueError("Not an id: {!r}".format(value))
+    return value
+
+
+def parse_text(value):
+    """A text field value read from a cursor, raising ValueError for anything but a string."""
+    if not isinstance(value, str):
+        raise ValueError("Not a string: {!r}".format(value))
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """Paginate on the values of ``ordering`` rather than on an OFFSET.
+
+    The last ordering field must be unique. The cursor holds the ordering values
+    of the last row served, so every page is one index range scan starting right
+    after it, however deep the client has paged.
+    """
+
+    ordering = ('release_date', 'id')
+    # Converters of the cursor values of ordering fields, raising TypeError or ValueError on bad values.
+    cursor_parsers = {'release_date': datetime.date.fromisoformat, 'id': parse_id}
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = "Invalid cursor."
+
+    def __init__(self):
+        self.page_size = settings.BOOKS_PAGE_SIZE
+        self.max_page_size = settings.BOOKS_MAX_PAGE_SIZE
+        self.next_position = None
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [self.cursor_parsers[field](value) if field in self.cursor_parsers else value
+                    for field, value in zip(self.ordering, position)]
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+    def after(self, position):
+        """Build ``(a, b, ...) > (x, y, ...)`` in a form that range scans the index.
+
+        ``a >= x AND (a > x OR (b >= y AND (b > y OR ...)))`` keeps the leading
+        column bounded, which an equivalent top level OR would not.
+        """
+        pairs = list(zip(self.ordering, position))
+        field, value = pairs[-1]
+        condition = Q(**{field + '__gt': value})
+        for field, value in reversed(pairs[:-1]):
+            condition = Q(**{field + '__gte': value}) & (Q(**{field + '__gt': value}) | condition)
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+        if len(rows) > page_size:
+            last = page[-1]
+            self.next_position = [self.to_cursor_value(self.get_value(last, field)) for field in self.ordering]
+        return page
+
+    @staticmethod
+    def get_value(row, field):
+        # Rows are model instances, or dicts for a values() queryset.
+        return row[field] if isinstance(row, dict) else getattr(row, field)
+
+    @staticmethod
+    def to_cursor_value(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        # BookViewSet.list adds the next link to its envelope.
+        return Response(data)
+
+
+class AuthorKeysetPagination(KeysetPagination):
+    ordering = ('name',)
+    cursor_parsers = {'name': parse_text}
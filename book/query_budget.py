@@ -0,0 +1,106 @@
+"""Per-request SQL query budgets."""
+
+import logging
+from contextlib import contextmanager, ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` hook counting executed statements."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def execute_wrapper_all(wrapper):
+    """Install the ``execute_wrapper`` hook ``wrapper`` on every database, replicas included."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+@contextmanager
+def query_budget(limit, using=DEFAULT_DB_ALIAS):
+    """Raise QueryBudgetExceeded if the block runs more than ``limit`` queries."""
+    counter = QueryCounter()
+    with connections[using].execute_wrapper(counter):
+        yield counter
+    if counter.count > limit:
+        raise QueryBudgetExceeded("{} queries executed, budget is {}.".format(counter.count, limit))
+
+
+class QueryBudgetMiddleware:
+    """Check every request against the ``QUERY_BUDGET`` setting.
+
+    ``ROUTES`` maps URL names, optionally prefixed with the HTTP method as in
+    ``"POST book-list"``, to their budget and ``DEFAULT`` applies to all other
+    routes. Requests over budget are logged, or raise when ``RAISE`` is set, as it
+    is in the test settings.
+
+    Under ASGI the counter is installed on the thread that runs the request's
+    thread-sensitive sync code, sync views and the ``sync_to_async`` calls of
+    async views alike, so both are checked. Queries made on other threads are
+    not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        with execute_wrapper_all(counter):
+            response = self.get_response(request)
+        self.check(request, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        # Connections are per thread: enter and leave the wrapper on the one running the request's sync code.
+        wrapper = await sync_to_async(self.install)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrapper.close)()
+        self.check(request, counter)
+        return response
+
+    @staticmethod
+    def install(counter):
+        stack = ExitStack()
+        stack.enter_context(execute_wrapper_all(counter))
+        return stack
+
+    @staticmethod
+    def check(request, counter):
+        config = settings.QUERY_BUDGET
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        routes = config['ROUTES']
+        limit = routes.get('{} {}'.format(request.method, url_name), routes.get(url_name, config['DEFAULT']))
+        if counter.count > limit:
+            message = "{} {} ({}) executed {} queries, budget is {}.".format(
+                request.method, request.path, url_name, counter.count, limit)
+            if config['RAISE']:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
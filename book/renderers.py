@@ -0,0 +1,40 @@
+"""Renderers for the book API."""
+
+from rest_framework.renderers import JSONRenderer
+
+from book.metrics import serialize_duration
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer encoding with orjson when it is installed.
+
+    The output bytes are the same as JSONRenderer's compact unicode form: dates,
+    decimals and lazy strings still go through the DRF encoder. Anything orjson
+    cannot encode, indented output or non default JSON settings fall back to
+    JSONRenderer.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def use_orjson(self, data, accepted_media_type, renderer_context):
+        return (orjson is not None and data is not None and self.compact and not self.ensure_ascii
+                and not self.get_indent(accepted_media_type, renderer_context or {}))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with serialize_duration.time(stage='render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if not self.use_orjson(data, accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped by JSONRenderer too, as they are not valid in JavaScript strings.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
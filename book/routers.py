@@ -0,0 +1,53 @@
+"""Database routing between the primary and the read replicas."""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+# The replica reads in the current replica_reads() block go to, if any.
+_replica = ContextVar('replica', default=None)
+
+
+@contextmanager
+def replica_reads():
+    """Let reads in the block go to a replica, also usable as a view decorator.
+
+    The replica is chosen once for the block, and nested blocks keep it, so
+    that its reads see one consistent state rather than that of several
+    replicas lagging by different amounts.
+    """
+    replica = _replica.get()
+    if replica is None and settings.DATABASE_REPLICAS:
+        replica = random.choice(settings.DATABASE_REPLICAS)
+    token = _replica.set(replica)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads made under ``replica_reads()`` to one of ``DATABASE_REPLICAS``.
+
+    Other reads and every write go to the primary, so requests that write see
+    their own changes. Replicas lag behind the primary, only read only views
+    that tolerate it opt in.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is not None and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,174 @@
+"""Full-text search over books and their authors.
+
+SQLite uses an FTS5 table and PostgreSQL a ``tsvector`` column with a GIN index.
+Both hold one row per book with its name, publisher, country and author names,
+ranked so that name matches weigh most, then authors.
+"""
+
+import re
+
+from django.db import connection
+
+from book.models import Author, Book
+
+TABLE = 'book_book_search'
+
+
+def _author_names_sql(aggregate):
+    """Correlated subquery returning the author names of book ``b`` joined by spaces."""
+    through = Book.authors.through._meta
+    book_column = through.get_field('book').column
+    author_column = through.get_field('author').column
+    return ('(SELECT {aggregate} FROM {through} ba JOIN {author} a ON a.{author_pk} = ba.{author_column} '
+            'WHERE ba.{book_column} = b.id)').format(
+        aggregate=aggregate, through=through.db_table, author=Author._meta.db_table,
+        author_pk=Author._meta.pk.column, author_column=author_column, book_column=book_column)
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _terms(query):
+    return re.findall(r'\w+', query)
+
+
+class SQLiteSearchBackend:
+    def create(self, cursor):
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5("
+                       "name, publisher, country, authors, "
+                       "tokenize='unicode61 remove_diacritics 2', prefix='2 3')".format(TABLE))
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS {}'.format(TABLE))
+
+    def index(self, cursor, book_ids, replace=True):
+        if replace:
+            self.remove(cursor, book_ids)
+        cursor.execute('INSERT INTO {table} (rowid, name, publisher, country, authors) '
+                       'SELECT b.id, b.name, b.publisher, b.country, {authors} FROM {book} b '
+                       'WHERE b.id IN ({ids})'.format(table=TABLE, book=Book._meta.db_table,
+                                                      authors=_author_names_sql("group_concat(a.name, ' ')"),
+                                                      ids=_placeholders(book_ids)), book_ids)
+
+    def remove(self, cursor, book_ids):
+        cursor.execute('DELETE FROM {} WHERE rowid IN ({})'.format(TABLE, _placeholders(book_ids)), book_ids)
+
+    def search(self, cursor, terms, limit):
+        # Whole word matches of the last term score on both phrases and so rank
+        # above prefix-only ones.
+        match = ' AND '.join(['"{}"'.format(term) for term in terms[:-1]] + ['("{0}" OR "{0}"*)'.format(terms[-1])])
+        cursor.execute('SELECT rowid FROM {table} WHERE {table} MATCH %s '
+                       'ORDER BY bm25({table}, 10.0, 1.0, 1.0, 5.0) LIMIT %s'.format(table=TABLE), [match, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    document = ("setweight(to_tsvector('simple', b.name), 'A') || "
+                "setweight(to_tsvector('simple', coalesce({authors}, '')), 'B') || "
+                "setweight(to_tsvector('simple', b.publisher || ' ' || b.country), 'C')")
+
+    def create(self, cursor):
+        cursor.execute('CREATE TABLE IF NOT EXISTS {table} ('
+                       'book_id integer PRIMARY KEY REFERENCES {book} (id) ON DELETE CASCADE, '
+                       'document tsvector NOT NULL)'.format(table=TABLE, book=Book._meta.db_table))
+        cursor.execute('CREATE INDEX IF NOT EXISTS {table}_document_idx ON {table} USING GIN (document)'.format(
+            table=TABLE))
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS {}'.format(TABLE))
+
+    def index(self, cursor, book_ids, replace=True):
+        document = self.document.format(authors=_author_names_sql("string_agg(a.name, ' ')"))
+        cursor.execute('INSERT INTO {table} (book_id, document) SELECT b.id, {document} FROM {book} b '
+                       'WHERE b.id IN ({ids}) ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document'
+                       .format(table=TABLE, document=document, book=Book._meta.db_table,
+                               ids=_placeholders(book_ids)), book_ids)
+
+    def remove(self, cursor, book_ids):
+        cursor.execute('DELETE FROM {} WHERE book_id IN ({})'.format(TABLE, _placeholders(book_ids)), book_ids)
+
+    def search(self, cursor, terms, limit):
+        query = ' & '.join(terms[:-1] + ['{}:*'.format(terms[-1])])
+        cursor.execute("SELECT book_id FROM {table}, to_tsquery('simple', %s) query WHERE document @@ query "
+                       "ORDER BY ts_rank(document, query) DESC, book_id LIMIT %s".format(table=TABLE), [query, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend(),
+    'postgresql': PostgresSearchBackend(),
+}
+
+
+def get_backend(conn=connection):
+    """Return the search backend for ``conn``, or ``None`` if its vendor has none."""
+    return BACKENDS.get(conn.vendor)
+
+
+def create_index(conn=connection):
+    backend = get_backend(conn)
+    if backend is not None:
+        with conn.cursor() as cursor:
+            backend.create(cursor)
+
+
+def drop_index(conn=connection):
+    backend = get_backend(conn)
+    if backend is not None:
+        with conn.cursor() as cursor:
+            backend.drop(cursor)
+
+
+def index_books(book_ids, batch_size=500, replace=True):
+    """(Re)index the books in ``book_ids`` from their current rows.
+
+    ``replace=False`` skips removing existing entries, for books known to be new.
+    """
+    backend = get_backend()
+    book_ids = list(book_ids)
+    if backend is None or not book_ids:
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(book_ids), batch_size):
+            backend.index(cursor, book_ids[start:start + batch_size], replace)
+
+
+def remove_books(book_ids):
+    backend = get_backend()
+    book_ids = list(book_ids)
+    if backend is None or not book_ids:
+        return
+    with connection.cursor() as cursor:
+        backend.remove(cursor, book_ids)
+
+
+def rebuild(batch_size=5000):
+    """Drop and refill the search index from the books table, returning the books indexed."""
+    if get_backend() is None:
+        return 0
+    drop_index()
+    create_index()
+    book_ids = list(Book.objects.order_by('pk').values_list('pk', flat=True))
+    index_books(book_ids, batch_size, replace=False)
+    return len(book_ids)
+
+
+def search(query, limit):
+    """Return the ids of up to ``limit`` books matching ``query``, best first.
+
+    Every word must match and the last one may also match as a prefix, the way
+    a search box is typed. The cost grows with the number of books sharing the
+    query's words, not with the size of the catalogue.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    backend = get_backend()
+    if backend is None:
+        queryset = Book.objects.all()
+        for term in terms:
+            queryset = queryset.filter(name__icontains=term)
+        return list(queryset.order_by('pk').values_list('pk', flat=True)[:limit])
+    with connection.cursor() as cursor:
+        return backend.search(cursor, terms, limit)
@@ -0,0 +1,116 @@
+"""Signal handlers keeping derived book data in sync."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from book import changes, denorm, search
+from book.models import Author, Book, TableVersion
+
+# The books to index, with whether to replace their entries, and the books whose
+# author names to refresh at the end of the current batched_refresh() block.
+_pending = ContextVar('pending_refresh', default=None)
+
+
+@contextmanager
+def batched_refresh():
+    """Refresh the books written in the block once, at its end, rather than on every signal.
+
+    Saving a book and replacing its authors sends post_save, post_remove and
+    post_add, each of which would otherwise refresh it. Nothing is refreshed
+    when the block raises. To be used inside the writing transaction.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    index, names = {}, set()
+    token = _pending.set((index, names))
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    for replace in (False, True):
+        search.index_books([book_id for book_id, book_replace in index.items() if book_replace == replace],
+                           replace=replace)
+    denorm.refresh_author_names(sorted(names))
+
+
+def index_books(book_ids, replace=True):
+    pending = _pending.get()
+    if pending is None:
+        search.index_books(book_ids, replace=replace)
+        return
+    index = pending[0]
+    for book_id in book_ids:
+        # A book created in the block has no entry to replace.
+        index[book_id] = index.get(book_id, replace) and replace
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, created, **kwargs):
+    index_books([instance.pk], replace=not created)
+
+
+@receiver(post_delete, sender=Book)
+def remove_deleted_book(sender, instance, **kwargs):
+    search.remove_books([instance.pk])
+
+
+def refresh_books(book_ids):
+    pending = _pending.get()
+    index_books(book_ids)
+    if pending is None:
+        denorm.refresh_author_names(book_ids)
+    else:
+        pending[1].update(book_ids)
+
+
+def refresh_author_change(book_ids):
+    """refresh_books after a change of their author, which no book write reports.
+
+    Bumps the books' TableVersion and ``updated_at`` for cached lists and
+    conditional GETs, and logs the change in the feed, in one transaction.
+    """
+    if not book_ids:
+        return
+    with transaction.atomic():
+        refresh_books(book_ids)
+        TableVersion.objects.bump(Book)
+        Book.objects.filter(pk__in=book_ids).update(updated_at=timezone.now())
+        changes.record(book_ids)
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def index_book_authors(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_books([instance.pk])
+    elif action == 'pre_clear':
+        # pk_set is None when clearing, remember which books lose the author.
+        instance._cleared_book_ids = list(sender.objects.filter(author=instance).values_list('book_id', flat=True))
+    elif action == 'post_clear':
+        refresh_books(instance.__dict__.pop('_cleared_book_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_books(pk_set)
+
+
+@receiver(post_save, sender=Author)
+def refresh_renamed_author_books(sender, instance, created, **kwargs):
+    if not created:
+        refresh_author_change(list(
+            Book.authors.through.objects.filter(author=instance).values_list('book_id', flat=True)))
+
+
+@receiver(pre_delete, sender=Author)
+def remember_author_books(sender, instance, **kwargs):
+    # The cascade deleting the author's Book.authors rows sends no m2m_changed.
+    instance._book_ids = list(Book.authors.through.objects.filter(author=instance).values_list('book_id', flat=True))
+
+
+@receiver(post_delete, sender=Author)
+def refresh_author_books(sender, instance, **kwargs):
+    refresh_author_change(instance.__dict__.pop('_book_ids', []))
@@ -0,0 +1,23 @@
+import pytest
+from django.core.cache import caches
+
+from book import admission, search
+from book.models import Book, TableVersion
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    """Create the tables and rows migrations add, for runs with --nomigrations as configured."""
+    with django_db_blocker.unblock():
+        search.create_index()
+        TableVersion.objects.get_or_create(table=Book._meta.db_table)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Caches are process wide, so keep entries from leaking between tests."""
+    yield
+    for cache in caches.all():
+        cache.clear()
+    # Rate limit buckets and slot times are process wide too.
+    admission.reset()
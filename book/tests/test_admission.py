@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import caches
+from rest_framework.test import APIRequestFactory
+
+from book import admission
+from book.admission import AdmissionRejected, ConcurrencyLimiter, RateLimiter, SharedSlots, TokenBucket
+from book.tests.test_upstream import FakeClock
+
+
+class TestRateLimit:
+    def test_bucket_refills(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=2, clock=clock)
+        assert [bucket.take() for _ in range(3)] == [0, 0, 0.5]
+        clock.now = 0.5
+        assert bucket.take() == 0
+        assert bucket.take() == 0.5
+
+    def test_buckets_per_client(self):
+        limiter = RateLimiter(rate=1, burst=1, max_clients=2, clock=FakeClock())
+        assert [limiter.take(client) for client in ('a', 'b', 'a')] == [0, 0, 1]
+        # c pushes out b, the client seen least recently, which starts again with a full bucket.
+        assert limiter.take('c') == 0
+        assert limiter.take('b') == 0
+        assert limiter.take('c') == 1
+
+    def test_client_address(self, settings):
+        # 10.0.0.1 as sent by the client, then the address each of two proxies saw the request from.
+        request = APIRequestFactory().get('/', HTTP_X_FORWARDED_FOR='10.0.0.1, 10.0.0.2, 10.0.0.3')
+        assert admission.client_address(request) == '127.0.0.1'
+        settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION,
+                                                 CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+        assert admission.client_address(request) == '10.0.0.3'
+        settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, TRUSTED_PROXY_HOPS=2)
+        assert admission.client_address(request) == '10.0.0.2'
+        settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, TRUSTED_PROXY_HOPS=5)
+        assert admission.client_address(request) == '10.0.0.1'
+        assert admission.client_address(APIRequestFactory().get('/')) == '127.0.0.1'
+
+
+class TestConcurrencyLimiter:
+    def test_rejects_when_queue_is_full(self):
+        limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=0, max_wait=1)
+        with limiter.slot():
+            with pytest.raises(AdmissionRejected) as rejected:
+                with limiter.slot():
+                    pass
+        assert rejected.value.retry_after == 1
+        assert limiter.in_flight == 0
+
+    def test_waiter_gets_released_slot(self):
+        limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1, max_wait=5)
+        done = []
+
+        def wait_for_slot():
+            with limiter.slot():
+                done.append(True)
+
+        with limiter.slot():
+            thread = threading.Thread(target=wait_for_slot)
+            thread.start()
+            while not limiter.waiting:
+                time.sleep(0.001)
+            assert not done
+        thread.join(5)
+        assert done == [True]
+
+    def test_rejects_after_max_wait(self):
+        limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1, max_wait=0.01)
+        with limiter.slot():
+            with pytest.raises(AdmissionRejected):
+                with limiter.slot():
+                    pass
+        assert limiter.waiting == 0
+
+    def test_rejects_at_once_when_calls_are_slow(self):
+        clock = FakeClock()
+        limiter = ConcurrencyLimiter(max_in_flight=2, max_queue=10, max_wait=2, clock=clock)
+        limiter.average = 3
+        with limiter.slot(), limiter.slot():
+            # Two calls of 3 seconds ahead on two slots: expected wait 1.5 seconds.
+            assert limiter.expected_wait() == 1.5
+            limiter.average = 5
+            with pytest.raises(AdmissionRejected) as rejected:
+                with limiter.slot():
+                    pass
+        assert rejected.value.retry_after == 3
+
+    def test_average_slot_time(self):
+        clock = FakeClock()
+        limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=0, max_wait=1, clock=clock)
+        with limiter.slot():
+            clock.now = 10
+        assert limiter.average == 10 * ConcurrencyLimiter.SMOOTHING
+
+    def test_shared_slots(self):
+        shared = SharedSlots(caches['default'], size=1, lease=60)
+        first = ConcurrencyLimiter(max_in_flight=1, max_queue=0, max_wait=0.01, shared=shared, poll_interval=0.001)
+        second = ConcurrencyLimiter(max_in_flight=1, max_queue=0, max_wait=0.01, shared=shared, poll_interval=0.001)
+        with first.slot():
+            with pytest.raises(AdmissionRejected):
+                with second.slot():
+                    pass
+            assert second.in_flight == 0
+        with second.slot():
+            pass
+
+    def test_shared_slot_taken_over_after_its_lease_is_kept(self):
+        cache = caches['default']
+        shared = SharedSlots(cache, size=1, lease=60)
+        expired = shared.acquire()
+        # The lease ran out and another process took the slot.
+        cache.delete(expired[0])
+        taken = shared.acquire()
+        shared.release(expired)
+        assert shared.acquire() is None
+        shared.release(taken)
+        assert shared.acquire() is not None
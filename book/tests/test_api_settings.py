@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+WORKER = '''
+import json, sys
+import django
+from django.core.management import call_command
+
+django.setup()
+call_command('migrate', verbosity=0)
+from django.test import Client
+
+client = Client(HTTP_HOST='localhost')
+client.post('/api/v1/books/', {'name': 'b', 'isbn': '1', 'country': 'c', 'authors': ['a'], 'number_of_pages': 1,
+                               'publisher': 'p', 'release_date': '2019-05-26'}, content_type='application/json')
+print(json.dumps({
+    'books': client.get('/api/v1/books/').json()['data'],
+    'admin': client.get('/admin/').status_code,
+    'modules': sorted(name for name in sys.modules if name.startswith(('django.contrib', 'httpx'))),
+}))
+'''
+
+
+def test_api_only_profile_serves_the_api(tmp_path):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='bookinformation.api_settings',
+               DB_NAME=str(tmp_path / 'db.sqlite3'))
+    process = subprocess.run([sys.executable, '-c', WORKER], env=env, cwd=settings.BASE_DIR, capture_output=True,
+                             text=True, check=True)
+    report = json.loads(process.stdout)
+    assert [book['authors'] for book in report['books']] == [['a']]
+    assert report['admin'] == 404
+    # Django REST framework imports parts of the admin and messages whatever the settings.
+    for module in ['django.contrib.sessions', 'django.contrib.auth.models', 'django.contrib.contenttypes.models',
+                   'httpx']:
+        assert module not in report['modules']
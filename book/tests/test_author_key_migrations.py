@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+WORKER = '''
+import json
+import django
+from django.core.management import call_command
+from django.db import connection
+
+django.setup()
+call_command('migrate', 'book', '0012', verbosity=0)
+with connection.cursor() as cursor:
+    cursor.executemany('INSERT INTO book_author (name) VALUES (%s)', [('author{}'.format(i),) for i in range(2500)])
+    cursor.execute("INSERT INTO book_book (name, isbn, country, number_of_pages, publisher, release_date, updated_at, "
+                   "author_names) VALUES ('b', '1', 'c', 10, 'p', '2000-01-01', '2020-01-01', '')")
+    cursor.executemany('INSERT INTO book_book_authors (book_id, author_id) VALUES (1, %s)',
+                       [('author{}'.format(i),) for i in range(0, 2500, 2)])
+    cursor.execute("INSERT INTO book_authorstats (author_id, book_count, total_pages) VALUES ('author4', 1, 10)")
+call_command('migrate', 'book', '0013', verbosity=0)
+# Written by the previous release between the two migrations.
+with connection.cursor() as cursor:
+    cursor.execute("INSERT INTO book_author (name) VALUES ('late')")
+    cursor.executemany('INSERT INTO book_book_authors (book_id, author_id) VALUES (1, %s)', [('late',), ('author1',)])
+call_command('migrate', verbosity=0)
+
+from book.models import Author, AuthorStats, Book
+
+book = Book.objects.get()
+print(json.dumps({
+    'authors': [author.name for author in book.authors.all()],
+    'stats': list(AuthorStats.objects.values_list('author__name', 'book_count')),
+    'created': Author.objects.create(name='new').pk,
+}))
+'''
+
+
+def test_author_keys_migrate_with_their_books(tmp_path):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='bookinformation.settings', DB_NAME=str(tmp_path / 'db.sqlite3'))
+    process = subprocess.run([sys.executable, '-c', WORKER], env=env, cwd=settings.BASE_DIR, capture_output=True,
+                             text=True, check=True)
+    report = json.loads(process.stdout)
+    assert report['authors'] == sorted(['author{}'.format(i) for i in range(0, 2500, 2)] + ['author1', 'late'])
+    assert report['stats'] == [['author4', 1]]
+    assert report['created'] == 2502
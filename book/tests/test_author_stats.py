@@ -0,0 +1,118 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from mixer.backend.django import mixer
+from rest_framework.test import APIClient
+
+from book import author_stats
+from book.bulk import bulk_upsert_books
+from book.models import AuthorStats
+from book.pagination import AuthorKeysetPagination
+
+pytestmark = pytest.mark.django_db
+
+
+def book_data(**kwargs):
+    return dict({'name': 'b', 'isbn': '1', 'country': 'c', 'authors': ['a'], 'number_of_pages': 100,
+                 'publisher': 'p', 'release_date': '2000-01-01'}, **kwargs)
+
+
+def stats(name):
+    row = AuthorStats.objects.filter(author__name=name).values_list(*author_stats.STATS_FIELDS).first()
+    return tuple(str(value) if hasattr(value, 'isoformat') else value for value in row) if row else None
+
+
+def assert_consistent():
+    assert author_stats.reconcile(fix=False) == []
+
+
+class TestBookViewSetWrites:
+    @pytest.fixture
+    def client(self):
+        return APIClient()
+
+    def create(self, client, **kwargs):
+        return client.post('/api/v1/books/', book_data(**kwargs), format='json').json()['data'][0]['book']['id']
+
+    def test_create(self, client):
+        self.create(client, authors=['a', 'b'])
+        self.create(client, number_of_pages=50, release_date='1990-05-01')
+        assert stats('a') == (2, 150, '1990-05-01', '2000-01-01')
+        assert stats('b') == (1, 100, '2000-01-01', '2000-01-01')
+        assert_consistent()
+
+    def test_update(self, client):
+        book_id = self.create(client, authors=['a', 'b'])
+        other = self.create(client, release_date='1990-05-01')
+        client.patch('/api/v1/books/{}/'.format(book_id), {'number_of_pages': 10, 'release_date': '1980-01-01'},
+                     format='json')
+        assert stats('a') == (2, 110, '1980-01-01', '1990-05-01')
+        client.patch('/api/v1/books/{}/'.format(book_id), {'authors': ['b']}, format='json')
+        assert stats('a') == (1, 100, '1990-05-01', '1990-05-01')
+        client.patch('/api/v1/books/{}/'.format(other), {'authors': ['a', 'b']}, format='json')
+        assert stats('b') == (2, 110, '1980-01-01', '1990-05-01')
+        client.patch('/api/v1/books/{}/'.format(book_id), {'name': 'renamed'}, format='json')
+        assert_consistent()
+
+    def test_destroy(self, client):
+        first = self.create(client, release_date='1990-05-01')
+        self.create(client)
+        client.delete('/api/v1/books/{}/'.format(first))
+        assert stats('a') == (1, 100, '2000-01-01', '2000-01-01')
+        assert_consistent()
+
+
+def test_bulk_upsert_refreshes_old_and_new_authors():
+    bulk_upsert_books([book_data(authors=['a'])])
+    bulk_upsert_books([book_data(authors=['b'], number_of_pages=7)], upsert_on_isbn=True)
+    assert stats('a') == (0, 0, None, None)
+    assert stats('b') == (1, 7, '2000-01-01', '2000-01-01')
+    assert_consistent()
+
+
+class TestReconcile:
+    def test_drift_is_found_and_fixed(self):
+        author = mixer.blend('book.Author', name='a')
+        mixer.blend('book.Book', release_date='2019-05-26', number_of_pages=5, authors=[author])
+        mixer.blend('book.Author', name='no books')
+        assert author_stats.reconcile(fix=False) == [author.pk]
+        assert author_stats.reconcile(batch_size=1) == [author.pk]
+        assert stats('a') == (1, 5, '2019-05-26', '2019-05-26')
+        assert stats('no books') is None
+        assert_consistent()
+
+    def test_command(self):
+        mixer.blend('book.Book', release_date='2019-05-26', authors=[mixer.blend('book.Author', name='a')])
+        with pytest.raises(CommandError, match='1 authors'):
+            call_command('reconcile_author_stats', '--check')
+        call_command('reconcile_author_stats')
+        call_command('reconcile_author_stats', '--check')
+
+
+class TestAuthorViewSet:
+    @pytest.fixture
+    def authors(self):
+        bulk_upsert_books([book_data(authors=['J. R. R. Tolkien', 'b']), book_data(isbn='2', authors=['b'])])
+        mixer.blend('book.Author', name='c')
+
+    def test_list_pages_by_name(self, authors, django_assert_num_queries):
+        client = APIClient()
+        with django_assert_num_queries(1):
+            response = client.get('/api/v1/authors/', {'page_size': 2}).json()
+        assert [author['name'] for author in response['data']] == ['J. R. R. Tolkien', 'b']
+        assert response['data'][1] == {'name': 'b', 'book_count': 2, 'total_pages': 200,
+                                       'first_release_date': '2000-01-01', 'last_release_date': '2000-01-01'}
+        response = client.get(response['next']).json()
+        assert response['data'] == [{'name': 'c', 'book_count': 0, 'total_pages': 0,
+                                     'first_release_date': None, 'last_release_date': None}]
+        assert response['next'] is None
+
+    def test_list_invalid_cursor(self, authors):
+        cursor = AuthorKeysetPagination().encode_cursor([None])
+        assert APIClient().get('/api/v1/authors/', {'cursor': cursor}).status_code == 404
+
+    def test_retrieve_by_name(self, authors):
+        response = APIClient().get('/api/v1/authors/J. R. R. Tolkien/')
+        assert response.status_code == 200
+        assert response.json()['data']['book_count'] == 1
+        assert APIClient().get('/api/v1/authors/nobody/').status_code == 404
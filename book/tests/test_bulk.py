@@ -0,0 +1,79 @@
+import pytest
+from mixer.backend.django import mixer
+
+from book.bulk import bulk_upsert_books, resolve_authors
+from book.models import Author, Book
+
+pytestmark = pytest.mark.django_db
+
+
+def make_item(index, **kwargs):
+    item = {'name': 'Book {}'.format(index), 'isbn': '978-{:010d}'.format(index), 'country': 'india',
+            'number_of_pages': 100, 'publisher': 'pub1', 'release_date': '2019-05-26',
+            'authors': ['author{}'.format(index % 3)]}
+    item.update(kwargs)
+    return item
+
+
+class TestResolveAuthors:
+    def test_creates_missing_authors(self, django_assert_num_queries):
+        mixer.blend('book.Author', name='existing')
+        with django_assert_num_queries(3):
+            pks = resolve_authors(['existing', 'new', 'new'])
+        assert pks == dict(Author.objects.values_list('name', 'pk'))
+        assert Author.objects.count() == 2
+
+    def test_all_known_authors_cost_one_query(self, django_assert_num_queries):
+        mixer.blend('book.Author', name='existing')
+        with django_assert_num_queries(1):
+            resolve_authors(['existing'])
+
+
+class TestBulkUpsertBooks:
+    def test_create(self):
+        results = bulk_upsert_books([make_item(i) for i in range(10)], batch_size=3)
+        assert [result['status'] for result in results] == ['created'] * 10
+        assert Book.objects.count() == 10
+        assert Author.objects.count() == 3
+        book = Book.objects.get(pk=results[4]['id'])
+        assert book.name == 'Book 4'
+        assert [author.name for author in book.authors.all()] == ['author1']
+
+    def test_query_count_does_not_grow_with_items(self, django_assert_max_num_queries):
+        with django_assert_max_num_queries(22):
+            bulk_upsert_books([make_item(i) for i in range(200)], batch_size=100)
+
+    def test_invalid_items_are_reported(self):
+        results = bulk_upsert_books([make_item(0), make_item(1, number_of_pages='many')])
+        assert results[0]['status'] == 'created'
+        assert results[1]['status'] == 'error'
+        assert 'number_of_pages' in results[1]['errors']
+        assert Book.objects.count() == 1
+
+    def test_upsert_on_isbn(self):
+        bulk_upsert_books([make_item(0), make_item(1)])
+        results = bulk_upsert_books([make_item(0, name='Renamed', authors=['other']), make_item(2)],
+                                    upsert_on_isbn=True)
+        assert [result['status'] for result in results] == ['updated', 'created']
+        assert Book.objects.count() == 3
+        book = Book.objects.get(pk=results[0]['id'])
+        assert book.name == 'Renamed'
+        assert [author.name for author in book.authors.all()] == ['other']
+
+    def test_upsert_repeated_isbn_in_one_request(self):
+        results = bulk_upsert_books([make_item(0), make_item(0, name='Second')], upsert_on_isbn=True)
+        assert [result['status'] for result in results] == ['created', 'updated']
+        assert results[0]['id'] == results[1]['id']
+        assert Book.objects.get().name == 'Second'
+
+    def test_upsert_matches_any_isbn_form(self):
+        first = bulk_upsert_books([make_item(0, isbn='0-553-10354-7')])[0]['id']
+        bulk_upsert_books([make_item(1, isbn='0553103547')])
+        results = bulk_upsert_books([make_item(2, isbn='978-0553103540', name='Renamed')], upsert_on_isbn=True)
+        assert results[0] == {'index': 0, 'status': 'updated', 'id': first}
+        assert Book.objects.get(pk=first).name == 'Renamed'
+
+    def test_without_upsert_isbn_duplicates_are_created(self):
+        bulk_upsert_books([make_item(0)])
+        bulk_upsert_books([make_item(0)])
+        assert Book.objects.count() == 2
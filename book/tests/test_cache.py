@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+from requests.exceptions import ConnectionError, HTTPError
+
+from book.admission import AdmissionRejected
+from book.cache import ExternalBookCache, normalize_name
+
+
+@pytest.fixture
+def cache(settings):
+    settings.EXTERNAL_BOOKS_CACHE_TTL = 60
+    settings.EXTERNAL_BOOKS_CACHE_STALE_TTL = 600
+    return ExternalBookCache()
+
+
+def test_normalize_name():
+    assert normalize_name('  A   Game of\tThrones ') == 'A Game of Thrones'
+    assert normalize_name('') == ''
+
+
+class TestExternalBookCache:
+    def test_hit_skips_fetch(self, cache):
+        fetch = Mock(return_value=[{'name': 'A Game of Thrones'}])
+        assert cache.get_or_fetch('A Game of Thrones', fetch) == [{'name': 'A Game of Thrones'}]
+        assert cache.get_or_fetch(' A Game  of Thrones', fetch) == [{'name': 'A Game of Thrones'}]
+        assert fetch.call_count == 1
+
+    def test_expired_entry_is_refetched(self, cache, settings):
+        settings.EXTERNAL_BOOKS_CACHE_TTL = 0
+        fetch = Mock(side_effect=[['old'], ['new']])
+        assert cache.get_or_fetch('book', fetch) == ['old']
+        assert cache.get_or_fetch('book', fetch) == ['new']
+
+    @pytest.mark.parametrize('error', [ConnectionError(), HTTPError()])
+    def test_stale_served_on_upstream_error(self, cache, settings, error):
+        settings.EXTERNAL_BOOKS_CACHE_TTL = 0
+        cache.get_or_fetch('book', Mock(return_value=['stale']))
+        assert cache.get_or_fetch('book', Mock(side_effect=error)) == ['stale']
+
+    def test_error_without_stale_entry_is_raised(self, cache):
+        with pytest.raises(ConnectionError):
+            cache.get_or_fetch('book', Mock(side_effect=ConnectionError()))
+
+    def test_concurrent_misses_fetch_once(self, cache):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return ['book']
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch('book', fetch)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert results == [['book']] * 8
+        assert cache._locks == {}
+
+    @pytest.fixture
+    def slow_fetch(self, cache, settings):
+        """Hold a fetch of 'book' in flight until the returned event is set."""
+        settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, MAX_QUEUE=1, MAX_WAIT=0.05)
+        started, release = threading.Event(), threading.Event()
+
+        def fetch():
+            started.set()
+            release.wait(5)
+            return ['book']
+
+        thread = threading.Thread(target=cache.get_or_fetch, args=('book', fetch))
+        thread.start()
+        started.wait(5)
+        yield release
+        release.set()
+        thread.join()
+
+    def test_waiting_for_a_fetch_times_out(self, cache, slow_fetch):
+        fetch = Mock(return_value=['other'])
+        with pytest.raises(AdmissionRejected) as excinfo:
+            cache.get_or_fetch('book', fetch)
+        assert excinfo.value.retry_after == 1
+        fetch.assert_not_called()
+
+    def test_stale_served_while_waiting_times_out(self, cache, slow_fetch):
+        cache.backend.set(cache.make_key('book'), {'data': ['stale'], 'expires_at': time.time() - 1}, 60)
+        assert cache.get_or_fetch('book', Mock()) == ['stale']
+
+    def test_full_queue_rejected_at_once(self, cache, slow_fetch, settings):
+        settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, MAX_QUEUE=0, MAX_WAIT=5)
+        start = time.monotonic()
+        with pytest.raises(AdmissionRejected):
+            cache.get_or_fetch('book', Mock())
+        assert time.monotonic() - start < 1
+
+    def test_invalidate(self, cache):
+        fetch = Mock(return_value=['book'])
+        cache.get_or_fetch('book', fetch)
+        cache.invalidate('book')
+        cache.get_or_fetch('book', fetch)
+        assert fetch.call_count == 2
+
+
+class TestAsyncGetOrFetch:
+    def test_concurrent_misses_fetch_once(self, cache):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return ['book']
+
+        async def main():
+            return await asyncio.gather(*[cache.aget_or_fetch('book', fetch) for _ in range(8)])
+
+        assert asyncio.run(main()) == [['book']] * 8
+        assert len(calls) == 1
+        assert cache._flights == {}
+        assert asyncio.run(cache.aget_or_fetch('book', fetch)) == ['book']
+        assert len(calls) == 1
+
+    def test_stale_served_on_upstream_error(self, cache, settings):
+        settings.EXTERNAL_BOOKS_CACHE_TTL = 0
+        cache.get_or_fetch('book', Mock(return_value=['stale']))
+
+        async def fetch():
+            raise ConnectionError()
+
+        assert asyncio.run(cache.aget_or_fetch('book', fetch)) == ['stale']
+
+    def test_cancelled_caller_leaves_fetch_running(self, cache):
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return ['book']
+
+        async def main():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(cache.aget_or_fetch('book', fetch), 0.01)
+            await asyncio.sleep(0.1)
+
+        asyncio.run(main())
+        assert cache.get_or_fetch('book', Mock(side_effect=AssertionError)) == ['book']
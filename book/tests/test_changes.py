@@ -0,0 +1,156 @@
+import datetime
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from mixer.backend.django import mixer
+from rest_framework.test import APIClient
+
+from book import changes
+from book.bulk import bulk_upsert_books
+from book.models import Author, Book, BookChange, TableVersion
+
+pytestmark = pytest.mark.django_db
+
+
+def book_data(**kwargs):
+    return dict({'name': 'b', 'isbn': '1', 'country': 'c', 'authors': ['a'], 'number_of_pages': 1,
+                 'publisher': 'p', 'release_date': '2019-05-26'}, **kwargs)
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+def create(client, **kwargs):
+    return client.post('/api/v1/books/', book_data(**kwargs), format='json').json()['data'][0]['book']['id']
+
+
+def feed(client, **params):
+    return client.get('/api/v1/books/changes/', params)
+
+
+class TestFeed:
+    def test_writes_are_logged_in_order(self, client):
+        first = create(client, name='first')
+        second = create(client, name='second', isbn='2', authors=['z'])
+        client.patch('/api/v1/books/{}/'.format(first), {'authors': ['a', 'z']}, format='json')
+        client.delete('/api/v1/books/{}/'.format(second))
+        assert list(BookChange.objects.order_by('pk').values_list('book_id', 'action')) == [
+            (first, 'upsert'), (second, 'upsert'), (first, 'upsert'), (second, 'delete')]
+        response = feed(client)
+        assert response.status_code == 200
+        # The last change of each book, with the book as it is now.
+        assert [(change['cursor'], change['id'], change['action']) for change in response.data['data']] == [
+            (3, first, 'upsert'), (4, second, 'delete')]
+        assert response.data['data'][0]['book']['authors'] == ['a', 'z']
+        assert response.data['data'][1]['book'] is None
+        assert response.data['cursor'] == 4
+        assert response.data['next'] is None
+        assert feed(client, since=4).data['data'] == []
+
+    def test_bulk_writes_are_logged(self):
+        results = bulk_upsert_books([book_data(isbn=str(index)) for index in range(3)])
+        logged = BookChange.objects.order_by('pk').values_list('book_id', flat=True)
+        assert list(logged) == [result['id'] for result in results]
+
+    def test_author_rename_is_logged(self, client):
+        book_id = create(client)
+        version = TableVersion.objects.get_for_model(Book).version
+        author = Author.objects.get(name='a')
+        author.name = 'b'
+        author.save()
+        assert list(BookChange.objects.order_by('pk').values_list('book_id', flat=True)) == [book_id, book_id]
+        assert TableVersion.objects.get_for_model(Book).version == version + 1
+        assert feed(client, since=1).data['data'][0]['book']['authors'] == ['b']
+
+    def test_author_deletion_is_logged(self, client):
+        first, second = create(client), create(client, isbn='2', authors=['z'])
+        version = TableVersion.objects.get_for_model(Book).version
+        updated_at = Book.objects.get(pk=first).updated_at
+        Author.objects.get(name='a').delete()
+        assert list(BookChange.objects.order_by('pk').values_list('book_id', flat=True))[-1:] == [first]
+        assert TableVersion.objects.get_for_model(Book).version == version + 1
+        assert Book.objects.get(pk=first).updated_at > updated_at
+        assert feed(client, since=2).data['data'][0]['book']['authors'] == []
+        assert Book.objects.get(pk=second).authors.count() == 1
+
+    def test_pages(self, client):
+        ids = [create(client, isbn=str(index)) for index in range(5)]
+        response = feed(client, page_size=2)
+        assert [change['id'] for change in response.data['data']] == ids[:2]
+        assert 'since=2' in response.data['next']
+        response = feed(client, since=response.data['cursor'], page_size=2)
+        assert [change['id'] for change in response.data['data']] == ids[2:4]
+
+    def test_deleted_book_reads_as_tombstone(self, client):
+        book_id = create(client)
+        cursor = feed(client).data['cursor']
+        client.delete('/api/v1/books/{}/'.format(book_id))
+        # A consumer behind the delete learns of it from the earlier change too.
+        assert [change['action'] for change in feed(client, since=cursor - 1).data['data']] == ['delete']
+
+    @pytest.mark.parametrize('params', [{'since': 'x'}, {'since': -1}, {'wait': 'x'}, {'wait': -1},
+                                        {'wait': 'nan'}])
+    def test_bad_parameters(self, client, params):
+        assert feed(client, **params).status_code == 400
+
+    def test_cursor_past_the_last_change(self, client):
+        create(client)
+        response = feed(client, since=10)
+        assert response.data['data'] == []
+        assert response.data['cursor'] == 1
+        second = create(client, isbn='2')
+        assert [change['id'] for change in feed(client, since=response.data['cursor']).data['data']] == [second]
+
+    def test_one_query_per_table(self, client, django_assert_num_queries):
+        create(client)
+        create(client, isbn='2')
+        with django_assert_num_queries(4):
+            assert len(feed(client).data['data']) == 2
+
+
+class TestLongPoll:
+    def test_returns_empty_after_the_wait(self, client, settings):
+        settings.BOOKS_CHANGES_POLL_INTERVAL = 0.01
+        response = feed(client, wait=0.05)
+        assert response.data['data'] == []
+        assert response.data['cursor'] == 0
+
+    def test_returns_a_change_made_while_waiting(self, client, settings, monkeypatch):
+        settings.BOOKS_CHANGES_POLL_INTERVAL = 0.01
+        book = mixer.blend('book.Book', release_date='2019-05-26', authors=[])
+        monkeypatch.setattr(changes.time, 'sleep', lambda seconds: changes.record([book.pk]))
+        response = feed(client, wait=5)
+        assert [change['cursor'] for change in response.data['data']] == [1]
+
+    def test_wait_is_capped(self, settings, monkeypatch):
+        settings.BOOKS_CHANGES_MAX_WAIT = 0
+        monkeypatch.setattr(changes, 'wait', lambda since, timeout: pytest.fail("waited"))
+        assert feed(APIClient(), wait=10).status_code == 200
+
+
+class TestCompaction:
+    def test_superseded_changes_are_dropped(self, client):
+        book_id = create(client)
+        for name in ('x', 'y'):
+            client.patch('/api/v1/books/{}/'.format(book_id), {'name': name}, format='json')
+        other = create(client, isbn='2')
+        before = feed(client).data['data']
+        assert changes.compact(datetime.timedelta(days=1), batch_size=2) == (2, 0)
+        assert list(BookChange.objects.order_by('pk').values_list('book_id', flat=True)) == [book_id, other]
+        assert feed(client).data['data'] == before
+
+    def test_old_tombstones_move_the_horizon(self, client):
+        old, recent = create(client), create(client, isbn='2')
+        client.delete('/api/v1/books/{}/'.format(old))
+        BookChange.objects.filter(book_id=old).update(changed_at=timezone.now() - datetime.timedelta(days=8))
+        client.delete('/api/v1/books/{}/'.format(recent))
+        call_command('compact_book_changes', '--tombstone-days', '7')
+        assert list(BookChange.objects.order_by('pk').values_list('book_id', 'action')) == [(recent, 'delete')]
+        assert changes.horizon() == 3
+        response = feed(client, since=2)
+        assert response.status_code == 410
+        assert response.data['cursor'] == 4
+        assert feed(client, since=3).data['data'][0]['id'] == recent
@@ -0,0 +1,144 @@
+import pytest
+from django.http import QueryDict
+from mixer.backend.django import mixer
+from rest_framework.test import APIClient
+
+from book.bulk import bulk_upsert_books
+from book.conditional import make_etag, normalize_params
+from book.models import Book, TableVersion
+
+pytestmark = pytest.mark.django_db
+
+
+def make_book(**kwargs):
+    return mixer.blend('book.Book', release_date='2019-05-26', authors=[], **kwargs)
+
+
+class TestHelpers:
+    def test_normalize_params(self):
+        assert normalize_params(QueryDict('name=b&country=+x+&name=a&publisher=')) == \
+            normalize_params(QueryDict('country=x&name=a&name=b'))
+
+    def test_make_etag_is_strong_and_quoted(self):
+        etag = make_etag('book', 1)
+        assert etag.startswith('"') and etag.endswith('"')
+        assert etag != make_etag('book', 2)
+
+
+class TestTableVersion:
+    def test_bump(self):
+        before = TableVersion.objects.get_for_model(Book).version
+        TableVersion.objects.bump(Book)
+        version = TableVersion.objects.get_for_model(Book)
+        assert version.version == before + 1
+        assert version.updated_at is not None
+
+    def test_bump_creates_missing_row(self):
+        TableVersion.objects.all().delete()
+        assert TableVersion.objects.get_for_model(Book).version == 0
+        TableVersion.objects.bump(Book)
+        assert TableVersion.objects.get_for_model(Book).version == 1
+
+    def test_bulk_upsert_bumps(self):
+        before = TableVersion.objects.get_for_model(Book).version
+        bulk_upsert_books([{'name': 'b', 'isbn': '1', 'country': 'c', 'number_of_pages': 1,
+                            'publisher': 'p', 'release_date': '2019-05-26', 'authors': []}])
+        assert TableVersion.objects.get_for_model(Book).version == before + 1
+
+
+class TestRetrieve:
+    def test_validators(self):
+        book = make_book()
+        resp = APIClient().get('/api/v1/books/{}/'.format(book.pk))
+        assert resp.status_code == 200
+        assert resp['ETag'].startswith('"')
+        assert 'Last-Modified' in resp
+        assert 'updated_at' not in resp.data['data']
+
+    def test_if_none_match(self, django_assert_num_queries):
+        book = make_book()
+        client = APIClient()
+        etag = client.get('/api/v1/books/{}/'.format(book.pk))['ETag']
+        with django_assert_num_queries(1):
+            resp = client.get('/api/v1/books/{}/'.format(book.pk), HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+        assert resp['ETag'] == etag
+        assert resp.content == b''
+
+    def test_if_modified_since(self):
+        book = make_book()
+        client = APIClient()
+        last_modified = client.get('/api/v1/books/{}/'.format(book.pk))['Last-Modified']
+        assert client.get('/api/v1/books/{}/'.format(book.pk), HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+
+    def test_update_changes_etag(self):
+        book = make_book()
+        client = APIClient()
+        etag = client.get('/api/v1/books/{}/'.format(book.pk))['ETag']
+        client.patch('/api/v1/books/{}/'.format(book.pk), data={'name': 'new'}, format='json')
+        resp = client.get('/api/v1/books/{}/'.format(book.pk), HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+        assert resp['ETag'] != etag
+
+    def test_etag_depends_on_format(self, settings):
+        # The browsable API queries for its forms.
+        settings.QUERY_BUDGET = dict(settings.QUERY_BUDGET, RAISE=False)
+        book = make_book()
+        client = APIClient()
+        assert client.get('/api/v1/books/{}/'.format(book.pk))['ETag'] != \
+            client.get('/api/v1/books/{}/?format=api'.format(book.pk))['ETag']
+
+
+class TestList:
+    def test_if_none_match(self, django_assert_num_queries):
+        make_book(country='india')
+        client = APIClient()
+        etag = client.get('/api/v1/books/?country=india')['ETag']
+        with django_assert_num_queries(1):
+            resp = client.get('/api/v1/books/?country=india', HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+
+    def test_etag_depends_on_filters(self):
+        make_book(country='india')
+        client = APIClient()
+        assert client.get('/api/v1/books/?country=india')['ETag'] != client.get('/api/v1/books/?country=nepal')['ETag']
+        assert client.get('/api/v1/books/?country=india&name=')['ETag'] == \
+            client.get('/api/v1/books/?country=india')['ETag']
+
+    @pytest.mark.parametrize('write', ['create', 'update', 'destroy'])
+    def test_writes_change_etag(self, write):
+        book = make_book()
+        client = APIClient()
+        etag = client.get('/api/v1/books/')['ETag']
+        if write == 'create':
+            client.post('/api/v1/books/', data={'name': 'b', 'isbn': '1', 'country': 'c', 'number_of_pages': 1,
+                                                'publisher': 'p', 'release_date': '2019-05-26', 'authors': ['a']},
+                        format='json')
+        elif write == 'update':
+            client.patch('/api/v1/books/{}/'.format(book.pk), data={'name': 'new'}, format='json')
+        else:
+            client.delete('/api/v1/books/{}/'.format(book.pk))
+        resp = client.get('/api/v1/books/', HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+        assert resp['ETag'] != etag
+
+
+class TestListCache:
+    @pytest.fixture(autouse=True)
+    def list_cache(self, settings):
+        settings.BOOKS_LIST_CACHE_ALIAS = 'default'
+
+    def test_cached(self, django_assert_num_queries):
+        make_book(country='india')
+        client = APIClient()
+        first = client.get('/api/v1/books/?country=india&publisher=')
+        with django_assert_num_queries(1):
+            second = client.get('/api/v1/books/?publisher=&country=india')
+        assert second.content == first.content
+
+    def test_invalidated_by_writes(self):
+        book = make_book()
+        client = APIClient()
+        client.get('/api/v1/books/')
+        client.patch('/api/v1/books/{}/'.format(book.pk), data={'name': 'new'}, format='json')
+        assert client.get('/api/v1/books/').data['data'][0]['name'] == 'new'
@@ -0,0 +1,115 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from mixer.backend.django import mixer
+from rest_framework.test import APIClient
+
+from book import denorm
+from book.bulk import bulk_upsert_books
+from book.models import Author, Book
+
+pytestmark = pytest.mark.django_db
+
+
+def stored_names(book):
+    return denorm.split_names(Book.objects.values_list('author_names', flat=True).get(pk=book.pk))
+
+
+@pytest.fixture
+def books():
+    authors = [mixer.blend('book.Author', name='author{}'.format(i)) for i in range(2)]
+    return [mixer.blend('book.Book', name='Book {}'.format(i), release_date='2019-05-26', authors=authors[:i + 1])
+            for i in range(2)]
+
+
+def test_join_and_split():
+    assert denorm.join_names([]) == ''
+    assert denorm.split_names('') == []
+    assert denorm.split_names(denorm.join_names(['a', 'b c'])) == ['a', 'b c']
+
+
+class TestMaintenance:
+    def test_authors_changes(self, books):
+        book = books[1]
+        assert stored_names(book) == ['author0', 'author1']
+        book.authors.remove(Author.objects.get(name='author0'))
+        assert stored_names(book) == ['author1']
+        book.authors.add(mixer.blend('book.Author', name='author2'))
+        assert stored_names(book) == ['author1', 'author2']
+        book.authors.clear()
+        assert stored_names(book) == []
+
+    def test_reverse_changes(self, books):
+        author = Author.objects.get(name='author1')
+        author.book_set.add(books[0])
+        assert stored_names(books[0]) == ['author0', 'author1']
+        author.book_set.clear()
+        assert [stored_names(book) for book in books] == [['author0'], ['author0']]
+
+    def test_author_renamed(self, books):
+        author = Author.objects.get(name='author0')
+        author.name = 'author9'
+        author.save()
+        assert [stored_names(book) for book in books] == [['author9'], ['author1', 'author9']]
+
+    def test_author_deleted(self, books):
+        Author.objects.get(name='author0').delete()
+        assert [stored_names(book) for book in books] == [[], ['author1']]
+
+    def test_api_writes(self):
+        client = APIClient()
+        client.post('/api/v1/books/', {'name': 'b', 'isbn': '1', 'country': 'c', 'authors': ['z', 'a'],
+                                       'number_of_pages': 1, 'publisher': 'p', 'release_date': '2019-05-26'},
+                    format='json')
+        book = Book.objects.get()
+        assert stored_names(book) == ['a', 'z']
+        client.patch('/api/v1/books/{}/'.format(book.pk), {'authors': ['a']}, format='json')
+        assert stored_names(book) == ['a']
+
+    def test_bulk_upsert(self):
+        item = {'name': 'b', 'isbn': '1', 'country': 'c', 'number_of_pages': 1, 'publisher': 'p',
+                'release_date': '2019-05-26'}
+        bulk_upsert_books([dict(item, authors=['y', 'x'])])
+        bulk_upsert_books([dict(item, authors=['w'])], upsert_on_isbn=True)
+        assert stored_names(Book.objects.get()) == ['w']
+
+
+class TestConsistency:
+    def test_find_and_rebuild(self, books):
+        assert list(denorm.find_inconsistent()) == []
+        Book.objects.filter(pk=books[0].pk).update(author_names='')
+        assert list(denorm.find_inconsistent(batch_size=1)) == [books[0].pk]
+        assert denorm.rebuild(batch_size=1) == 2
+        assert list(denorm.find_inconsistent()) == []
+
+    def test_command(self, books):
+        Book.objects.filter(pk=books[1].pk).update(author_names='')
+        with pytest.raises(CommandError, match='1 books'):
+            call_command('rebuild_book_denorm', '--check')
+        call_command('rebuild_book_denorm')
+        call_command('rebuild_book_denorm', '--check')
+
+
+class TestReads:
+    @pytest.fixture
+    def enabled(self, settings):
+        settings.BOOKS_DENORMALIZED_AUTHORS = True
+
+    def test_same_responses(self, books, settings):
+        client = APIClient()
+        paths = ['/api/v1/books/', '/api/v1/books/{}/'.format(books[1].pk), '/api/v1/books/export/',
+                 '/api/v1/books/search/?q=book']
+        joined = [b''.join(client.get(path)) for path in paths]
+        settings.BOOKS_DENORMALIZED_AUTHORS = True
+        assert [b''.join(client.get(path)) for path in paths] == joined
+
+    def test_list_skips_the_author_query(self, books, enabled, django_assert_num_queries):
+        with django_assert_num_queries(2):
+            APIClient().get('/api/v1/books/')
+
+    @pytest.mark.parametrize('denormalized', [False, True])
+    def test_author_filter(self, books, settings, denormalized):
+        settings.BOOKS_DENORMALIZED_AUTHORS = denormalized
+        response = APIClient().get('/api/v1/books/', {'author': 'author1'})
+        assert [book['name'] for book in response.json()['data']] == ['Book 1']
+        assert APIClient().get('/api/v1/books/', {'author': 'author'}).json()['data'] == []
@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from mixer.backend.django import mixer
+
+from book import export
+from book.models import Book
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def books():
+    authors = mixer.cycle(2).blend('book.Author', name=mixer.sequence(lambda count: "author%s" % count))
+    return [mixer.blend('book.Book', name="Book {}".format(index), isbn="123-456789012", country="india",
+                        number_of_pages=26, publisher="pub1", release_date="2019-05-26",
+                        authors=authors[:index + 1])
+            for index in range(3)]
+
+
+class TestIterBooks:
+    def test_rows_with_authors(self, books):
+        rows = list(export.iter_books(Book.objects.all()))
+        assert rows[0] == {'id': books[0].pk, 'name': 'Book 0', 'isbn': '123-456789012', 'country': 'india',
+                           'number_of_pages': 26, 'publisher': 'pub1', 'release_date': '2019-05-26',
+                           'authors': ['author0']}
+        assert [sorted(row['authors']) for row in rows] == [['author0'], ['author0', 'author1'],
+                                                            ['author0', 'author1']]
+
+    def test_one_author_query_per_chunk(self, books, django_assert_num_queries):
+        with django_assert_num_queries(3):
+            assert len(list(export.iter_books(Book.objects.all(), chunk_size=2))) == 3
+
+
+class TestRender:
+    def test_ndjson(self, books):
+        lines = list(export.render_ndjson(export.iter_books(Book.objects.all())))
+        assert [json.loads(line)['name'] for line in lines] == ['Book 0', 'Book 1', 'Book 2']
+
+    def test_csv(self, books):
+        rows = list(csv.reader(io.StringIO(''.join(export.render_csv(export.iter_books(Book.objects.all()))))))
+        assert rows[0] == list(export.FIELDS) + ['authors']
+        assert rows[2][1:-1] == ['Book 1', '123-456789012', 'india', '26', 'pub1', '2019-05-26']
+        assert sorted(rows[2][-1].split(';')) == ['author0', 'author1']
+
+
+class TestExportCommand:
+    def test_stdout_with_filter(self, books):
+        Book.objects.filter(pk=books[0].pk).update(country='england')
+        out = io.StringIO()
+        call_command('export_books', '--country', 'india', stdout=out)
+        assert [json.loads(line)['name'] for line in out.getvalue().splitlines()] == ['Book 1', 'Book 2']
+
+    def test_csv_file(self, books, tmp_path):
+        path = tmp_path / 'books.csv'
+        call_command('export_books', '--type', 'csv', '--output', str(path))
+        assert len(path.read_text().splitlines()) == 4
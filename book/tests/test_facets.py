@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework.test import APIClient
+
+from book import facets, views
+from book.bulk import bulk_upsert_books
+from book.filters import BookFilter
+from book.models import Book, BookFacetCount
+
+pytestmark = pytest.mark.django_db
+
+FILTERS = [{}, {'country': 'US'}, {'publisher': 'Bantam'}, {'release_date': '1996'}, {'release_date': '2000'},
+           {'country': 'FR'}]
+
+
+def book_data(**kwargs):
+    return dict({'name': 'b', 'isbn': '1', 'country': 'US', 'authors': ['a'], 'number_of_pages': 1,
+                 'publisher': 'Bantam', 'release_date': '1996-08-01'}, **kwargs)
+
+
+def assert_rollup_matches_books():
+    for filters in FILTERS:
+        expected = facets.aggregate(BookFilter(filters, queryset=Book.objects.all()).qs, 20)
+        assert facets.from_rollup(*facets.rollup_filter(filters), size=20) == expected
+    assert facets.find_inconsistent() == []
+
+
+def test_rollup_filter():
+    assert facets.rollup_filter({}) == ('', '')
+    assert facets.rollup_filter({'country': 'US'}) == ('country', 'US')
+    assert facets.rollup_filter({'release_date': '1996'}) == ('year', '1996')
+    assert facets.rollup_filter({'release_date': 'x'}) is None
+    assert facets.rollup_filter({'name': 'b'}) is None
+    assert facets.rollup_filter({'country': 'US', 'release_date': '1996'}) is None
+
+
+class TestMaintenance:
+    def test_api_writes(self):
+        client = APIClient()
+        ids = [client.post('/api/v1/books/', book_data(**kwargs), format='json').json()['data'][0]['book']['id']
+               for kwargs in [{}, {'country': 'FR'}, {'publisher': 'Voyager', 'release_date': '2000-01-01'}]]
+        assert_rollup_matches_books()
+        client.patch('/api/v1/books/{}/'.format(ids[0]), {'country': 'FR', 'release_date': '2000-02-01'},
+                     format='json')
+        client.patch('/api/v1/books/{}/'.format(ids[1]), {'name': 'renamed'}, format='json')
+        assert_rollup_matches_books()
+        client.delete('/api/v1/books/{}/'.format(ids[2]))
+        assert_rollup_matches_books()
+
+    def test_update_from_a_stale_read(self):
+        client = APIClient()
+        book_id = client.post('/api/v1/books/', book_data(), format='json').json()['data'][0]['book']['id']
+        # What a concurrent update read before this one committed.
+        stale = Book.objects.get(pk=book_id)
+        client.patch('/api/v1/books/{}/'.format(book_id), {'country': 'FR'}, format='json')
+        with patch.object(views.BookViewSet, 'get_object', return_value=stale):
+            client.patch('/api/v1/books/{}/'.format(book_id), {'publisher': 'Voyager'}, format='json')
+        assert Book.objects.values_list('country', 'publisher').get() == ('FR', 'Voyager')
+        assert_rollup_matches_books()
+
+    def test_bulk_upsert(self):
+        bulk_upsert_books([book_data(), book_data(isbn='2')])
+        bulk_upsert_books([book_data(country='FR'), book_data(isbn='3', publisher='Voyager'),
+                           book_data(isbn='3', release_date='2000-01-01')], upsert_on_isbn=True)
+        assert_rollup_matches_books()
+
+    def test_drift_is_found_and_rebuilt(self):
+        bulk_upsert_books([book_data(), book_data(isbn='2', country='FR')])
+        Book.objects.filter(isbn='2').update(country='US')
+        assert ('', '', 'country', 'FR') in facets.find_inconsistent()
+        with pytest.raises(CommandError, match='facet counts are out of date'):
+            call_command('rebuild_book_facets', '--check')
+        call_command('rebuild_book_facets')
+        call_command('rebuild_book_facets', '--check')
+        assert not BookFacetCount.objects.filter(value='FR').exists()
+
+
+class TestFacetsEndpoint:
+    @pytest.fixture(autouse=True)
+    def books(self):
+        bulk_upsert_books([book_data(), book_data(isbn='2', country='FR'),
+                           book_data(isbn='3', publisher='Voyager', release_date='2000-01-01', authors=['z'])])
+
+    @pytest.mark.parametrize('params', [{}, {'country': 'US'}, {'release_date': '2000'}, {'author': 'z'},
+                                        {'country': 'US', 'publisher': 'Bantam'}])
+    def test_one_query(self, params, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            assert APIClient().get('/api/v1/books/facets/', params).status_code == 200
+
+    def test_unfiltered(self):
+        assert APIClient().get('/api/v1/books/facets/').json()['data'] == {
+            'count': 3,
+            'country': [{'value': 'US', 'count': 2}, {'value': 'FR', 'count': 1}],
+            'publisher': [{'value': 'Bantam', 'count': 2}, {'value': 'Voyager', 'count': 1}],
+            'year': [{'value': 1996, 'count': 2}, {'value': 2000, 'count': 1}],
+        }
+
+    def test_filtered(self, settings):
+        settings.BOOKS_FACET_SIZE = 1
+        client = APIClient()
+        assert client.get('/api/v1/books/facets/', {'country': 'US'}).json()['data'] == {
+            'count': 2, 'country': [{'value': 'US', 'count': 2}], 'publisher': [{'value': 'Bantam', 'count': 1}],
+            'year': [{'value': 1996, 'count': 1}]}
+        assert client.get('/api/v1/books/facets/', {'author': 'z', 'country': 'US'}).json()['data'] == {
+            'count': 1, 'country': [{'value': 'US', 'count': 1}], 'publisher': [{'value': 'Voyager', 'count': 1}],
+            'year': [{'value': 2000, 'count': 1}]}
+        assert client.get('/api/v1/books/facets/', {'country': 'DE'}).json()['data'] == {
+            'count': 0, 'country': [], 'publisher': [], 'year': []}
+
+    def test_invalid_year(self):
+        assert APIClient().get('/api/v1/books/facets/', {'release_date': 'x'}).status_code == 400
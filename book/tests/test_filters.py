@@ -0,0 +1,36 @@
+import pytest
+from mixer.backend.django import mixer
+
+from book.filters import BookFilter
+from book.models import Book
+
+pytestmark = pytest.mark.django_db
+
+
+class TestBookFilter:
+    def filter(self, params):
+        return BookFilter(params, queryset=Book.objects.order_by('pk')).qs
+
+    def test_release_year_is_a_date_range(self):
+        for release_date in ['2018-12-31', '2019-01-01', '2019-12-31', '2020-01-01']:
+            mixer.blend('book.Book', release_date=release_date)
+        queryset = self.filter({'release_date': 2019})
+        assert [str(book.release_date) for book in queryset] == ['2019-01-01', '2019-12-31']
+        sql = str(queryset.query)
+        assert 'release_date" >= 2019-01-01' in sql
+        assert 'release_date" < 2020-01-01' in sql
+
+    def test_release_year_out_of_range(self):
+        mixer.blend('book.Book', release_date='2019-01-01')
+        assert not self.filter({'release_date': 99999}).exists()
+
+    def test_combined_filters(self):
+        mixer.blend('book.Book', country='india', publisher='pub1', release_date='2019-01-01')
+        mixer.blend('book.Book', country='india', publisher='pub2', release_date='2019-01-01')
+        assert self.filter({'country': 'india', 'publisher': 'pub2', 'release_date': 2019}).count() == 1
+
+    def test_isbn_in_any_form(self):
+        book = mixer.blend('book.Book', isbn='0-553-10354-7')
+        mixer.blend('book.Book', isbn='0-8044-2957-X')
+        for isbn in ['0553103547', '978-0-553-10354-0']:
+            assert list(self.filter({'isbn': isbn})) == [book]
@@ -0,0 +1,37 @@
+import pytest
+from mixer.backend.django import mixer
+
+from book.bulk import bulk_upsert_books
+from book.isbn import canonical_isbn
+from book.models import Book
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('978-0-553-10354-0', '9780553103540'),
+    ('9780553103540', '9780553103540'),
+    ('0-553-10354-7', '9780553103540'),
+    (' 0 8044 2957 x ', '9780804429573'),
+    ('123-456789012', '123456789012'),
+    ('bench-1', 'BENCH1'),
+])
+def test_canonical_isbn(value, expected):
+    assert canonical_isbn(value) == expected
+
+
+class TestMaintenance:
+    def test_save(self):
+        book = mixer.blend('book.Book', isbn='0-553-10354-7')
+        assert Book.objects.values_list('isbn13', flat=True).get(pk=book.pk) == '9780553103540'
+        book.isbn = '0-8044-2957-X'
+        book.save(update_fields=['isbn'])
+        assert Book.objects.values_list('isbn13', flat=True).get(pk=book.pk) == '9780804429573'
+
+    def test_bulk_upsert(self):
+        item = {'name': 'b', 'isbn': '0-553-10354-7', 'country': 'c', 'number_of_pages': 1, 'publisher': 'p',
+                'release_date': '2019-05-26', 'authors': ['a']}
+        bulk_upsert_books([item])
+        assert Book.objects.values_list('isbn13', flat=True).get() == '9780553103540'
+        bulk_upsert_books([dict(item, isbn='9780553103540')], upsert_on_isbn=True)
+        assert Book.objects.values_list('isbn', 'isbn13').get() == ('9780553103540', '9780553103540')
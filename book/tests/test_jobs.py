@@ -0,0 +1,182 @@
+import copy
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from book import jobs, upstream
+from book.models import Book, ImportJob
+from book.tests.dummy_data import dump
+from book.tests.upstream_server import UpstreamServer
+
+pytestmark = pytest.mark.django_db
+
+
+def make_item(i, **kwargs):
+    item = {'name': 'Book {}'.format(i), 'isbn': '978-{:04d}'.format(i), 'country': 'India',
+            'number_of_pages': 100, 'publisher': 'pub', 'release_date': '2019-05-26', 'authors': ['author']}
+    item.update(kwargs)
+    return item
+
+
+@pytest.fixture
+def small_chunks(settings):
+    settings.BOOK_JOBS = dict(settings.BOOK_JOBS, CHUNK_SIZE=2)
+
+
+@pytest.fixture
+def server(settings):
+    books = []
+    for i in range(3):
+        book = copy.deepcopy(dump[0])
+        book.update(url='https://www.anapioficeandfire.com/api/books/{}'.format(i), isbn='978-{:04d}'.format(i))
+        books.append(book)
+    with UpstreamServer(books=books) as server:
+        settings.EXTERNAL_BOOKS_UPSTREAM = dict(settings.EXTERNAL_BOOKS_UPSTREAM, BASE_URL=server.url, RETRIES=0)
+        upstream.reset_client()
+        yield server
+    upstream.reset_client()
+
+
+class TestClaim:
+    def test_oldest_first(self):
+        first, second = jobs.submit_books([]), jobs.submit_books([])
+        claimed = jobs.claim('worker-1')
+        assert claimed.pk == first.pk
+        assert claimed.status == ImportJob.RUNNING
+        assert claimed.lease_owner == 'worker-1'
+        assert claimed.attempts == 1
+        assert claimed.started_at is not None
+        assert jobs.claim('worker-2').pk == second.pk
+        assert jobs.claim('worker-3') is None
+
+    def test_expired_lease_is_reclaimed(self):
+        job = jobs.submit_books([])
+        jobs.claim('worker-1')
+        assert jobs.claim('worker-2') is None
+        ImportJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        claimed = jobs.claim('worker-2')
+        assert claimed.lease_owner == 'worker-2'
+        assert claimed.attempts == 2
+
+    def test_out_of_attempts_fails(self, settings):
+        settings.BOOK_JOBS = dict(settings.BOOK_JOBS, MAX_ATTEMPTS=1)
+        job = jobs.submit_books([])
+        jobs.claim('worker-1')
+        ImportJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        assert jobs.claim('worker-2') is None
+        job.refresh_from_db()
+        assert job.status == ImportJob.FAILED
+        assert job.error == "Worker lease expired."
+
+
+class TestRunJob:
+    def test_imports_in_chunks_with_progress(self, small_chunks):
+        job = jobs.submit_books([make_item(0), make_item(1), make_item(2, release_date='bad'), make_item(3)])
+        jobs.run_job(jobs.claim('worker'), 'worker')
+        job.refresh_from_db()
+        assert (job.status, job.total, job.processed) == (ImportJob.SUCCEEDED, 4, 4)
+        assert (job.created, job.updated, job.failed) == (3, 0, 1)
+        assert [error['index'] for error in json.loads(job.errors)] == [2]
+        assert job.lease_owner == '' and job.finished_at is not None
+        assert Book.objects.count() == 3
+
+    def test_resumes_after_processed_items(self, small_chunks):
+        job = jobs.submit_books([make_item(i) for i in range(5)])
+        ImportJob.objects.filter(pk=job.pk).update(processed=2, created=2)
+        jobs.run_job(jobs.claim('worker'), 'worker')
+        job.refresh_from_db()
+        assert sorted(Book.objects.values_list('name', flat=True)) == ['Book 2', 'Book 3', 'Book 4']
+        assert (job.processed, job.created) == (5, 5)
+
+    def test_lost_lease_rolls_back_chunk(self):
+        job = jobs.submit_books([make_item(0)])
+        claimed = jobs.claim('worker-1')
+        ImportJob.objects.filter(pk=job.pk).update(lease_owner='worker-2')
+        with pytest.raises(jobs.LeaseLost):
+            jobs.run_job(claimed, 'worker-1')
+        assert not Book.objects.exists()
+
+    def test_external_query(self, server):
+        job = jobs.submit_external('A Game of Thrones')
+        jobs.run_job(jobs.claim('worker'), 'worker')
+        job.refresh_from_db()
+        assert (job.status, job.created) == (ImportJob.SUCCEEDED, 3)
+        book = Book.objects.get(isbn='978-0000')
+        assert (book.name, book.number_of_pages, str(book.release_date)) == ('A Game of Thrones', 694, '1996-08-01')
+        assert [author.name for author in book.authors.all()] == ['George R. R. Martin']
+
+        again = jobs.submit_external('A Game of Thrones')
+        jobs.run_job(jobs.claim('worker'), 'worker')
+        again.refresh_from_db()
+        assert (again.created, again.updated) == (0, 3)
+
+
+class TestWorker:
+    def test_runs_until_queue_is_empty(self):
+        for i in range(3):
+            jobs.submit_books([make_item(i)])
+        assert jobs.Worker(once=True).run() == 3
+        assert set(ImportJob.objects.values_list('status', flat=True)) == {ImportJob.SUCCEEDED}
+
+    def test_failed_attempts_are_retried_then_failed(self, server, settings):
+        settings.BOOK_JOBS = dict(settings.BOOK_JOBS, MAX_ATTEMPTS=2)
+        server.statuses = [500, 500]
+        job = jobs.submit_external('A Game of Thrones')
+        assert jobs.Worker(once=True).run() == 2
+        job.refresh_from_db()
+        assert (job.status, job.attempts) == (ImportJob.FAILED, 2)
+        assert '500' in job.error
+
+    def test_command(self):
+        jobs.submit_books([make_item(0)])
+        out = io.StringIO()
+        call_command('run_book_worker', '--once', stdout=out)
+        assert 'Ran 1 import jobs.' in out.getvalue()
+
+
+class TestImportJobViewSet:
+    def test_submit_file_and_poll(self):
+        client = APIClient()
+        upload = SimpleUploadedFile('books.json', json.dumps([make_item(0), make_item(1)]).encode('utf-8'))
+        resp = client.post('/api/v1/imports/?upsert=isbn', {'file': upload}, format='multipart')
+        assert resp.status_code == 202
+        assert resp.data['status'] == 'accepted'
+        assert resp.data['data']['status'] == ImportJob.QUEUED
+        assert resp.data['data']['total'] == 2
+        assert ImportJob.objects.get().upsert_on_isbn
+
+        jobs.Worker(once=True).run()
+        resp = client.get(resp['Location'])
+        assert resp.status_code == 200
+        assert resp.data['data']['status'] == ImportJob.SUCCEEDED
+        assert resp.data['data']['created'] == 2
+        assert resp.data['data']['errors'] == []
+
+    def test_submit_ndjson(self):
+        body = '\n'.join(json.dumps(make_item(i)) for i in range(3)).encode('utf-8')
+        resp = APIClient().post('/api/v1/imports/', {'file': SimpleUploadedFile('books.ndjson', body)},
+                                format='multipart')
+        assert resp.data['data']['total'] == 3
+
+    def test_submit_external_query(self):
+        resp = APIClient().post('/api/v1/imports/', {'name': ' A Game  of Thrones '}, format='json')
+        assert resp.status_code == 202
+        assert resp.data['data']['kind'] == ImportJob.EXTERNAL
+        assert resp.data['data']['query'] == 'A Game of Thrones'
+
+    @pytest.mark.parametrize('data', [{}, {'file': SimpleUploadedFile('books.json', b'{"not": "a list"}')},
+                                      {'file': SimpleUploadedFile('books.json', b'[{')}])
+    def test_bad_request(self, data):
+        resp = APIClient().post('/api/v1/imports/', data, format='multipart')
+        assert resp.status_code == 400
+        assert resp.data['status'] == 'bad request'
+        assert not ImportJob.objects.exists()
+
+    def test_poll_unknown_job(self):
+        assert APIClient().get('/api/v1/imports/1/').status_code == 404
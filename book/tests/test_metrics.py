@@ -0,0 +1,123 @@
+import json
+import threading
+
+import pytest
+from mixer.backend.django import mixer
+from requests.exceptions import ConnectionError
+from rest_framework.test import APIClient
+
+from book import metrics
+from book.cache import ExternalBookCache
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def registry(settings):
+    settings.METRICS_DIR = None
+    metrics.registry.reset()
+    yield metrics.registry
+    metrics.registry.reset()
+
+
+def sample(name, **labels):
+    """The value of one exposed series of ``registry.render()``."""
+    series = name + ('{' + ','.join('{}="{}"'.format(*item) for item in labels.items()) + '}' if labels else '')
+    for line in metrics.registry.render().splitlines():
+        if line.startswith(series + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+class TestRegistry:
+    def test_histogram_buckets_are_cumulative(self, registry):
+        histogram = registry.histogram('test_seconds', "Test.", ('stage',), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value, stage='a')
+        assert sample('test_seconds_bucket', stage='a', le='0.1') == 1
+        assert sample('test_seconds_bucket', stage='a', le='1') == 3
+        assert sample('test_seconds_bucket', stage='a', le='+Inf') == 4
+        assert sample('test_seconds_count', stage='a') == 4
+        assert sample('test_seconds_sum', stage='a') == pytest.approx(6.05)
+        del registry.metrics['test_seconds']
+
+    def test_label_values_are_escaped(self):
+        assert metrics.format_sample('m', [('route', 'a"b\\c\nd')], 1) == 'm{route="a\\"b\\\\c\\nd"} 1'
+
+    def test_concurrent_increments_are_not_lost(self):
+        def work():
+            for _ in range(1000):
+                metrics.external_cache_total.inc(result='hit')
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sample('book_external_cache_total', result='hit') == 8000
+
+    def test_snapshots_of_all_processes_are_summed(self, settings, tmp_path):
+        settings.METRICS_DIR = str(tmp_path)
+        metrics.external_cache_total.inc(result='miss')
+        metrics.request_duration.observe(0.002, route='book-list', method='GET')
+        # What another worker process last flushed.
+        (tmp_path / '1.json').write_text(json.dumps({
+            'book_external_cache_total': [[['miss'], 2]],
+            'book_http_request_duration_seconds': [[['book-list', 'GET'], [1] + [0] * 13 + [0.0005, 1]]],
+        }))
+        assert sample('book_external_cache_total', result='miss') == 3
+        assert sample('book_http_request_duration_seconds_count', route='book-list', method='GET') == 2
+        assert sample('book_http_request_duration_seconds_bucket', route='book-list', method='GET', le='0.001') == 1
+        assert sample('book_http_request_duration_seconds_bucket', route='book-list', method='GET', le='0.0025') == 2
+
+    def test_failed_flush_is_logged(self, settings, tmp_path, caplog):
+        settings.METRICS_DIR = str(tmp_path / 'missing')
+        metrics.registry.flush(force=True)
+        assert 'Could not write the metrics snapshot' in caplog.text
+        response = APIClient().get('/api/v1/books/')
+        assert response.status_code == 200
+
+
+class TestMiddleware:
+    def test_requests_are_recorded_by_route(self):
+        mixer.blend('book.Book', release_date='2019-05-26', authors=[])
+        client = APIClient()
+        client.get('/api/v1/books/')
+        client.get('/api/v1/books/0/')
+        client.get('/nowhere')
+        assert sample('book_http_requests_total', route='book-list', method='GET', status='200') == 1
+        assert sample('book_http_requests_total', route='book-detail', method='GET', status='404') == 1
+        assert sample('book_http_requests_total', route='unmatched', method='GET', status='404') == 1
+        assert sample('book_http_request_duration_seconds_count', route='book-list', method='GET') == 1
+        assert sample('book_db_queries_total', route='book-list', method='GET') == 3
+        assert sample('book_db_query_seconds_total', route='book-list', method='GET') > 0
+        assert sample('book_serialize_duration_seconds_count', stage='rows') == 1
+        assert sample('book_serialize_duration_seconds_count', stage='render') == 2
+
+    def test_metrics_endpoint(self):
+        APIClient().get('/api/v1/books/')
+        response = APIClient().get('/metrics')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = response.content.decode()
+        assert '# TYPE book_http_request_duration_seconds histogram' in body
+        assert 'book_http_requests_total{route="book-list",method="GET",status="200"} 1' in body
+
+
+class TestExternalCache:
+    def test_hits_misses_and_stale_are_counted(self, settings):
+        settings.EXTERNAL_BOOKS_CACHE_TTL = 0
+        settings.EXTERNAL_BOOKS_CACHE_STALE_TTL = 600
+        cache = ExternalBookCache()
+        cache.get_or_fetch('a', lambda: [1])
+
+        def fail():
+            raise ConnectionError()
+
+        assert cache.get_or_fetch('a', fail) == [1]
+        settings.EXTERNAL_BOOKS_CACHE_TTL = 60
+        cache.get_or_fetch('b', lambda: [2])
+        cache.get_or_fetch('b', lambda: [3])
+        assert sample('book_external_cache_total', result='miss') == 3
+        assert sample('book_external_cache_total', result='stale') == 1
+        assert sample('book_external_cache_total', result='hit') == 1
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from book import mirror, upstream
+from book.models import ExternalBookMirror, ExternalSyncPage
+from book.tests.upstream_server import UpstreamServer
+
+pytestmark = pytest.mark.django_db
+
+
+def make_books(count):
+    return [{'url': 'https://www.anapioficeandfire.com/api/books/{}'.format(i), 'name': 'Book {}'.format(i),
+             'isbn': '978-00000000{:02d}'.format(i), 'authors': ['George R. R. Martin'], 'numberOfPages': 100 + i,
+             'publisher': 'Bantam Books', 'country': 'United States', 'mediaType': 'Hardcover',
+             'released': '1996-08-01T00:00:00', 'characters': [], 'povCharacters': []}
+            for i in range(count)]
+
+
+@pytest.fixture
+def server(settings):
+    with UpstreamServer(books=make_books(120)) as server:
+        settings.EXTERNAL_BOOKS_UPSTREAM = dict(settings.EXTERNAL_BOOKS_UPSTREAM, BASE_URL=server.url)
+        upstream.reset_client()
+        yield server
+    upstream.reset_client()
+
+
+class TestSyncCatalogue:
+    def test_full_sync(self, server):
+        stats = mirror.sync_catalogue(concurrency=2)
+        assert stats == {'pages_synced': 3, 'pages_unchanged': 0, 'books': 120}
+        assert ExternalBookMirror.objects.count() == 120
+        assert ExternalSyncPage.objects.count() == 3
+        assert mirror.lookup('Book 7') == [{'name': 'Book 7', 'isbn': '978-0000000007',
+                                            'authors': ['George R. R. Martin'], 'numberOfPages': 107,
+                                            'publisher': 'Bantam Books', 'country': 'United States',
+                                            'release_date': '1996-08-01'}]
+
+    def test_unchanged_pages_are_skipped(self, server):
+        mirror.sync_catalogue()
+        server.books[55]['numberOfPages'] = 1
+        stats = mirror.sync_catalogue()
+        assert stats == {'pages_synced': 1, 'pages_unchanged': 2, 'books': 50}
+        assert ExternalBookMirror.objects.count() == 120
+        assert json.loads(ExternalBookMirror.objects.get(name='Book 55').payload)['numberOfPages'] == 1
+
+    def test_full_option_refetches_everything(self, server):
+        mirror.sync_catalogue()
+        assert mirror.sync_catalogue(full=True)['pages_synced'] == 3
+
+    def test_command(self, server, capsys):
+        call_command('sync_external_books', '--concurrency', '3')
+        assert 'Synced 3 pages (120 books), 0 pages unchanged.' in capsys.readouterr().out
+
+
+def test_lookup_miss():
+    assert mirror.lookup('Unknown') == []
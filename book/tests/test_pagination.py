@@ -0,0 +1,61 @@
+import datetime
+
+import pytest
+from mixer.backend.django import mixer
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from book.models import Book
+from book.pagination import AuthorKeysetPagination, KeysetPagination
+
+pytestmark = pytest.mark.django_db
+
+
+def paginate(params):
+    paginator = KeysetPagination()
+    request = Request(APIRequestFactory().get('/api/v1/books/', params))
+    return paginator, paginator.paginate_queryset(Book.objects.all(), request)
+
+
+def test_pages_follow_release_date_then_id():
+    for release_date in ['2019-01-01', '2018-01-01', '2019-01-01', '2018-01-01', '2020-01-01']:
+        mixer.blend('book.Book', release_date=release_date)
+    seen = []
+    paginator, page = paginate({'page_size': 2})
+    while True:
+        seen.extend((book.release_date.year, book.pk) for book in page)
+        if paginator.next_position is None:
+            break
+        paginator, page = paginate({'page_size': 2, 'cursor': paginator.encode_cursor(paginator.next_position)})
+    assert seen == [(2018, 2), (2018, 4), (2019, 1), (2019, 3), (2020, 5)]
+
+
+def test_cursor_round_trip():
+    paginator = KeysetPagination()
+    position = [datetime.date(2019, 5, 26).isoformat(), 7]
+    request = Request(APIRequestFactory().get('/', {'cursor': paginator.encode_cursor(position)}))
+    assert paginator.decode_cursor(request) == [datetime.date(2019, 5, 26), 7]
+
+
+@pytest.mark.parametrize('position', [['notadate', 1], ['2019-01-01', 'abc'], [None, 1], ['2019-01-01', None],
+                                      ['2019-01-01', 1.5], ['2019-01-01', 10 ** 30]])
+def test_cursor_with_bad_values(position):
+    paginator = KeysetPagination()
+    request = Request(APIRequestFactory().get('/', {'cursor': paginator.encode_cursor(position)}))
+    with pytest.raises(NotFound):
+        paginator.decode_cursor(request)
+
+
+@pytest.mark.parametrize('position', [[None], [1], [['a']]])
+def test_author_cursor_with_bad_values(position):
+    paginator = AuthorKeysetPagination()
+    request = Request(APIRequestFactory().get('/', {'cursor': paginator.encode_cursor(position)}))
+    with pytest.raises(NotFound):
+        paginator.decode_cursor(request)
+
+
+def test_page_size_is_capped(settings):
+    settings.BOOKS_MAX_PAGE_SIZE = 3
+    request = Request(APIRequestFactory().get('/', {'page_size': 50}))
+    assert KeysetPagination().get_page_size(request) == 3
@@ -0,0 +1,60 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+
+from book.models import Book
+from book.query_budget import QueryBudgetExceeded, query_budget
+
+pytestmark = pytest.mark.django_db
+
+
+def test_query_budget_within_limit():
+    with query_budget(1) as counter:
+        list(Book.objects.all())
+    assert counter.count == 1
+
+
+def test_query_budget_exceeded():
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(1):
+            list(Book.objects.all())
+            list(Book.objects.all())
+
+
+class TestQueryBudgetMiddleware:
+    @pytest.fixture
+    def tight_budget(self, settings):
+        settings.QUERY_BUDGET = dict(settings.QUERY_BUDGET, ROUTES={'book-list': 0})
+
+    def test_raises_over_budget(self, tight_budget):
+        with pytest.raises(QueryBudgetExceeded):
+            APIClient().get('/api/v1/books/')
+
+    def test_logs_over_budget(self, tight_budget, settings, caplog):
+        settings.QUERY_BUDGET = dict(settings.QUERY_BUDGET, RAISE=False)
+        with caplog.at_level(logging.WARNING, logger='book.query_budget'):
+            assert APIClient().get('/api/v1/books/').status_code == 200
+        assert 'GET /api/v1/books/ (book-list) executed 2 queries, budget is 0.' in caplog.text
+
+    def test_method_specific_budget(self, settings):
+        settings.QUERY_BUDGET = dict(settings.QUERY_BUDGET, ROUTES={'book-list': 0, 'GET book-list': 2})
+        assert APIClient().get('/api/v1/books/').status_code == 200
+
+    def test_sync_views_checked_under_asgi(self, tight_budget):
+        with pytest.raises(QueryBudgetExceeded):
+            async_to_sync(AsyncClient().get)('/api/v1/books/')
+
+    @pytest.mark.parametrize('denormalized', [False, True])
+    def test_replacing_authors_within_budget(self, settings, denormalized):
+        settings.BOOKS_DENORMALIZED_AUTHORS = denormalized
+        client = APIClient()
+        book = {'name': 'b', 'isbn': '1', 'country': 'c', 'number_of_pages': 1, 'publisher': 'p',
+                'release_date': '2019-05-26', 'authors': ['a', 'b']}
+        assert client.post('/api/v1/books/', book, format='json').status_code == 201
+        assert client.post('/api/v1/books/', dict(book, isbn='2', authors=['c', 'd']), format='json').status_code == 201
+        url = '/api/v1/books/{}/'.format(Book.objects.get(isbn='1').pk)
+        resp = client.put(url, dict(book, authors=['c', 'd'], release_date='2020-01-01'), format='json')
+        assert resp.status_code == 200
@@ -0,0 +1,45 @@
+import datetime
+import decimal
+
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from book import renderers
+from book.renderers import FastJSONRenderer
+
+DATA = {
+    'status_code': 200,
+    'text': "naïve     </script>",
+    'when': datetime.datetime(2019, 5, 26, 10, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+    'day': datetime.date(2019, 5, 26),
+    'price': decimal.Decimal('9.99'),
+    'message': gettext_lazy("Not found."),
+    'nested': [{'a': None, 'b': True}, []],
+}
+
+
+class TestFastJSONRenderer:
+    def test_same_bytes_as_json_renderer(self):
+        assert FastJSONRenderer().render(DATA) == JSONRenderer().render(DATA)
+
+    def test_uses_orjson_when_installed(self, monkeypatch):
+        pytest.importorskip('orjson')
+        monkeypatch.setattr(renderers.orjson, 'dumps', lambda *args, **kwargs: b'"orjson"')
+        assert FastJSONRenderer().render(DATA) == b'"orjson"'
+
+    def test_falls_back_without_orjson(self, monkeypatch):
+        monkeypatch.setattr(renderers, 'orjson', None)
+        assert FastJSONRenderer().render(DATA) == JSONRenderer().render(DATA)
+
+    def test_falls_back_for_indent(self):
+        context = {'indent': 2}
+        assert FastJSONRenderer().render(DATA, renderer_context=context) == \
+            JSONRenderer().render(DATA, renderer_context=context)
+
+    def test_falls_back_on_unsupported_types(self):
+        data = {1: 'integer key', 'big': 2 ** 70}
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_none(self):
+        assert FastJSONRenderer().render(None) == b''
@@ -0,0 +1,51 @@
+import pytest
+from django.db import transaction
+
+from book.models import Book
+from book.routers import ReplicaRouter, replica_reads
+
+
+@pytest.fixture
+def router(settings):
+    settings.DATABASE_REPLICAS = ['replica_0']
+    return ReplicaRouter()
+
+
+def test_reads_use_the_primary_by_default(router):
+    assert router.db_for_read(Book) == 'default'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replica_reads_go_to_a_replica(router):
+    with replica_reads():
+        assert router.db_for_read(Book) == 'replica_0'
+        assert router.db_for_write(Book) == 'default'
+    assert router.db_for_read(Book) == 'default'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_of_a_block_go_to_one_replica(router, settings):
+    settings.DATABASE_REPLICAS = ['replica_0', 'replica_1']
+    for _ in range(10):
+        with replica_reads():
+            replica = router.db_for_read(Book)
+            with replica_reads():
+                assert router.db_for_read(Book) == replica
+            assert router.db_for_read(Book) == replica
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_in_a_transaction_stay_on_the_primary(router):
+    with replica_reads(), transaction.atomic():
+        assert router.db_for_read(Book) == 'default'
+
+
+def test_without_replicas_reads_use_the_primary(settings):
+    settings.DATABASE_REPLICAS = []
+    with replica_reads():
+        assert ReplicaRouter().db_for_read(Book) == 'default'
+
+
+def test_replicas_are_not_migrated(router):
+    assert router.allow_migrate('replica_0', 'book') is False
+    assert router.allow_migrate('default', 'book') is True
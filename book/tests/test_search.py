@@ -0,0 +1,67 @@
+import pytest
+from mixer.backend.django import mixer
+
+from book import search
+from book.bulk import bulk_upsert_books
+from book.models import Book
+
+pytestmark = pytest.mark.django_db
+
+
+def make_book(name, authors=(), **kwargs):
+    kwargs.setdefault('publisher', 'Bantam Books')
+    kwargs.setdefault('country', 'United States')
+    book = mixer.blend('book.Book', name=name, **kwargs)
+    book.authors.set([mixer.blend('book.Author', name=author) for author in authors])
+    return book
+
+
+class TestSearch:
+    def test_prefix_match_on_every_column(self):
+        book = make_book('A Game of Thrones', ['George R. R. Martin'])
+        assert search.search('thro', 10) == [book.pk]
+        assert search.search('georg', 10) == [book.pk]
+        assert search.search('bantam', 10) == [book.pk]
+        assert search.search('united stat', 10) == [book.pk]
+        assert search.search('game tolkien', 10) == []
+
+    def test_name_matches_rank_first(self):
+        by_publisher = make_book('Other', publisher='Dragon Press')
+        by_name = make_book('Dragon Tales')
+        assert search.search('dragon', 10) == [by_name.pk, by_publisher.pk]
+
+    def test_limit_and_empty_query(self):
+        for index in range(3):
+            make_book('Dune {}'.format(index))
+        assert len(search.search('dune', 2)) == 2
+        assert search.search(' !? ', 10) == []
+
+    def test_index_follows_updates_and_deletes(self):
+        book = make_book('A Game of Thrones', ['George R. R. Martin'])
+        book.name = 'A Clash of Kings'
+        book.save()
+        assert search.search('thrones', 10) == []
+        assert search.search('clash', 10) == [book.pk]
+        book.authors.clear()
+        assert search.search('martin', 10) == []
+        book.delete()
+        assert search.search('clash', 10) == []
+
+    def test_index_follows_reverse_author_changes(self):
+        book = make_book('A Game of Thrones', ['George R. R. Martin'])
+        author = book.authors.get()
+        author.book_set.clear()
+        assert search.search('martin', 10) == []
+        author.book_set.add(book)
+        assert search.search('martin', 10) == [book.pk]
+
+    def test_bulk_import_is_indexed(self):
+        bulk_upsert_books([{'name': 'A Storm of Swords', 'isbn': '978-0553106633', 'country': 'United States',
+                            'number_of_pages': 992, 'publisher': 'Bantam Books', 'release_date': '2000-10-31',
+                            'authors': ['George R. R. Martin']}])
+        assert search.search('storm martin', 10) == [Book.objects.get().pk]
+
+    def test_rebuild(self):
+        book = make_book('A Game of Thrones')
+        assert search.rebuild() == 1
+        assert search.search('game', 10) == [book.pk]
@@ -1,7 +1,11 @@
 import pytest
 from mixer.backend.django import mixer
 
-from book.serializers import AuthorSerializer, BookSerializer
+from rest_framework.renderers import JSONRenderer
+
+from book.models import Book
+from book.renderers import FastJSONRenderer
+from book.serializers import BOOK_FIELDS, AuthorSerializer, BookSerializer, serialize_book_rows
 
 pytestmark = pytest.mark.django_db
 
@@ -22,3 +26,32 @@ class TestBookSerializer:
         assert serializer.data == {'id': 1, 'name': 'Test', 'isbn': '123-456789012', 'country': 'india',
                                    'number_of_pages': 26, 'publisher': 'pub1', 'release_date': '2019-05-26',
                                    'authors': ['author']}
+
+
+class TestSerializeBookRows:
+    @pytest.fixture
+    def books(self):
+        authors = [mixer.blend('book.Author', name=name) for name in ("Zoë", "adam", "Émile", "Bob")]
+        mixer.blend('book.Book', name="Plain", isbn="123", release_date="2019-05-26", authors=authors[:1])
+        mixer.blend('book.Book', name="Ünïcode \u2028 \"quoted\" \\ line", isbn="978-0", country="España",
+                    number_of_pages=0, publisher="出版社", release_date="1999-01-01", authors=authors)
+        mixer.blend('book.Book', name="No authors", isbn="456", release_date="2020-12-31", authors=[])
+        return Book.objects.order_by('id')
+
+    def test_same_data_as_book_serializer(self, books):
+        rows = serialize_book_rows(list(books.values(*BOOK_FIELDS)))
+        assert rows == BookSerializer(books, many=True).data
+
+    @pytest.mark.parametrize('renderer', [JSONRenderer, FastJSONRenderer])
+    def test_byte_identical_json(self, books, renderer):
+        expected = JSONRenderer().render(BookSerializer(books, many=True).data)
+        assert renderer().render(serialize_book_rows(list(books.values(*BOOK_FIELDS)))) == expected
+
+    def test_authors_in_name_order(self, books):
+        rows = serialize_book_rows(list(books.filter(isbn="978-0").values(*BOOK_FIELDS)))
+        assert rows[0]['authors'] == sorted(["Zoë", "adam", "Émile", "Bob"])
+
+    def test_one_author_query(self, books, django_assert_num_queries):
+        rows = list(books.values(*BOOK_FIELDS))
+        with django_assert_num_queries(1):
+            serialize_book_rows(rows)
@@ -0,0 +1,189 @@
+import asyncio
+
+import pytest
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from book import upstream
+from book.tests.upstream_server import UpstreamServer
+from book.upstream import AsyncUpstreamClient, CircuitBreaker, CircuitOpenError, UpstreamClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def breaker(self, clock):
+        return CircuitBreaker(failure_rate=0.5, min_requests=4, window=10, reset_timeout=5, clock=clock)
+
+    def test_opens_when_failure_rate_reached(self, breaker):
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+
+    def test_old_outcomes_leave_window(self, breaker, clock):
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now = 11
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_trial(self, breaker, clock):
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 5
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 10
+        assert breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_abandoned_trial(self, breaker, clock):
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 5
+        assert breaker.allow_request()
+        breaker.record_abandoned()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+
+class TestUpstreamClient:
+    @pytest.fixture
+    def server(self):
+        with UpstreamServer() as server:
+            yield server
+
+    def make_client(self, server, **kwargs):
+        kwargs.setdefault('backoff_factor', 0)
+        return UpstreamClient(server.url, **kwargs)
+
+    def test_get_reuses_connection(self, server):
+        client = self.make_client(server)
+        for _ in range(5):
+            response = client.get('/api/books', params={'name': 'A Game of Thrones'})
+            assert response.status_code == 200
+            assert response.json()[0]['isbn'] == '978-0553103540'
+        assert server.requests == 5
+        assert server.connections == 1
+
+    def test_retries_server_errors(self, server):
+        server.statuses = [503, 502]
+        response = self.make_client(server, retries=2).get('/api/books')
+        assert response.status_code == 200
+        assert server.requests == 3
+
+    def test_read_timeout(self, server):
+        server.delay = 0.2
+        client = self.make_client(server, read_timeout=0.05, retries=0)
+        with pytest.raises(ReadTimeout):
+            client.get('/api/books')
+
+    def test_circuit_breaker_fails_fast(self, server):
+        server.statuses = [500] * 2
+        client = self.make_client(server, retries=0, breaker=CircuitBreaker(min_requests=2))
+        assert client.get('/api/books').status_code == 500
+        assert client.get('/api/books').status_code == 500
+        with pytest.raises(CircuitOpenError):
+            client.get('/api/books')
+        assert server.requests == 2
+
+
+class TestAsyncUpstreamClient:
+    @pytest.fixture
+    def server(self):
+        with UpstreamServer() as server:
+            yield server
+
+    @staticmethod
+    def run(client, calls):
+        async def main():
+            try:
+                return [await client.get(*call) for call in calls]
+            finally:
+                await client.close()
+        return asyncio.run(main())
+
+    def test_get_reuses_connection(self, server):
+        responses = self.run(AsyncUpstreamClient(server.url), [('/api/books', {'name': 'A Game of Thrones'})] * 5)
+        assert [response.json()[0]['isbn'] for response in responses] == ['978-0553103540'] * 5
+        assert server.connections == 1
+
+    def test_read_timeout(self, server):
+        server.delay = 0.2
+        with pytest.raises(ReadTimeout):
+            self.run(AsyncUpstreamClient(server.url, read_timeout=0.05), [('/api/books',)])
+
+    def test_connection_error(self, server):
+        url = server.url
+        server.shutdown()
+        server.server_close()
+        with pytest.raises(ConnectionError):
+            self.run(AsyncUpstreamClient(url, retries=0), [('/api/books',)])
+
+    def test_circuit_breaker_fails_fast(self, server):
+        server.statuses = [500] * 2
+        client = AsyncUpstreamClient(server.url, breaker=CircuitBreaker(min_requests=2))
+        with pytest.raises(CircuitOpenError):
+            self.run(client, [('/api/books',)] * 3)
+        assert server.requests == 2
+
+    def test_cancelled_trial_releases_the_breaker(self, server):
+        server.delay = 0.5
+        breaker = CircuitBreaker(reset_timeout=0)
+        breaker._open(0)
+        client = AsyncUpstreamClient(server.url, breaker=breaker)
+
+        async def main():
+            try:
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(client.get('/api/books'), 0.05)
+            finally:
+                await client.close()
+
+        asyncio.run(main())
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow_request()
+
+
+def test_get_client_is_shared_per_process(settings):
+    upstream.reset_client()
+    try:
+        settings.EXTERNAL_BOOKS_UPSTREAM = dict(settings.EXTERNAL_BOOKS_UPSTREAM, POOL_SIZE=3)
+        client = upstream.get_client()
+        assert upstream.get_client() is client
+        assert client.session.get_adapter('https://').poolmanager.connection_pool_kw['maxsize'] == 3
+    finally:
+        upstream.reset_client()
+
+
+def test_async_clients_closed_with_their_loop_and_share_the_breaker():
+    upstream.reset_client()
+    try:
+        async def main():
+            return upstream.get_async_client()
+
+        first, second = asyncio.run(main()), asyncio.run(main())
+        assert first is not second
+        assert first.client.is_closed and second.client.is_closed
+        assert first.breaker is second.breaker is upstream.get_client().breaker
+    finally:
+        upstream.reset_client()
@@ -1,24 +1,38 @@
-from unittest.mock import patch
+import copy
+import json
+import time
+from unittest.mock import AsyncMock, patch
+from urllib.parse import parse_qsl, urlparse
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from requests.exceptions import ReadTimeout, RequestException
 from rest_framework.test import APIRequestFactory, APIClient
 
-from book import views
+from book import admission, upstream, views
+from book.external import customized_json_response
+from book.models import Author, Book, ExternalBookMirror
+from book.pagination import KeysetPagination
 from book.tests.dummy_data import dump
+from book.tests.upstream_server import UpstreamServer
+from book.upstream import CircuitOpenError
 
 pytestmark = pytest.mark.django_db
 
 
 class TestExternalBookSearch:
     def test_cutomized_json_response(self):
-        views.ExternalBook.customized_json_response(dump)
-        assert len(dump[0]) == 7
-        assert 'release_date' in dump[0]
-        assert dump[0]['release_date'] == '1996-08-01'
+        books = copy.deepcopy(dump)
+        customized_json_response(books)
+        assert len(books[0]) == 7
+        assert 'release_date' in books[0]
+        assert books[0]['release_date'] == '1996-08-01'
 
-    @patch('book.views.requests.get')
+    @patch('book.upstream.requests.Session.get')
     def test_external_book_get(self, mock_get):
         mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = []
         factory = APIRequestFactory()
         req = factory.get('api/external-books')
         resp = views.ExternalBook.as_view()(req)
@@ -26,6 +40,159 @@ class TestExternalBookSearch:
         assert resp.data['status'] == 'success'
         assert mock_get.called
 
+    @patch('book.upstream.requests.Session.get')
+    def test_external_book_get_is_cached(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = []
+        factory = APIRequestFactory()
+        for _ in range(2):
+            resp = views.ExternalBook.as_view()(factory.get('api/external-books', {'name': 'A Game of Thrones'}))
+            assert resp.data['data'] == []
+        assert mock_get.call_count == 1
+
+    @patch('book.views.get_client')
+    def test_external_book_get_from_mirror(self, mock_client):
+        ExternalBookMirror.objects.create(url='https://www.anapioficeandfire.com/api/books/1',
+                                          name='A Game of Thrones', payload='{"name": "A Game of Thrones"}')
+        req = APIRequestFactory().get('api/external-books', {'name': 'A Game of Thrones'})
+        resp = views.ExternalBook.as_view()(req)
+        assert resp.data['data'] == [{'name': 'A Game of Thrones'}]
+        assert not mock_client.called
+
+    @pytest.mark.parametrize('error, status_code', [(CircuitOpenError(), 503), (ReadTimeout(), 504)])
+    @patch('book.views.get_client')
+    def test_external_book_get_upstream_unavailable(self, mock_client, error, status_code):
+        mock_client.return_value.get.side_effect = error
+        resp = views.ExternalBook.as_view()(APIRequestFactory().get('api/external-books'))
+        assert resp.status_code == status_code
+        assert resp.data['status_code'] == status_code
+
+    @patch('book.views.get_client')
+    def test_external_book_get_rate_limited(self, mock_client, settings):
+        mock_client.return_value.get.return_value.status_code = 200
+        mock_client.return_value.get.return_value.json.return_value = []
+        settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, RATE=0.5, BURST=1)
+        factory = APIRequestFactory()
+        assert views.ExternalBook.as_view()(factory.get('api/external-books', {'name': 'a'})).status_code == 200
+        resp = views.ExternalBook.as_view()(factory.get('api/external-books', {'name': 'b'}))
+        assert resp.status_code == 429
+        assert resp.data['status'] == 'too many requests'
+        assert resp['Retry-After'] == '2'
+        assert mock_client.return_value.get.call_count == 1
+
+    @patch('book.views.get_client')
+    def test_external_book_get_shed(self, mock_client, settings):
+        settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, MAX_IN_FLIGHT=1, MAX_QUEUE=0)
+        req = APIRequestFactory().get('api/external-books', {'name': 'a'})
+        with admission.upstream_slot():
+            resp = views.ExternalBook.as_view()(req)
+        assert resp.status_code == 503
+        assert resp.data['status'] == 'service unavailable'
+        assert resp['Retry-After'] == '1'
+        assert not mock_client.called
+
+
+class TestAsyncExternalBook:
+    NAMES = ['Book {}'.format(i) for i in range(6)]
+
+    @pytest.fixture
+    def server(self, settings):
+        books = []
+        for i, name in enumerate(self.NAMES):
+            book = copy.deepcopy(dump[0])
+            book.update(name=name, url='https://www.anapioficeandfire.com/api/books/{}'.format(i))
+            books.append(book)
+        with UpstreamServer(books=books) as server:
+            settings.EXTERNAL_BOOKS_UPSTREAM = dict(settings.EXTERNAL_BOOKS_UPSTREAM, BASE_URL=server.url, RETRIES=0)
+            settings.EXTERNAL_BOOKS_ASYNC = dict(settings.EXTERNAL_BOOKS_ASYNC, CONCURRENCY=2)
+            upstream.reset_client()
+            yield server
+        upstream.reset_client()
+
+    @staticmethod
+    def get(*names):
+        response = async_to_sync(AsyncClient().get)('/api/async/external-books', {'name': list(names)})
+        return response.status_code, response.json()
+
+    def test_names_fetched_concurrently_and_merged(self, server):
+        server.delay = 0.1
+        start = time.monotonic()
+        status_code, data = self.get(*self.NAMES)
+        assert time.monotonic() - start < 0.1 * len(self.NAMES)
+        assert status_code == 200
+        assert data['status'] == 'success'
+        assert [book['name'] for book in data['data']] == self.NAMES
+        assert 'released' not in data['data'][0]
+        assert 'errors' not in data
+        assert server.max_in_flight == 2
+
+    def test_cached(self, server):
+        self.get('Book 0', ' Book  0 ')
+        self.get('Book 0')
+        assert server.requests == 1
+
+    def test_from_mirror(self, server):
+        ExternalBookMirror.objects.create(url='https://www.anapioficeandfire.com/api/books/1',
+                                          name='Mirrored', payload='{"name": "Mirrored"}')
+        status_code, data = self.get('Mirrored', 'Book 1')
+        assert [book['name'] for book in data['data']] == ['Mirrored', 'Book 1']
+        assert server.requests == 1
+
+    def test_partial_failure(self, server, settings):
+        settings.EXTERNAL_BOOKS_ASYNC = dict(settings.EXTERNAL_BOOKS_ASYNC, CONCURRENCY=1)
+        server.statuses = [404]
+        status_code, data = self.get('Book 0', 'Book 1')
+        assert status_code == 200
+        assert [book['name'] for book in data['data']] == ['Book 1']
+        assert data['errors'] == [{'name': 'Book 0', 'status_code': 404, 'status': 'not found'}]
+
+    def test_deadline(self, server, settings):
+        settings.EXTERNAL_BOOKS_ASYNC = dict(settings.EXTERNAL_BOOKS_ASYNC, DEADLINE=0.05)
+        server.delay = 0.5
+        status_code, data = self.get('Book 0', 'Book 1')
+        assert status_code == 504
+        assert [error['status_code'] for error in data['errors']] == [504, 504]
+
+    def test_circuit_open(self, server):
+        with patch('book.upstream.CircuitBreaker.allow_request', return_value=False):
+            status_code, data = self.get('Book 0')
+        assert status_code == 503
+        assert data['status'] == 'service unavailable'
+
+    @pytest.mark.parametrize('error', [ValueError("Expecting value"), RequestException("Exceeded 30 redirects.")])
+    def test_bad_upstream_answer(self, server, error):
+        with patch.object(views.AsyncExternalBook, 'fetch_books', AsyncMock(side_effect=error)):
+            status_code, data = self.get('Book 0')
+        assert status_code == 502
+        assert data['status'] == 'bad gateway'
+
+    def test_upstream_calls_capped_per_loop(self, server, settings):
+        server.delay = 0.05
+        settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, MAX_IN_FLIGHT=1)
+        status_code, data = self.get(*self.NAMES)
+        assert status_code == 200
+        assert len(data['data']) == len(self.NAMES)
+        assert server.max_in_flight == 1
+
+    def test_refused_without_a_free_slot(self, server, settings):
+        settings.EXTERNAL_BOOKS_ADMISSION = dict(settings.EXTERNAL_BOOKS_ADMISSION, MAX_IN_FLIGHT=1, MAX_WAIT=0.01)
+
+        async def get_while_slot_is_held():
+            async with admission.async_upstream_slot():
+                return await AsyncClient().get('/api/async/external-books', {'name': 'Book 0'})
+
+        response = async_to_sync(get_while_slot_is_held)()
+        assert response.status_code == 503
+        assert response['Retry-After'] == '1'
+        assert response.json()['errors'][0]['status'] == 'service unavailable'
+        assert server.requests == 0
+
+    def test_too_many_names(self, server, settings):
+        settings.EXTERNAL_BOOKS_ASYNC = dict(settings.EXTERNAL_BOOKS_ASYNC, MAX_NAMES=2)
+        status_code, data = self.get('a', 'b', 'c')
+        assert status_code == 400
+        assert server.requests == 0
+
 
 class TestBookViewSet:
     @pytest.fixture
@@ -60,6 +227,19 @@ class TestBookViewSet:
                                                }
                                       }]
 
+    @pytest.mark.parametrize('authors', ['abc', [5], None, [{'x': 1}], [['a']], []])
+    def test_create_invalid_authors(self, authors):
+        resp = APIClient().post('/api/v1/books/', {'name': 'b', 'isbn': '1', 'country': 'c', 'number_of_pages': 1,
+                                                   'publisher': 'p', 'release_date': '2019-05-26',
+                                                   'authors': authors}, format='json')
+        assert resp.status_code == 400
+        assert not Author.objects.exists()
+
+    def test_create_invalid_book_creates_no_author(self):
+        resp = APIClient().post('/api/v1/books/', {'name': 'b', 'authors': ['a']}, format='json')
+        assert resp.status_code == 400
+        assert not Author.objects.exists()
+
     def test_list(self, request_factory):
         self.create_book(request_factory)
         req = request_factory.get('api/v1/books')
@@ -134,3 +314,127 @@ class TestBookViewSet:
         assert resp.status_code == 200
         assert resp.data['message'] == 'The book test_from_test was deleted successfully.'
         assert resp.data['data'] == []
+
+    def test_list_query_count(self, request_factory, django_assert_num_queries):
+        for _ in range(3):
+            self.create_book(request_factory)
+        req = request_factory.get('api/v1/books')
+        with django_assert_num_queries(3):
+            resp = views.BookViewSet.as_view({'get': 'list'})(req)
+        assert len(resp.data['data']) == 3
+
+    def test_retrieve_query_count(self, request_factory, django_assert_num_queries):
+        self.create_book(request_factory)
+        with django_assert_num_queries(2):
+            views.BookViewSet.as_view({'get': 'retrieve'})(request_factory.get('api/v1/books'), pk=1)
+
+    def test_create_query_count(self, request_factory, django_assert_num_queries):
+        with django_assert_num_queries(19):
+            self.create_book(request_factory)
+
+    def test_update_query_count(self, request_factory, django_assert_num_queries):
+        self.create_book(request_factory)
+        with django_assert_num_queries(10):
+            APIClient().patch('/api/v1/books/1/', data={'name': 'updated_name'}, format='json')
+
+    def test_list_keyset_pagination(self, request_factory, settings):
+        settings.BOOKS_MAX_PAGE_SIZE = 2
+        for _ in range(5):
+            self.create_book(request_factory)
+        ids, params = [], {'page_size': 10}
+        while True:
+            resp = views.BookViewSet.as_view({'get': 'list'})(request_factory.get('/api/v1/books/', params))
+            assert resp.status_code == 200
+            assert len(resp.data['data']) <= 2
+            ids.extend(book['id'] for book in resp.data['data'])
+            if resp.data['next'] is None:
+                break
+            params = dict(parse_qsl(urlparse(resp.data['next']).query))
+        assert ids == [1, 2, 3, 4, 5]
+
+    def test_list_invalid_cursor(self, request_factory):
+        req = request_factory.get('/api/v1/books/', {'cursor': 'not-a-cursor'})
+        resp = views.BookViewSet.as_view({'get': 'list'})(req)
+        assert resp.status_code == 404
+        # Well formed cursors holding values of the wrong type.
+        for position in (['notadate', 1], ['2019-01-01', 'abc'], [None, 1]):
+            cursor = KeysetPagination().encode_cursor(position)
+            resp = views.BookViewSet.as_view({'get': 'list'})(request_factory.get('/api/v1/books/', {'cursor': cursor}))
+            assert resp.status_code == 404
+
+    def test_bulk_json(self):
+        books = [{'name': 'Book {}'.format(i), 'isbn': '978-{:010d}'.format(i), 'country': 'india',
+                  'number_of_pages': 26, 'authors': ['test1', 'test2'], 'publisher': 'pub1',
+                  'release_date': '2019-05-26'} for i in range(3)]
+        resp = APIClient().post('/api/v1/books/bulk/', books, format='json')
+        assert resp.status_code == 200
+        assert resp.data['data'] == [{'index': i, 'status': 'created', 'id': i + 1} for i in range(3)]
+
+    def test_bulk_ndjson(self):
+        body = '\n'.join(json.dumps({'name': 'Book {}'.format(i), 'isbn': '978-{:010d}'.format(i),
+                                     'country': 'india', 'number_of_pages': 26, 'authors': ['test1'],
+                                     'publisher': 'pub1', 'release_date': '2019-05-26'}) for i in range(2))
+        resp = APIClient().post('/api/v1/books/bulk/?upsert=isbn', body + '\n',
+                                content_type='application/x-ndjson')
+        assert resp.status_code == 200
+        assert [item['status'] for item in resp.data['data']] == ['created', 'created']
+
+    def test_bulk_rejects_non_list(self):
+        resp = APIClient().post('/api/v1/books/bulk/', {'name': 'Book'}, format='json')
+        assert resp.status_code == 400
+        assert resp.data['status'] == 'bad request'
+
+    def test_batch(self, request_factory):
+        self.create_book(request_factory)
+        self.create_book(request_factory)
+        resp = APIClient().get('/api/v1/books/batch/', {'id': [2, 9, 1], 'isbn': ['123456789012', '0-553-10354-7']})
+        assert resp.status_code == 200
+        data = resp.data['data']
+        assert [(result.get('id', result.get('isbn')), result['status_code']) for result in data] == [
+            (2, 200), (9, 404), (1, 200), ('123456789012', 200), ('0-553-10354-7', 404)]
+        assert data[0]['data'][0]['authors'] == ['test1']
+        assert data[1]['data'] == [] and data[1]['status'] == 'not found'
+        assert [book['id'] for book in data[3]['data']] == [1, 2]
+
+    def test_batch_keys_matching_no_book(self, request_factory, django_assert_num_queries):
+        self.create_book(request_factory)
+        Book.objects.update(isbn13='')
+        with django_assert_num_queries(0):
+            resp = APIClient().get('/api/v1/books/batch/', {'id': ['99999999999999999999999', '-1', '0'],
+                                                            'isbn': ['', ' ']})
+        assert resp.status_code == 200
+        assert [(result.get('id', result.get('isbn')), result['status_code']) for result in resp.data['data']] == [
+            (99999999999999999999999, 404), (-1, 404), (0, 404), ('', 404), (' ', 404)]
+        resp = APIClient().get('/api/v1/books/batch/', {'id': 1, 'isbn': ''})
+        assert [len(result['data']) for result in resp.data['data']] == [1, 0]
+
+    def test_batch_bad_request(self, settings):
+        assert APIClient().get('/api/v1/books/batch/', {'id': ['1', 'x']}).status_code == 400
+        settings.BOOKS_BATCH_MAX_KEYS = 2
+        assert APIClient().get('/api/v1/books/batch/', {'id': [1, 2], 'isbn': '1'}).status_code == 400
+
+    def test_batch_query_count(self, request_factory, django_assert_num_queries):
+        for _ in range(3):
+            self.create_book(request_factory)
+        with django_assert_num_queries(2):
+            resp = APIClient().get('/api/v1/books/batch/', {'id': [1, 2], 'isbn': '123-456789012'})
+        assert [len(result['data']) for result in resp.data['data']] == [1, 1, 3]
+
+    def test_search(self, request_factory):
+        self.create_book(request_factory)
+        resp = APIClient().get('/api/v1/books/search/', {'q': 'test_fr'})
+        assert resp.status_code == 200
+        assert [book['id'] for book in resp.data['data']] == [1]
+        resp = APIClient().get('/api/v1/books/search/', {'q': 'missing'})
+        assert resp.data['data'] == []
+
+    def test_export(self, request_factory):
+        self.create_book(request_factory)
+        resp = APIClient().get('/api/v1/books/export/', {'country': 'india'})
+        assert resp.status_code == 200
+        assert resp['Content-Type'] == 'application/x-ndjson'
+        assert [json.loads(line)['authors'] for line in b''.join(resp.streaming_content).splitlines()] == [['test1']]
+        resp = APIClient().get('/api/v1/books/export/', {'type': 'csv', 'country': 'england'})
+        assert b''.join(resp.streaming_content).decode().splitlines() == [
+            'id,name,isbn,country,number_of_pages,publisher,release_date,authors']
+        assert APIClient().get('/api/v1/books/export/', {'type': 'xml'}).status_code == 400
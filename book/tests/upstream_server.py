@@ -0,0 +1,109 @@
+"""Local stand-in for the An API of Ice and Fire books endpoint."""
+
+import copy
+import hashlib
+import json
+import math
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from book.tests.dummy_data import dump
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            status = server.statuses.pop(0) if server.statuses else 200
+        try:
+            self.respond(status)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def respond(self, status):
+        server = self.server
+        if server.delay:
+            time.sleep(server.delay)
+        parsed = urlparse(self.path)
+        headers = {}
+        if status == 200 and parsed.path == '/api/books':
+            query = parse_qs(parsed.query)
+            name = query.get('name', [''])[0]
+            books = [book for book in server.books if not name or book['name'] == name]
+            if 'page' in query:
+                page, size = int(query['page'][0]), int(query.get('pageSize', ['10'])[0])
+                last = max(1, math.ceil(len(books) / size))
+                books = books[(page - 1) * size:page * size]
+                headers['Link'] = '<{}/api/books?page={}&pageSize={}>; rel="last"'.format(server.url, last, size)
+            body = json.dumps(books).encode('utf-8')
+            headers['ETag'] = '"{}"'.format(hashlib.md5(body).hexdigest())
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                status, body = 304, b''
+        else:
+            status = status if status != 200 else 404
+            body = b'{}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class UpstreamServer(ThreadingHTTPServer):
+    """Threaded HTTP server counting requests, accepted connections and the most
+    requests it served at once.
+
+    ``statuses`` is a queue of status codes returned by the next requests before
+    falling back to 200, and ``delay`` adds latency to every response.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, books=None, delay=0):
+        super().__init__(('127.0.0.1', 0), UpstreamHandler)
+        self.books = copy.deepcopy(dump) if books is None else books
+        self.delay = delay
+        self.statuses = []
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up, e.g. on a deadline, close the connection before the answer.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,296 @@
+"""HTTP client for the An API of Ice and Fire upstream."""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from book.metrics import upstream_duration
+
+
+def _httpx():
+    """Import httpx on first use, only the async views need it and WSGI workers never do."""
+    try:
+        import httpx
+    except ImportError:  # pragma: no cover
+        raise ImproperlyConfigured("AsyncUpstreamClient requires httpx.")
+    return httpx
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without contacting the upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over a sliding time window.
+
+    The circuit opens once at least ``min_requests`` calls were made in the last
+    ``window`` seconds and the share of failures among them reaches
+    ``failure_rate``. After ``reset_timeout`` seconds one trial call is let
+    through: success closes the circuit, failure opens it again, and a trial
+    abandoned without an outcome, e.g. cancelled, lets the next call try.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_rate=0.5, min_requests=10, window=30, reset_timeout=30, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self._opened_at = None
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self._outcomes and self._outcomes[0][0] <= now - self.window:
+            self._outcomes.popleft()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            now = self.clock()
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self):
+        with self._lock:
+            now = self.clock()
+            if self.state == self.HALF_OPEN:
+                self._open(now)
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if len(self._outcomes) >= self.min_requests and failures >= self.failure_rate * len(self._outcomes):
+                self._open(now)
+
+    def record_abandoned(self):
+        """Release the trial of a call that ended without an outcome, as if the reset timeout just ran out."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = self.clock() - self.reset_timeout
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+
+
+def breaker_from_settings(config):
+    return CircuitBreaker(failure_rate=config['BREAKER_FAILURE_RATE'],
+                          min_requests=config['BREAKER_MIN_REQUESTS'],
+                          window=config['BREAKER_WINDOW'],
+                          reset_timeout=config['BREAKER_RESET_TIMEOUT'])
+
+
+class UpstreamClient:
+    """Keep-alive client with a bounded connection pool, timeouts and retries."""
+
+    retry_statuses = (502, 503, 504)
+
+    def __init__(self, base_url, pool_size=10, connect_timeout=3.05, read_timeout=10, retries=2,
+                 backoff_factor=0.2, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff_factor, status_forcelist=self.retry_statuses,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_settings(cls):
+        config = settings.EXTERNAL_BOOKS_UPSTREAM
+        return cls(config['BASE_URL'], pool_size=config['POOL_SIZE'],
+                   connect_timeout=config['CONNECT_TIMEOUT'], read_timeout=config['READ_TIMEOUT'],
+                   retries=config['RETRIES'], backoff_factor=config['BACKOFF_FACTOR'],
+                   breaker=get_breaker())
+
+    def get(self, path, params=None, headers=None):
+        """GET ``path`` from the upstream, feeding the outcome to the circuit breaker.
+
+        Server errors left after retrying count as failures but are returned to the
+        caller, who decides whether to ``raise_for_status()``.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Upstream circuit is open.")
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url + path, params=params, headers=headers,
+                                        timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            upstream_duration.observe(time.perf_counter() - start, outcome='error')
+            self.breaker.record_failure()
+            # requests reports read timeouts that exhausted the retries as ConnectionError.
+            reason = getattr(e.args[0], 'reason', None) if e.args else None
+            if isinstance(reason, ReadTimeoutError):
+                raise requests.exceptions.ReadTimeout(e, request=e.request) from e
+            raise
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+        upstream_duration.observe(time.perf_counter() - start, outcome=response.status_code)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncUpstreamClient:
+    """httpx counterpart of UpstreamClient for the async views.
+
+    Failures are raised as the requests exceptions UpstreamClient raises, so both
+    clients are handled alike. httpx only retries failed connection attempts.
+    """
+
+    def __init__(self, base_url, pool_size=10, connect_timeout=3.05, read_timeout=10, retries=2, breaker=None):
+        httpx = _httpx()
+        self.breaker = breaker or CircuitBreaker()
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            transport=httpx.AsyncHTTPTransport(limits=limits, retries=retries))
+
+    @classmethod
+    def from_settings(cls):
+        config = settings.EXTERNAL_BOOKS_UPSTREAM
+        return cls(config['BASE_URL'], pool_size=config['POOL_SIZE'],
+                   connect_timeout=config['CONNECT_TIMEOUT'], read_timeout=config['READ_TIMEOUT'],
+                   retries=config['RETRIES'], breaker=get_breaker())
+
+    @staticmethod
+    def as_requests_error(error):
+        httpx = _httpx()
+        if isinstance(error, httpx.ConnectTimeout):
+            return requests.exceptions.ConnectTimeout(error)
+        if isinstance(error, httpx.TimeoutException):
+            return requests.exceptions.ReadTimeout(error)
+        if isinstance(error, httpx.TransportError):
+            return requests.exceptions.ConnectionError(error)
+        return requests.exceptions.RequestException(error)
+
+    async def get(self, path, params=None, headers=None):
+        """GET ``path`` from the upstream, feeding the outcome to the circuit breaker."""
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Upstream circuit is open.")
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(path, params=params, headers=headers)
+        except _httpx().HTTPError as e:
+            upstream_duration.observe(time.perf_counter() - start, outcome='error')
+            self.breaker.record_failure()
+            raise self.as_requests_error(e) from e
+        except BaseException:
+            # Cancelled, e.g. by asyncio.wait_for, or failed unexpectedly.
+            self.breaker.record_abandoned()
+            raise
+        upstream_duration.observe(time.perf_counter() - start, outcome=response.status_code)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def close(self):
+        await self.client.aclose()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_breaker = None
+_breaker_pid = None
+_breaker_lock = threading.Lock()
+# httpx clients are bound to the event loop they were first used on. Each is held
+# with the async generator closing it, see get_async_client.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_breaker():
+    """Return the circuit breaker shared by this process's sync and async clients."""
+    global _breaker, _breaker_pid
+    with _breaker_lock:
+        if _breaker is None or _breaker_pid != os.getpid():
+            _breaker = breaker_from_settings(settings.EXTERNAL_BOOKS_UPSTREAM)
+            _breaker_pid = os.getpid()
+        return _breaker
+
+
+def get_client():
+    """Return this process's shared client, building a new one after a fork."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = UpstreamClient.from_settings()
+            _client_pid = os.getpid()
+        return _client
+
+
+def reset_client():
+    global _client, _breaker
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _async_clients.clear()
+    with _breaker_lock:
+        _breaker = None
+
+
+async def _close_at_shutdown(client):
+    try:
+        yield
+    finally:
+        await client.close()
+
+
+def get_async_client():
+    """Return the shared async client of the running event loop.
+
+    The client is closed when the loop shuts down its async generators, which
+    ``asyncio.run`` does before closing the loop. That covers the loop of every
+    request that ``async_to_sync`` runs under WSGI as well as an ASGI server's.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = AsyncUpstreamClient.from_settings()
+        closer = _close_at_shutdown(client)
+        # Starting the generator registers it with the loop, which finalizes it at shutdown.
+        asyncio.ensure_future(closer.__anext__())
+        entry = _async_clients[loop] = (client, closer)
+    return entry[0]
@@ -1,13 +1,18 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from book.views import ExternalBook, BookViewSet
+from book.metrics import metrics_view
+from book.views import AsyncExternalBook, AuthorViewSet, ExternalBook, BookViewSet, ImportJobViewSet
 
 books_router = DefaultRouter()
 books_router.register(r'api/v1/books', BookViewSet, basename='book')
+books_router.register(r'api/v1/imports', ImportJobViewSet, basename='import')
+books_router.register(r'api/v1/authors', AuthorViewSet, basename='author')
 
 urlpatterns = [
     path(r'', include(books_router.urls)),
     path(r'api/external-books', ExternalBook.as_view(), name="external-books"),
+    path(r'api/async/external-books', AsyncExternalBook.as_view(), name="async-external-books"),
+    path(r'metrics', metrics_view, name="metrics"),
 
 ]
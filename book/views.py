@@ -1,67 +1,227 @@
 # Create your views here.
+import asyncio
+from collections import defaultdict
+
 import django_filters
-import requests
-from requests.exceptions import HTTPError, ConnectionError
-from rest_framework import viewsets
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views import View
+from requests.exceptions import HTTPError, ConnectionError, RequestException, Timeout
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
-from rest_framework.status import HTTP_201_CREATED, HTTP_200_OK
+from rest_framework.reverse import reverse
+from rest_framework.status import HTTP_201_CREATED, HTTP_200_OK, HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST, \
+    HTTP_404_NOT_FOUND, HTTP_410_GONE, HTTP_429_TOO_MANY_REQUESTS, HTTP_502_BAD_GATEWAY, \
+    HTTP_503_SERVICE_UNAVAILABLE, HTTP_504_GATEWAY_TIMEOUT
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
-from book.constants import FIELDS_TO_EXCLUDE, STATUS_CODES
-from book.models import Book, Author
-from book.serializers import BookSerializer
+from book import admission, author_stats, changes, conditional, export, facets, jobs, mirror, search
+from book.bulk import bulk_upsert_books, resolve_authors
+from book.cache import external_book_cache, normalize_name
+from book.constants import STATUS_CODES
+from book.external import customized_json_response
+from book.filters import BookFilter
+from book.isbn import canonical_isbn
+from book.models import Author, Book, BookChange, ImportJob, TableVersion
+from book.pagination import MAX_ID, AuthorKeysetPagination, KeysetPagination
+from book.parsers import NDJSONParser
+from book.serializers import BookBulkItemSerializer, BookSerializer, ImportJobSerializer, book_read_fields, \
+    serialize_author_rows, serialize_book_rows
+from book.renderers import FastJSONRenderer
+from book.routers import replica_reads
+from book.signals import batched_refresh
+from book.upstream import CircuitOpenError, get_async_client, get_client
 
 
 class ExternalBook(APIView):
+    def fetch_books(self, book_name):
+        with admission.upstream_slot():
+            response = get_client().get('/api/books', params={'name': book_name})
+        response.raise_for_status()
+        json_response = response.json()
+        customized_json_response(json_response)
+        return json_response
+
     @staticmethod
-    def customized_json_response(list_of_data):
-        for json_response in list_of_data:
-            for field in FIELDS_TO_EXCLUDE:
-                json_response.pop(field)
-            release = json_response.pop('released').split('T')[0]
-            json_response['release_date'] = release
+    def refused(status_code, retry_after):
+        return Response({'status_code': status_code,
+                         'status': STATUS_CODES[status_code]},
+                        status=status_code, headers={'Retry-After': str(retry_after)})
 
     def get(self, request):
-        book_name = request.query_params.get('name', '')
-        try:
-            response = requests.get("https://www.anapioficeandfire.com/api/books?name={}".format(book_name))
-            response.raise_for_status()
-            json_response = response.json()
-        except ConnectionError:
-            return Response({"error": "You are not connected to internet!"})
-        except HTTPError as e:
-            return Response({'status_code': e.response.status_code, 'status': STATUS_CODES[e.response.status_code]})
-
-        self.customized_json_response(json_response)
-        return Response({'status_code': response.status_code,
-                         'status': STATUS_CODES[response.status_code],
+        retry_after = admission.rate_limit(request)
+        if retry_after is not None:
+            return self.refused(HTTP_429_TOO_MANY_REQUESTS, retry_after)
+        book_name = normalize_name(request.query_params.get('name', ''))
+        json_response = mirror.lookup(book_name) if book_name else []
+        if not json_response:
+            try:
+                json_response = external_book_cache.get_or_fetch(book_name, lambda: self.fetch_books(book_name))
+            except admission.AdmissionRejected as e:
+                return self.refused(HTTP_503_SERVICE_UNAVAILABLE, e.retry_after)
+            except CircuitOpenError:
+                return Response({'status_code': HTTP_503_SERVICE_UNAVAILABLE,
+                                 'status': STATUS_CODES[HTTP_503_SERVICE_UNAVAILABLE]},
+                                status=HTTP_503_SERVICE_UNAVAILABLE)
+            except ConnectionError:
+                return Response({"error": "You are not connected to internet!"})
+            except Timeout:
+                return Response({'status_code': HTTP_504_GATEWAY_TIMEOUT,
+                                 'status': STATUS_CODES[HTTP_504_GATEWAY_TIMEOUT]},
+                                status=HTTP_504_GATEWAY_TIMEOUT)
+            except HTTPError as e:
+                return Response({'status_code': e.response.status_code,
+                                 'status': STATUS_CODES[e.response.status_code]})
+
+        return Response({'status_code': HTTP_200_OK,
+                         'status': STATUS_CODES[HTTP_200_OK],
                          'data': json_response})
 
 
-class BookFilter(django_filters.FilterSet):
-    release_date = django_filters.NumberFilter(field_name="release_date", lookup_expr='year')
+class AsyncExternalBook(View):
+    """Async ExternalBook taking several ``name`` values, fetched concurrently.
+
+    Runs on the event loop under ASGI (bookinformation.asgi). At most
+    ``EXTERNAL_BOOKS_ASYNC['CONCURRENCY']`` upstream calls of one request are in
+    flight, and names still pending after ``DEADLINE`` seconds are reported as
+    timed out. Books of all names are merged in one envelope, with an ``errors``
+    list naming the ones that failed. Clients are rate limited as for ExternalBook,
+    and upstream calls take one of the event loop's admission slots, see
+    book.admission. Names refused a slot fail with 503 and Retry-After.
+    """
+
+    renderer = FastJSONRenderer()
+
+    @staticmethod
+    async def fetch_books(book_name):
+        response = await get_async_client().get('/api/books', params={'name': book_name})
+        if response.is_error:
+            raise HTTPError(response=response)
+        json_response = response.json()
+        customized_json_response(json_response)
+        return json_response
+
+    @staticmethod
+    def lookup_mirror(names):
+        return {name: mirror.lookup(name) for name in names if name}
+
+    @staticmethod
+    def error_status(task):
+        """The envelope status code of a failed or unfinished fetch, None on success."""
+        if not task.done() or task.cancelled():
+            return HTTP_504_GATEWAY_TIMEOUT
+        error = task.exception()
+        if error is None:
+            return None
+        if isinstance(error, HTTPError):
+            return error.response.status_code
+        if isinstance(error, ConnectionError):
+            return HTTP_503_SERVICE_UNAVAILABLE
+        if isinstance(error, Timeout):
+            return HTTP_504_GATEWAY_TIMEOUT
+        # Other upstream errors, e.g. too many redirects, or a body that is not JSON.
+        if isinstance(error, (RequestException, ValueError)):
+            return HTTP_502_BAD_GATEWAY
+        raise error
+
+    @staticmethod
+    def retry_after(tasks):
+        """The longest Retry-After of the fetches refused an admission slot, None if none was."""
+        refused = [task.exception().retry_after for task in tasks.values() if task.done() and not task.cancelled()
+                   and isinstance(task.exception(), admission.AdmissionRejected)]
+        return max(refused, default=None)
+
+    def render(self, data, status=HTTP_200_OK):
+        return HttpResponse(self.renderer.render(data), status=status, content_type=self.renderer.media_type)
+
+    async def get(self, request):
+        retry_after = admission.rate_limit(request)
+        if retry_after is not None:
+            response = self.render({'status_code': HTTP_429_TOO_MANY_REQUESTS,
+                                    'status': STATUS_CODES[HTTP_429_TOO_MANY_REQUESTS]},
+                                   HTTP_429_TOO_MANY_REQUESTS)
+            response['Retry-After'] = str(retry_after)
+            return response
+        config = settings.EXTERNAL_BOOKS_ASYNC
+        names = list(dict.fromkeys(normalize_name(name) for name in request.GET.getlist('name'))) or ['']
+        if len(names) > config['MAX_NAMES']:
+            return self.render({'status_code': HTTP_400_BAD_REQUEST,
+                                'status': STATUS_CODES[HTTP_400_BAD_REQUEST],
+                                'message': "At most {} names per request.".format(config['MAX_NAMES'])},
+                               HTTP_400_BAD_REQUEST)
+        mirrored = await sync_to_async(self.lookup_mirror)(names)
+        semaphore = asyncio.Semaphore(config['CONCURRENCY'])
 
-    class Meta:
-        model = Book
-        fields = ['name', 'country', 'publisher', 'release_date']
+        async def fetch(book_name):
+            async with semaphore, admission.async_upstream_slot():
+                return await self.fetch_books(book_name)
+
+        tasks = {name: asyncio.ensure_future(external_book_cache.aget_or_fetch(name, lambda name=name: fetch(name)))
+                 for name in names if not mirrored.get(name)}
+        if tasks:
+            _, pending = await asyncio.wait(tasks.values(), timeout=config['DEADLINE'])
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return self.merge(names, mirrored, tasks)
+
+    def merge(self, names, mirrored, tasks):
+        data, errors = [], []
+        for name in names:
+            task = tasks.get(name)
+            status_code = task and self.error_status(task)
+            if status_code is None:
+                data.extend(task.result() if task else mirrored[name])
+            else:
+                errors.append({'name': name, 'status_code': status_code, 'status': STATUS_CODES.get(status_code)})
+        if len(errors) == len(names):
+            response = self.render({'status_code': errors[0]['status_code'],
+                                    'status': errors[0]['status'],
+                                    'errors': errors},
+                                   errors[0]['status_code'])
+            retry_after = self.retry_after(tasks)
+            if retry_after is not None:
+                response['Retry-After'] = str(retry_after)
+            return response
+        response = {'status_code': HTTP_200_OK, 'status': STATUS_CODES[HTTP_200_OK], 'data': data}
+        if errors:
+            response['errors'] = errors
+        return self.render(response)
 
 
 class BookViewSet(viewsets.ModelViewSet):
+    # Only update and destroy read books through get_object, neither serializes the authors it would prefetch.
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     filter_backends = (django_filters.rest_framework.DjangoFilterBackend,)
     filterset_class = BookFilter
+    pagination_class = KeysetPagination
+
+    def get_object(self):
+        # update and destroy look the book up before delegating to DRF, which would fetch it again.
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
 
     def create(self, request, *args, **kwargs):
-        author_names = request.data.get('authors', [])
-        authors = []
-        for author_name in author_names:
-            author, _ = Author.objects.get_or_create(name=author_name)
-            authors.append(author.pk)
-        request.data['authors'] = authors
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        # The book is validated before its missing authors are created, and they
+        # are rolled back with it should the write fail.
+        item = BookBulkItemSerializer(data=request.data)
+        item.is_valid(raise_exception=True)
+        with transaction.atomic():
+            resolve_authors(item.validated_data['authors'])
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         data = {"status_code": HTTP_201_CREATED,
                 "status": STATUS_CODES[201],
@@ -69,19 +229,216 @@ class BookViewSet(viewsets.ModelViewSet):
                 }
         return Response(data, status=HTTP_201_CREATED, headers=headers)
 
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=(JSONParser, NDJSONParser))
+    def bulk(self, request, *args, **kwargs):
+        """Create books from a JSON array or NDJSON body, upserting on ISBN with ?upsert=isbn."""
+        items = request.data
+        if not isinstance(items, list) or len(items) > settings.BOOKS_BULK_MAX_ITEMS:
+            return Response(data={"status_code": HTTP_400_BAD_REQUEST,
+                                  "status": STATUS_CODES[HTTP_400_BAD_REQUEST],
+                                  "message": "Expected a list of at most {} books.".format(
+                                      settings.BOOKS_BULK_MAX_ITEMS)},
+                            status=HTTP_400_BAD_REQUEST)
+        try:
+            batch_size = min(int(request.query_params['batch_size']), settings.BOOKS_BULK_BATCH_SIZE)
+        except (KeyError, ValueError):
+            batch_size = settings.BOOKS_BULK_BATCH_SIZE
+        results = bulk_upsert_books(items, batch_size=max(batch_size, 1),
+                                    upsert_on_isbn=request.query_params.get('upsert') == 'isbn')
+        return Response(data={"status_code": HTTP_200_OK,
+                              "status": STATUS_CODES[HTTP_200_OK],
+                              "data": results})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """Stream every book matching the BookFilter parameters as NDJSON, or CSV with ?type=csv."""
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in export.FORMATS:
+            return Response(data={"status_code": HTTP_400_BAD_REQUEST,
+                                  "status": STATUS_CODES[HTTP_400_BAD_REQUEST],
+                                  "message": "type must be one of {}.".format(', '.join(export.FORMATS))},
+                            status=HTTP_400_BAD_REQUEST)
+        render, content_type = export.FORMATS[export_type]
+        books = export.iter_books(self.filter_queryset(Book.objects.all()), settings.BOOKS_EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(render(books), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="books.{}"'.format(export_type)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def search(self, request, *args, **kwargs):
+        """Books matching every word of ?q=, the last one as a prefix, most relevant first."""
+        book_ids = search.search(request.query_params.get('q', ''), self.paginator.get_page_size(request))
+        books = {row['id']: row for row in Book.objects.filter(id__in=book_ids).values(*book_read_fields())}
+        data = serialize_book_rows([books[book_id] for book_id in book_ids if book_id in books])
+        return Response(data={"status_code": HTTP_200_OK,
+                              "status": STATUS_CODES[HTTP_200_OK],
+                              "data": data})
+
+    @action(detail=False, methods=['get'])
+    @replica_reads()
+    def facets(self, request, *args, **kwargs):
+        """Books per country, publisher and release year, under the BookFilter parameters."""
+        filters = {name: value for name, value in request.query_params.items()
+                   if name in self.filterset_class.base_filters and value != ''}
+        rollup = facets.rollup_filter(filters)
+        if rollup is not None:
+            data = facets.from_rollup(*rollup, size=settings.BOOKS_FACET_SIZE)
+        else:
+            data = facets.aggregate(self.filter_queryset(Book.objects.all()), settings.BOOKS_FACET_SIZE)
+        return Response(data={"status_code": HTTP_200_OK,
+                              "status": STATUS_CODES[HTTP_200_OK],
+                              "data": data})
+
+    @action(detail=False, methods=['get'])
+    @replica_reads()
+    def batch(self, request, *args, **kwargs):
+        """Books by the ?id= and ?isbn= values, each repeatable, read with one query.
+
+        One result per id and then per ISBN, each in request order, with the
+        matching books as ``data``: the book of an id, every book of an ISBN.
+        ISBNs match in any form, see book.isbn. Keys without a book are 404s.
+        """
+        isbns = request.query_params.getlist('isbn')
+        try:
+            ids = [int(book_id) for book_id in request.query_params.getlist('id')]
+        except ValueError:
+            ids = None
+        if ids is None or len(ids) + len(isbns) > settings.BOOKS_BATCH_MAX_KEYS:
+            return Response(data={"status_code": HTTP_400_BAD_REQUEST,
+                                  "status": STATUS_CODES[HTTP_400_BAD_REQUEST],
+                                  "message": "Expected at most {} integer ids and ISBNs.".format(
+                                      settings.BOOKS_BATCH_MAX_KEYS)},
+                            status=HTTP_400_BAD_REQUEST)
+        canonical = [canonical_isbn(isbn) for isbn in isbns]
+        # Ids out of the database's range and empty ISBNs match no book, and are not queried.
+        lookup_ids = [book_id for book_id in ids if 0 < book_id <= MAX_ID]
+        lookup_isbns = [key for key in canonical if key]
+        rows = list(Book.objects.filter(Q(pk__in=lookup_ids) | Q(isbn13__in=lookup_isbns)).order_by('pk')
+                    .values(*book_read_fields(), 'isbn13')) if lookup_ids or lookup_isbns else []
+        by_isbn = defaultdict(list)
+        for row in rows:
+            by_isbn[row.pop('isbn13')].append(row)
+        by_id = {row['id']: row for row in serialize_book_rows(rows)}
+
+        def result(key, value, books):
+            status_code = HTTP_200_OK if books else HTTP_404_NOT_FOUND
+            return {key: value, "status_code": status_code, "status": STATUS_CODES[status_code], "data": books}
+
+        data = [result('id', book_id, [by_id[book_id]] if book_id in by_id else []) for book_id in ids]
+        data += [result('isbn', isbn, by_isbn.get(key, []) if key else []) for isbn, key in zip(isbns, canonical)]
+        return Response(data={"status_code": HTTP_200_OK,
+                              "status": STATUS_CODES[HTTP_200_OK],
+                              "data": data})
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request, *args, **kwargs):
+        """Book changes after the ?since= cursor, waiting up to ?wait= seconds for one when there are none."""
+        try:
+            since = int(request.query_params.get('since', 0))
+            timeout = min(float(request.query_params.get('wait', 0)), settings.BOOKS_CHANGES_MAX_WAIT)
+        except ValueError:
+            since = timeout = -1
+        if since < 0 or not timeout >= 0:
+            return Response(data={"status_code": HTTP_400_BAD_REQUEST,
+                                  "status": STATUS_CODES[HTTP_400_BAD_REQUEST],
+                                  "message": "since must be a cursor and wait a number of seconds."},
+                            status=HTTP_400_BAD_REQUEST)
+        horizon = changes.horizon()
+        if since < horizon:
+            return Response(data={"status_code": HTTP_410_GONE,
+                                  "status": STATUS_CODES[HTTP_410_GONE],
+                                  "message": "Changes after cursor {} were compacted. List the books again and "
+                                             "follow the changes from this cursor.".format(since),
+                                  "cursor": changes.latest_cursor()},
+                            status=HTTP_410_GONE)
+        size = self.paginator.get_page_size(request)
+        page = changes.read(since, size)
+        if not page.changes:
+            # A cursor past the last change, e.g. one from another database, would skip the changes up to it.
+            latest = max(changes.latest_cursor(), horizon)
+            if since > latest:
+                since = latest
+                page = page._replace(cursor=latest)
+            if timeout and changes.wait(since, timeout):
+                page = changes.read(since, size)
+        return Response(data={"status_code": HTTP_200_OK,
+                              "status": STATUS_CODES[HTTP_200_OK],
+                              "data": page.changes,
+                              "cursor": page.cursor,
+                              "next": replace_query_param(request.build_absolute_uri(), 'since', page.cursor)
+                              if page.more else None})
+
+    def read_queryset(self):
+        """The filtered books as book_read_fields() dicts, for serialize_book_rows."""
+        return self.filter_queryset(Book.objects.values(*book_read_fields()))
+
+    @replica_reads()
     def list(self, request, *args, **kwargs):
-        response = super().list(request, *args, **kwargs)
-        return Response(data={"status_code": response.status_code,
-                              "status": STATUS_CODES[response.status_code],
-                              "data": response.data},
-                        status=HTTP_200_OK)
+        # The version is read before the books, so a response is never cached under a newer version.
+        version = TableVersion.objects.get_for_model(Book)
+        etag = conditional.make_etag('books', version.version, request.build_absolute_uri(request.path),
+                                     request.accepted_renderer.format,
+                                     conditional.normalize_params(request.query_params))
+        response = conditional.not_modified(request, etag, version.updated_at)
+        if response is not None:
+            return response
+
+        cache = conditional.list_cache()
+        data = cache.get(etag) if cache is not None else None
+        if data is None:
+            # Read only fast path, same output as the BookSerializer without model instances.
+            data = {"status_code": HTTP_200_OK,
+                    "status": STATUS_CODES[HTTP_200_OK],
+                    "data": serialize_book_rows(self.paginate_queryset(self.read_queryset())),
+                    "next": self.paginator.get_next_link()}
+            if cache is not None:
+                cache.set(etag, data, settings.BOOKS_LIST_CACHE_TTL)
+        return conditional.set_validators(Response(data=data, status=HTTP_200_OK), etag, version.updated_at)
+
+    def perform_create(self, serializer):
+        # create already runs in a transaction, a savepoint would cost two more queries.
+        with transaction.atomic(savepoint=False), batched_refresh():
+            super().perform_create(serializer)
+            author_pks = [author.pk for author in serializer.validated_data.get('authors', [])]
+            author_stats.record(None, author_stats.facts(serializer.instance, author_pks))
+            facets.record([(None, facets.values(serializer.instance))])
+            TableVersion.objects.bump(Book)
+            changes.record([serializer.instance.pk])
+
+    def perform_update(self, serializer):
+        changes_stats = not serializer.validated_data.keys().isdisjoint(
+            ('authors', 'number_of_pages', 'release_date'))
+        with transaction.atomic(), batched_refresh():
+            # The book as get_object read it may have changed since, the rollups need it as it is now.
+            serializer.instance = Book.objects.select_for_update().get(pk=serializer.instance.pk)
+            before_facets = facets.values(serializer.instance)
+            before = author_stats.facts(serializer.instance) if changes_stats else None
+            super().perform_update(serializer)
+            if changes_stats:
+                authors = serializer.validated_data.get('authors')
+                after = author_stats.facts(serializer.instance, before.authors if authors is None else
+                                           [author.pk for author in authors])
+                author_stats.record(before, after)
+            facets.record([(before_facets, facets.values(serializer.instance))])
+            TableVersion.objects.bump(Book)
+            changes.record([serializer.instance.pk])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            before = author_stats.facts(instance)
+            book_id = instance.pk
+            super().perform_destroy(instance)
+            author_stats.record(before, None)
+            facets.record([(facets.values(instance), None)])
+            TableVersion.objects.bump(Book)
+            changes.record([book_id], BookChange.DELETE)
 
     def update(self, request, *args, **kwargs):
-        book = self.get_object()
+        book_name = self.get_object().name
         response = super().update(request, *args, **kwargs)
         return Response(data={"status_code": response.status_code,
                               "status": STATUS_CODES[response.status_code],
-                              "message": "The book {} was updated successfully.".format(book.name),
+                              "message": "The book {} was updated successfully.".format(book_name),
                               "data": response.data
                               })
 
@@ -93,6 +450,106 @@ class BookViewSet(viewsets.ModelViewSet):
                               "message": "The book {} was deleted successfully.".format(book.name),
                               "data": []})
 
+    @replica_reads()
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            rows = list(self.read_queryset().values(*book_read_fields(), 'updated_at')
+                        .filter(pk=kwargs[self.lookup_url_kwarg or self.lookup_field])[:1])
+        except (TypeError, ValueError, ValidationError):
+            rows = []
+        if not rows:
+            raise Http404
+        updated_at = rows[0].pop('updated_at')
+        etag = conditional.make_etag('book', rows[0]['id'], updated_at.isoformat(), request.accepted_renderer.format)
+        response = conditional.not_modified(request, etag, updated_at)
+        if response is not None:
+            return response
+        return conditional.set_validators(Response(data={"status_code": HTTP_200_OK,
+                                                         "status": STATUS_CODES[HTTP_200_OK],
+                                                         "data": serialize_book_rows(rows)[0]}),
+                                          etag, updated_at)
+
+
+class AuthorViewSet(viewsets.GenericViewSet):
+    """Authors in name order, or one by name, with the counts and dates of their books.
+
+    The numbers come from AuthorStats, see book.author_stats.
+    """
+
+    queryset = Author.objects.all()
+    pagination_class = AuthorKeysetPagination
+    lookup_field = 'name'
+    lookup_value_regex = '[^/]+'
+
+    def read_queryset(self):
+        return Author.objects.values(
+            'name', book_count=Coalesce('stats__book_count', Value(0)),
+            total_pages=Coalesce('stats__total_pages', Value(0)),
+            first_release_date=F('stats__first_release_date'), last_release_date=F('stats__last_release_date'))
+
+    @replica_reads()
+    def list(self, request, *args, **kwargs):
+        rows = self.paginate_queryset(self.read_queryset())
+        return Response(data={"status_code": HTTP_200_OK,
+                              "status": STATUS_CODES[HTTP_200_OK],
+                              "data": serialize_author_rows(rows),
+                              "next": self.paginator.get_next_link()})
+
+    @replica_reads()
+    def retrieve(self, request, *args, **kwargs):
+        rows = list(self.read_queryset().filter(name=kwargs[self.lookup_field])[:1])
+        if not rows:
+            raise Http404
+        return Response(data={"status_code": HTTP_200_OK,
+                              "status": STATUS_CODES[HTTP_200_OK],
+                              "data": serialize_author_rows(rows)[0]})
+
+
+class ImportJobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Submit imports run by ``manage.py run_book_worker`` and poll their progress.
+
+    POST either a ``file`` holding a JSON array or NDJSON (``.ndjson``) of books,
+    upserting on ISBN with ?upsert=isbn, or an external books ``name`` to import
+    from An API of Ice and Fire.
+    """
+
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    parser_classes = (MultiPartParser, JSONParser)
+
+    @staticmethod
+    def bad_request(message):
+        return Response(data={"status_code": HTTP_400_BAD_REQUEST,
+                              "status": STATUS_CODES[HTTP_400_BAD_REQUEST],
+                              "message": message},
+                        status=HTTP_400_BAD_REQUEST)
+
+    @staticmethod
+    def parse_upload(upload):
+        ndjson = upload.name.endswith('.ndjson') or upload.content_type == NDJSONParser.media_type
+        return (NDJSONParser() if ndjson else JSONParser()).parse(upload)
+
+    def create(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is not None:
+            try:
+                items = self.parse_upload(upload)
+            except ParseError as e:
+                return self.bad_request(str(e.detail))
+            max_items = settings.BOOK_JOBS['MAX_ITEMS']
+            if not isinstance(items, list) or len(items) > max_items:
+                return self.bad_request("Expected a list of at most {} books.".format(max_items))
+            job = jobs.submit_books(items, upsert_on_isbn=request.query_params.get('upsert') == 'isbn')
+        elif 'name' in request.data:
+            job = jobs.submit_external(normalize_name(str(request.data['name'])))
+        else:
+            return self.bad_request("Upload a file of books or give an external books name.")
+        return Response(data={"status_code": HTTP_202_ACCEPTED,
+                              "status": STATUS_CODES[HTTP_202_ACCEPTED],
+                              "data": self.get_serializer(job).data},
+                        status=HTTP_202_ACCEPTED,
+                        headers={'Location': reverse('import-detail', args=[job.pk], request=request)})
+
     def retrieve(self, request, *args, **kwargs):
         response = super().retrieve(request, *args, **kwargs)
         return Response(data={"status_code": response.status_code,
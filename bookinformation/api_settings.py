@@ -0,0 +1,36 @@
+"""
+Settings for workers that only serve the JSON API.
+
+Use with DJANGO_SETTINGS_MODULE=bookinformation.api_settings. Drops the admin,
+auth, sessions, messages, static files, CSRF and templates, none of which
+book.urls uses, so that every worker imports and keeps less. Requests are
+anonymous and request.user is None. Run migrations and management commands
+with the full settings.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'rest_framework',
+    'book.apps.BookConfig',
+]
+
+MIDDLEWARE = [
+    'book.metrics.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'book.query_budget.QueryBudgetMiddleware',
+]
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'book.renderers.FastJSONRenderer',
+    ),
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': [],
+    'UNAUTHENTICATED_USER': None,
+}
+
+AUTH_PASSWORD_VALIDATORS = []
@@ -37,10 +37,11 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'django_filters',
-    'book',
+    'book.apps.BookConfig',
 ]
 
 MIDDLEWARE = [
+    'book.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'book.query_budget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'bookinformation.urls'
@@ -73,11 +75,212 @@ WSGI_APPLICATION = 'bookinformation.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# DB_ENGINE=postgresql uses DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and DB_PORT,
+# keeps connections open DB_CONN_MAX_AGE seconds and checks them before reuse.
+# DB_REPLICA_HOSTS, comma separated host[:port] values, adds read replicas that
+# the book list and retrieve endpoints read from, see book.routers.ReplicaRouter.
+# Otherwise SQLite is used, at DB_NAME or db.sqlite3.
+
+if os.environ.get('DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'bookinformation'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+        host, _, port = replica.strip().partition(':')
+        DATABASES['replica_{}'.format(index)] = dict(DATABASES['default'], HOST=host,
+                                                     PORT=port or DATABASES['default']['PORT'],
+                                                     TEST={'MIRROR': 'default'})
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'OPTIONS': {
+                # Take the write lock when a transaction starts, so that concurrent
+                # writers such as run_book_worker processes wait their turn instead
+                # of failing with "database is locked".
+                'transaction_mode': 'IMMEDIATE',
+                # Seconds a writer waits for the lock (SQLite's busy timeout).
+                'timeout': 20,
+                # Run on every new connection. WAL lets readers carry on during a
+                # write, and with synchronous=NORMAL commits skip the fsync until
+                # checkpoints, staying consistent but possibly losing the last
+                # transactions on power loss. mmap_size maps up to 256 MB of the file.
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA mmap_size=268435456',
+            },
+        }
     }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica_')]
+DATABASE_ROUTERS = ['book.routers.ReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # LocMemCache evicts least recently used entries once MAX_ENTRIES is reached.
+    'external_books': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'external-books',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1024,
+        },
+    },
+}
+
+EXTERNAL_BOOKS_CACHE_ALIAS = 'external_books'
+# Seconds a cached external books response is served as fresh.
+EXTERNAL_BOOKS_CACHE_TTL = 300
+# Extra seconds a stale response is kept to answer when the upstream fails.
+EXTERNAL_BOOKS_CACHE_STALE_TTL = 3600
+
+# Client for https://www.anapioficeandfire.com used by book.upstream.
+EXTERNAL_BOOKS_UPSTREAM = {
+    'BASE_URL': 'https://www.anapioficeandfire.com',
+    'POOL_SIZE': 10,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,
+    'BACKOFF_FACTOR': 0.2,
+    # Open the circuit when half of at least 10 calls in the last 30 seconds failed,
+    # and try the upstream again 30 seconds later.
+    'BREAKER_FAILURE_RATE': 0.5,
+    'BREAKER_MIN_REQUESTS': 10,
+    'BREAKER_WINDOW': 30,
+    'BREAKER_RESET_TIMEOUT': 30,
+}
+
+# Limits of GET /api/external-books, see book.admission. Per process, at most
+# MAX_IN_FLIGHT upstream calls at once and MAX_QUEUE requests waiting up to MAX_WAIT
+# seconds for one. With SHARED_CACHE_ALIAS, a cache shared by the processes such as
+# Redis or Memcached, at most SHARED_MAX_IN_FLIGHT calls over all of them, a slot of
+# a dead process freeing itself after SHARED_LEASE seconds. Each client address gets
+# BURST requests refilled at RATE per second, None for no rate limit, and the last
+# MAX_CLIENTS addresses are tracked. Behind proxies, CLIENT_IP_HEADER names the
+# request.META key of the address list they append to, e.g. 'HTTP_X_FORWARDED_FOR',
+# and TRUSTED_PROXY_HOPS how many of them append to it: the client address is the
+# one added by the outermost, the entries before it being the client's own claims.
+EXTERNAL_BOOKS_ADMISSION = {
+    'MAX_IN_FLIGHT': 8,
+    'MAX_QUEUE': 16,
+    'MAX_WAIT': 2,
+    'SHARED_CACHE_ALIAS': None,
+    'SHARED_MAX_IN_FLIGHT': 32,
+    'SHARED_LEASE': 60,
+    'RATE': 5,
+    'BURST': 20,
+    'MAX_CLIENTS': 10000,
+    'CLIENT_IP_HEADER': None,
+    'TRUSTED_PROXY_HOPS': 1,
+}
+
+# FastJSONRenderer encodes with orjson when it is installed, falling back to the stdlib.
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'book.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# GET /api/async/external-books: upstream calls in flight per request, seconds
+# before pending names are reported as timed out, and names accepted per request.
+EXTERNAL_BOOKS_ASYNC = {
+    'CONCURRENCY': 4,
+    'DEADLINE': 10,
+    'MAX_NAMES': 20,
+}
+
+# GET /metrics: directory shared by the processes of one server for their metric
+# snapshots, None for single process servers, and seconds between snapshot writes.
+# The directory should be emptied when the server restarts.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 5
+
+# Read book authors from the Book.author_names copy instead of joining
+# Book.authors, in the list, retrieve, search and export endpoints. The copy is maintained either way, check it with
+# manage.py rebuild_book_denorm --check before enabling on older data.
+BOOKS_DENORMALIZED_AUTHORS = False
+
+# Books list pagination, clients choose up to BOOKS_MAX_PAGE_SIZE with ?page_size=.
+BOOKS_PAGE_SIZE = 100
+BOOKS_MAX_PAGE_SIZE = 1000
+
+# Cache alias for whole GET /api/v1/books/ responses, keyed by the table version
+# and the normalized query, None to disable. Entries are never stale, the TTL
+# only bounds how long superseded versions linger.
+BOOKS_LIST_CACHE_ALIAS = None
+BOOKS_LIST_CACHE_TTL = 60
+
+# Values listed per facet by GET /api/v1/books/facets/, the most frequent first.
+BOOKS_FACET_SIZE = 20
+
+# GET /api/v1/books/changes/: the longest ?wait= in seconds and the seconds between
+# checks for new changes while waiting. A waiting request holds a worker, keep the
+# wait short next to the worker count. manage.py compact_book_changes removes the
+# tombstones of books deleted more than BOOKS_CHANGES_TOMBSTONE_DAYS ago.
+BOOKS_CHANGES_MAX_WAIT = 5
+BOOKS_CHANGES_POLL_INTERVAL = 0.5
+BOOKS_CHANGES_TOMBSTONE_DAYS = 7
+
+# Most ids and ISBNs taken together by GET /api/v1/books/batch/.
+BOOKS_BATCH_MAX_KEYS = 100
+
+# POST /api/v1/books/bulk limits, ?batch_size= may lower the batch size.
+BOOKS_BULK_MAX_ITEMS = 100000
+BOOKS_BULK_BATCH_SIZE = 500
+
+# Import jobs run by manage.py run_book_worker: seconds a worker's lease lasts
+# without progress, seconds between polls of an empty queue, claims before a job
+# fails, items committed per transaction, item errors kept per job and items
+# accepted per uploaded file.
+BOOK_JOBS = {
+    'LEASE_SECONDS': 60,
+    'POLL_INTERVAL': 1,
+    'MAX_ATTEMPTS': 3,
+    'CHUNK_SIZE': 1000,
+    'MAX_ERRORS': 100,
+    'MAX_ITEMS': 1000000,
+}
+
+# Rows read per cursor chunk by GET /api/v1/books/export/ and manage.py export_books.
+BOOKS_EXPORT_CHUNK_SIZE = 2000
+
+# SQL queries allowed per request, see book.query_budget.QueryBudgetMiddleware.
+QUERY_BUDGET = {
+    'DEFAULT': 20,
+    'ROUTES': {
+        'book-list': 3,
+        'POST book-list': 19,
+        'book-bulk': 100,
+        'book-detail': 2,
+        # Replacing the authors updates the stats of both the old and the new
+        # authors. Removing an author's first or last book recomputes that
+        # author's stats.
+        'PUT book-detail': 25,
+        'PATCH book-detail': 25,
+        'DELETE book-detail': 14,
+        'external-books': 1,
+        'book-facets': 1,
+        # The books, then their authors unless BOOKS_DENORMALIZED_AUTHORS is set.
+        'book-batch': 2,
+        # One query per check while a long poll waits.
+        'book-changes': 5 + int(BOOKS_CHANGES_MAX_WAIT / BOOKS_CHANGES_POLL_INTERVAL),
+        'author-list': 1,
+        'author-detail': 1,
+    },
+    'RAISE': False,
 }
 
 # Password validation
@@ -6,3 +6,6 @@ DATABASES = {
         "NAME": ":memory:",
     }
 }
+DATABASE_REPLICAS = []
+
+QUERY_BUDGET = dict(QUERY_BUDGET, RAISE=True)